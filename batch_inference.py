@@ -0,0 +1,209 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+# Offline batch runner: pre-answer a JSONL file of questions overnight
+#
+#   python batch_inference.py questions.jsonl answers.jsonl
+#
+# Each input line is a JSON object with the question under one of TEXT_FIELDS and optionally
+# an id (ID_FIELDS, otherwise the line number) and "manual_courses". Answers are appended to
+# the output JSONL one line at a time, which doubles as the checkpoint: a restarted run skips
+# every id already in the output (a half-written last line from a crash is cut off first).
+#
+# Retrieval (parse_user_string) for the next window of requests runs in a thread pool while
+# the model works through the current one. Inside a window requests are ordered by their full
+# prompt, so repeated questions/contexts run back to back and llama.cpp reuses the longest
+# shared prefix of the previous prompt (and identical ones are response cache hits).
+
+TEXT_FIELDS = ("prompt", "question", "body")
+ID_FIELDS = ("id", "request_id")
+WINDOW = 256
+RETRIEVAL_WORKERS = 4
+SYNC_EVERY = 16  # fsync the output every N answers
+
+
+def iter_requests(path: Path) -> Iterator[Dict[str, Any]]:
+    """Stream the input file, never holding more than one line of it."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            text = next((record[k] for k in TEXT_FIELDS if isinstance(record.get(k), str)), None)
+            if text is None:
+                print(f"[Batch] line {line_no}: no {'/'.join(TEXT_FIELDS)} field, skipped")
+                continue
+            request_id = next((str(record[k]) for k in ID_FIELDS if k in record), f"line-{line_no}")
+            yield {"id": request_id, "prompt": text, "manual_courses": record.get("manual_courses") or []}
+
+
+def load_checkpoint(out_path: Path) -> Set[str]:
+    """Ids already answered in `out_path`; truncates a partial trailing line left by a crash."""
+    done: Set[str] = set()
+    if not out_path.exists():
+        return done
+    good_end = 0
+    with open(out_path, "rb") as f:
+        for line in f:
+            try:
+                done.add(json.loads(line)["id"])
+            except (ValueError, KeyError):
+                break
+            good_end += len(line)
+    if good_end != out_path.stat().st_size:
+        with open(out_path, "r+b") as f:
+            f.truncate(good_end)
+    return done
+
+
+def windows(requests: Iterator[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    while True:
+        window = list(islice(requests, size))
+        if not window:
+            return
+        yield window
+
+
+class BatchRunner:
+    def __init__(self, advisor, window: int = WINDOW, retrieval_workers: int = RETRIEVAL_WORKERS, group: bool = True):
+        self.advisor = advisor
+        self.window = window
+        self.group = group
+        self.pool = ThreadPoolExecutor(max_workers=retrieval_workers, thread_name_prefix="retrieval")
+        self.stats = {"done": 0, "skipped": 0, "errors": 0, "cache_hits": 0, "prompt_tokens": 0, "prefill_tokens": 0, "completion_tokens": 0}
+
+    def _prefetch(self, window: List[Dict[str, Any]]):
+        return [self.pool.submit(self.advisor.retrieve, r["prompt"], r["manual_courses"]) for r in window]
+
+    def _order(self, window: List[Dict[str, Any]], parsed: List[Optional[Dict[str, Any]]]) -> List[int]:
+        if not self.group:
+            return list(range(len(window)))
+        # Requests that retrieved the same get_info payload (same context_hash) run back to back,
+        # the instruction comes first in the prompt so sorting by the whole prompt wouldn't group them
+        def key(i):
+            p = parsed[i]
+            return (p["input"], p["instruction"]) if p else ("", "")
+        return sorted(range(len(window)), key=key)
+
+    def _answer(self, request: Dict[str, Any], parsed: Dict[str, Any]) -> Dict[str, Any]:
+        stream = self.advisor.get_advice_stream(request["prompt"], request["manual_courses"], parsed=parsed)
+        response = "".join(stream)
+        timings = stream.timings or {}
+        if timings.get("cache_hit"):
+            self.stats["cache_hits"] += 1
+        for k in ("prompt_tokens", "prefill_tokens", "completion_tokens"):
+            self.stats[k] += timings.get(k, 0)
+        return {
+            "id": request["id"],
+            "prompt": request["prompt"],
+            "response": response,
+            "confidence": stream.confidence,
+            "timings": timings,
+            # Requests with the same context_hash got the same retrieved get_info payload
+            "context_hash": hashlib.sha256(parsed["input"].encode("utf-8")).hexdigest()[:16],
+        }
+
+    def run(self, in_path: Path, out_path: Path, errors_path: Optional[Path] = None) -> Dict[str, Any]:
+        out_path = Path(out_path)
+        errors_path = Path(errors_path) if errors_path else out_path.with_suffix(".errors.jsonl")
+        done = load_checkpoint(out_path)
+
+        def pending():
+            seen = set(done)
+            for request in iter_requests(in_path):
+                if request["id"] in seen:
+                    self.stats["skipped"] += 1
+                    continue
+                seen.add(request["id"])
+                yield request
+
+        start = time.perf_counter()
+        unsynced = 0
+        with open(out_path, "a", encoding="utf-8") as out, open(errors_path, "a", encoding="utf-8") as errors:
+            try:
+                batches = windows(pending(), self.window)
+                current = next(batches, None)
+                futures = self._prefetch(current) if current else []
+                while current:
+                    # Start retrieval for the next window before generating this one
+                    upcoming = next(batches, None)
+                    next_futures = self._prefetch(upcoming) if upcoming else []
+
+                    parsed: List[Optional[Dict[str, Any]]] = []
+                    for request, future in zip(current, futures):
+                        try:
+                            parsed.append(future.result())
+                        except Exception as e:
+                            parsed.append(None)
+                            self._error(errors, request, f"retrieval: {e!r}")
+
+                    for i in self._order(current, parsed):
+                        if parsed[i] is None:
+                            continue
+                        try:
+                            result = self._answer(current[i], parsed[i])
+                        except Exception as e:
+                            self._error(errors, current[i], f"generation: {e!r}")
+                            continue
+                        out.write(json.dumps(result, ensure_ascii=False) + "\n")
+                        out.flush()
+                        self.stats["done"] += 1
+                        unsynced += 1
+                        if unsynced >= SYNC_EVERY:
+                            os.fsync(out.fileno())
+                            unsynced = 0
+
+                    current, futures = upcoming, next_futures
+            except KeyboardInterrupt:
+                print("\n[Batch] Interrupted, progress is saved; run the same command again to resume")
+            finally:
+                out.flush()
+                os.fsync(out.fileno())
+                self.pool.shutdown(wait=False, cancel_futures=True)
+
+        elapsed = time.perf_counter() - start
+        self.stats["seconds"] = elapsed
+        self.stats["requests_per_hour"] = self.stats["done"] / elapsed * 3600 if elapsed > 0 else 0.0
+        return self.stats
+
+    def _error(self, errors, request: Dict[str, Any], message: str) -> None:
+        # Failed requests are not checkpointed, a resumed run tries them again
+        self.stats["errors"] += 1
+        errors.write(json.dumps({"id": request["id"], "prompt": request["prompt"], "error": message}) + "\n")
+        errors.flush()
+
+
+def print_report(stats: Dict[str, Any]) -> None:
+    print(f"[Batch] {stats['done']} answered, {stats['skipped']} already done, {stats['errors']} errors in {stats['seconds']:.1f}s")
+    print(f"[Batch] Throughput: {stats['requests_per_hour']:.0f} requests/hour")
+    if stats["done"]:
+        print(f"[Batch] Response cache hits: {stats['cache_hits']}")
+    if stats["prompt_tokens"]:
+        reused = stats["prompt_tokens"] - stats["prefill_tokens"]
+        print(f"[Batch] Prompt tokens reused from the KV cache: {reused}/{stats['prompt_tokens']} ({reused / stats['prompt_tokens']:.0%})")
+
+
+if __name__ == "__main__":
+    from model_inference import AdvisorSystem, MODEL_PATH
+
+    parser = argparse.ArgumentParser(description="Answer a JSONL file of questions with checkpoint/resume")
+    parser.add_argument("input", type=Path)
+    parser.add_argument("output", type=Path)
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--window", type=int, default=WINDOW, help="requests retrieved ahead and reordered together")
+    parser.add_argument("--workers", type=int, default=RETRIEVAL_WORKERS, help="retrieval threads")
+    parser.add_argument("--no-group", action="store_true", help="keep input order instead of grouping requests by retrieved context")
+    args = parser.parse_args()
+
+    advisor = AdvisorSystem(args.model)
+    advisor.track_history = False  # no PCA graph for batch runs, and it keeps the KV cache warm
+    runner = BatchRunner(advisor, window=args.window, retrieval_workers=args.workers, group=not args.no_group)
+    print_report(runner.run(args.input, args.output))
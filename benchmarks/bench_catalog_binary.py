@@ -0,0 +1,70 @@
+"""
+Compare the json.load catalog path against the mmapped binary catalog.
+
+Run from the repo root:  python -m benchmarks.bench_catalog_binary
+Each mode runs in a fresh interpreter so cold-start time and peak RSS are not polluted
+by the other mode.
+"""
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+from json_data.catalog_binary import binary_path_for, compile_catalog, open_binary_catalog
+
+COURSES_PATH = Path("json_data/courses.json")
+LOOKUPS = ["CS4341", "CS3013", "MA2621"]
+
+CHILD = r"""
+import json, resource, sys, time
+from pathlib import Path
+start = time.perf_counter()
+mode, path, codes = sys.argv[1], Path(sys.argv[2]), sys.argv[3].split(",")
+if mode == "json":
+    with path.open("r", encoding="utf-8") as f:
+        catalog = json.load(f)
+    index = {c.upper(): v for courses in catalog.values() for c, v in courses.items()}
+    found = [index[c] for c in codes]
+else:
+    from json_data.catalog_binary import open_binary_catalog
+    catalog = open_binary_catalog(path)
+    found = [catalog[c] for c in codes]
+elapsed = time.perf_counter() - start
+print(json.dumps({"cold_start_ms": elapsed * 1000,
+                  "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}))
+"""
+
+
+def run_child(mode: str) -> dict:
+    out = subprocess.run(
+        [sys.executable, "-c", CHILD, mode, str(COURSES_PATH), ",".join(LOOKUPS)],
+        check=True, capture_output=True, text=True,
+    )
+    return json.loads(out.stdout)
+
+
+def baseline_rss() -> int:
+    out = subprocess.run(
+        [sys.executable, "-c", "import json, resource; from json_data import catalog_binary; "
+         "print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)"],
+        check=True, capture_output=True, text=True,
+    )
+    return int(out.stdout)
+
+
+def main(runs: int = 5):
+    if open_binary_catalog(COURSES_PATH) is None:
+        compile_catalog(COURSES_PATH)
+    print(f"Binary catalog: {binary_path_for(COURSES_PATH)}")
+
+    base = baseline_rss()
+    for mode in ["json", "binary"]:
+        results = [run_child(mode) for _ in range(runs)]
+        cold = sorted(r["cold_start_ms"] for r in results)[runs // 2]
+        rss = sorted(r["max_rss_kb"] for r in results)[runs // 2]
+        print(f"{mode:>6}: cold start {cold:8.2f} ms | peak RSS {rss / 1024:7.1f} MB "
+              f"(+{(rss - base) / 1024:.1f} MB over bare interpreter)")
+
+
+if __name__ == "__main__":
+    main()
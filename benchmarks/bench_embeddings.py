@@ -0,0 +1,103 @@
+"""
+Memory and per-request latency of the embedding/confidence setups in embedding_backend.py.
+
+Run from the repo root:  python -m benchmarks.bench_embeddings [model.gguf] [embedding.gguf]
+Every configuration loads the generation model in its own process so peak RSS is comparable:
+
+  legacy  embedding=True + logits_all=True, create_embedding on the main model, logprobs=1
+  main    embedding=True, create_embedding on the main model, SampledLogprobs confidence
+  small   separate embedding GGUF, SampledLogprobs confidence
+  none    no embedding, SampledLogprobs confidence
+
+Defaults to the small Qwen2 GGUF from download_model.py; pass ./wpi-advisor-final.gguf for the
+real numbers (the logits_all matrix alone is n_ctx x n_vocab x 4 bytes, ~2.1 GB for Llama 3).
+"""
+import multiprocessing
+import resource
+import statistics
+import sys
+import time
+from pathlib import Path
+
+DEFAULT_MODEL = "local_models/qwen2-1_5b-instruct-q4_0.gguf"
+QUESTIONS = 12
+MAX_TOKENS = 32
+
+
+def student_messages():
+    lines = Path("chat_history.txt").read_text(encoding="utf-8").splitlines()
+    return [line[len("Student: "):] for line in lines if line.startswith("Student: ")]
+
+
+def run_config(name, model_path, embedding_path, results):
+    from llama_cpp import Llama
+
+    from embedding_backend import MainModelEmbedder, SmallModelEmbedder
+    from input_parser import parse_user_string
+    from model_inference import ALPACA_TEMPLATE, CTX_SIZE, GPU_LAYERS, SampledLogprobs
+
+    llm = Llama(model_path=model_path, n_gpu_layers=GPU_LAYERS, n_ctx=CTX_SIZE, verbose=False,
+                embedding=name in ("legacy", "main"), logits_all=name == "legacy")
+    embedder = None
+    if name in ("legacy", "main"):
+        embedder = MainModelEmbedder(llm)
+    elif name == "small":
+        embedder = SmallModelEmbedder(embedding_path)
+
+    embed_seconds, request_seconds = [], []
+    for message in student_messages()[:QUESTIONS]:
+        parsed = parse_user_string(message, ["CS4341"])
+        prompt = ALPACA_TEMPLATE.format(instruction=parsed["instruction"], input_ctx=parsed["input"])
+
+        start = time.perf_counter()
+        if embedder is not None:
+            embedder.embed(parsed["instruction"])
+        embed_seconds.append(time.perf_counter() - start)
+
+        if name == "legacy":
+            llm.create_completion(prompt, max_tokens=MAX_TOKENS, temperature=0.0, logprobs=1)
+        else:
+            llm.create_completion(prompt, max_tokens=MAX_TOKENS, temperature=0.0, logits_processor=[SampledLogprobs()])
+        request_seconds.append(time.perf_counter() - start)
+
+    results[name] = {
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "scores_mb": llm.scores.nbytes / 2**20,
+        "embed_ms": statistics.mean(embed_seconds) * 1e3,
+        "request_ms": statistics.mean(request_seconds) * 1e3,
+    }
+
+
+def main(model_path: str = DEFAULT_MODEL, embedding_path: str = None):
+    from model_inference import EMBEDDING_MODEL_PATH
+    embedding_path = embedding_path or EMBEDDING_MODEL_PATH
+
+    configs = ["legacy", "main", "none"]
+    if Path(embedding_path).exists():
+        configs.insert(2, "small")
+    else:
+        print(f"{embedding_path} not found, skipping the 'small' configuration")
+
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Manager() as manager:
+        results = manager.dict()
+        for name in configs:
+            proc = ctx.Process(target=run_config, args=(name, model_path, embedding_path, results))
+            proc.start()
+            proc.join()
+        results = dict(results)
+
+    print(f"{'':>8} {'peak RSS (MB)':>14} {'scores (MB)':>12} {'embed (ms)':>11} {'request (ms)':>13}")
+    for name in configs:
+        r = results[name]
+        print(f"{name:>8} {r['peak_rss_mb']:14.0f} {r['scores_mb']:12.0f} {r['embed_ms']:11.1f} {r['request_ms']:13.1f}")
+    if "legacy" in results:
+        base = results["legacy"]
+        for name in configs[1:]:
+            r = results[name]
+            print(f"{name} vs legacy: {base['peak_rss_mb'] - r['peak_rss_mb']:.0f} MB less peak RSS, "
+                  f"{base['request_ms'] - r['request_ms']:.1f} ms less per request")
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
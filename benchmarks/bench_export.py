@@ -0,0 +1,87 @@
+"""
+Wall time and peak RSS of json_data/export.py, streaming builder vs. the original DataFrame one.
+
+Run from the repo root:  python -m benchmarks.bench_export [--sections 10000,100000,1000000] [--pandas-max 100000]
+Each size gets a synthetic raw Workday dump (benchmarks.suite.synthetic_rows, written row by row so
+the generator doesn't hold it either), and each builder runs in its own process so ru_maxrss is
+that builder's peak. Where both run, the two outputs are compared byte for byte.
+"""
+import argparse
+import filecmp
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.suite import synthetic_rows
+
+
+def write_dump(path: Path, n_sections: int, seed: int = 0) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        f.write('{"Report_Entry": [')
+        for n, (_, row) in enumerate(synthetic_rows(seed)):
+            if n == n_sections:
+                break
+            f.write(("" if n == 0 else ",\n") + json.dumps(row))
+        f.write("]}")
+
+
+def child(builder: str, input_file: str, output_file: str) -> None:
+    import contextlib
+    import io
+    import resource
+
+    sys.path.insert(0, str(Path("json_data").resolve()))
+    import export
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        if builder == "pandas":
+            export.export_pandas(input_file, output_file)
+        else:
+            export.export(input_file, output_file)
+    seconds = time.perf_counter() - start
+    print(json.dumps({"seconds": seconds, "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))
+
+
+def run(builder: str, input_file: Path, output_file: Path) -> dict:
+    out = subprocess.run([sys.executable, "-m", "benchmarks.bench_export", "--child", builder, str(input_file), str(output_file)],
+                         capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sections", default="10000,100000,1000000")
+    parser.add_argument("--pandas-max", type=int, default=100000, help="skip the DataFrame builder above this many sections")
+    parser.add_argument("--child", nargs=3, metavar=("BUILDER", "INPUT", "OUTPUT"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(*args.child)
+        return
+
+    print(f"{'sections':>10} {'dump MB':>8} {'builder':>10} {'seconds':>9} {'peak RSS MB':>12}  output")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in [int(x) for x in args.sections.split(",")]:
+            dump = Path(tmp) / f"raw-{n}.json"
+            write_dump(dump, n)
+            size = dump.stat().st_size / 2**20
+            outputs = {}
+            for builder in ("streaming", "pandas"):
+                if builder == "pandas" and n > args.pandas_max:
+                    continue
+                outputs[builder] = Path(tmp) / f"{builder}-{n}.json"
+                r = run(builder, dump, outputs[builder])
+                print(f"{n:10d} {size:8.1f} {builder:>10} {r['seconds']:9.2f} {r['peak_rss_mb']:12.0f}", end="")
+                if builder == "pandas":
+                    same = filecmp.cmp(outputs["streaming"], outputs["pandas"], shallow=False)
+                    print("  identical" if same else "  DIFFERENT")
+                else:
+                    print()
+            dump.unlink()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Build time and lookup latency of lexical_index.LexicalIndex over the full catalog.
+
+Run from the repo root:  python -m benchmarks.bench_lexical_index [--repeat 5]
+Queries are the chat_history.txt and fine-tuning questions plus a few misspelled topic questions
+(the trigram fallback path, timed with the per-index corrections cache cleared). The baseline scores every course by scanning its token counts in
+Python, which is what a dict-of-Counters BM25 without postings arrays does.
+"""
+import argparse
+import math
+import time
+from pathlib import Path
+
+from benchmarks.suite import distribution, queries
+from json_data.catalog_store import courses_store
+from lexical_index import B, FIELD_WEIGHTS, K1, LexicalIndex, course_fields, stem, words
+
+COURSES_PATH = Path("json_data/courses.json")
+TYPOS = [
+    "is there a class on machne lerning?",
+    "I want to learn about neural netwroks",
+    "databse systems",
+    "algoritms for grad students",
+    "computer grpahics",
+]
+
+
+class NaiveBM25:
+    def __init__(self, catalog_index):
+        self.codes = sorted(catalog_index)
+        self.docs = []
+        for code in self.codes:
+            tf = {}
+            for field, text in course_fields(catalog_index[code]).items():
+                for word in words(text):
+                    tf[stem(word)] = tf.get(stem(word), 0) + FIELD_WEIGHTS[field]
+            self.docs.append(tf)
+        self.avg_length = sum(sum(d.values()) for d in self.docs) / len(self.docs)
+        self.df = {}
+        for doc in self.docs:
+            for term in doc:
+                self.df[term] = self.df.get(term, 0) + 1
+
+    def search(self, text, k=3):
+        terms = {stem(w) for w in words(text)}
+        n = len(self.docs)
+        scores = []
+        for code, doc in zip(self.codes, self.docs):
+            length = sum(doc.values())
+            score = 0.0
+            for term in terms:
+                tf = doc.get(term)
+                if tf:
+                    idf = math.log(1 + (n - self.df[term] + 0.5) / (self.df[term] + 0.5))
+                    score += idf * tf * (K1 + 1) / (tf + K1 * (1 - B + B * length / self.avg_length))
+            scores.append((score, code))
+        return sorted(scores, reverse=True)[:k]
+
+
+def time_queries(fn, texts, repeat):
+    samples = []
+    for _ in range(repeat):
+        for text in texts:
+            start = time.perf_counter()
+            fn(text)
+            samples.append(time.perf_counter() - start)
+    return distribution(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    catalog = courses_store(COURSES_PATH).get()
+    start = time.perf_counter()
+    index = LexicalIndex(catalog.index, catalog.digest)
+    build = time.perf_counter() - start
+    print(f"{len(index)} courses, {len(index.terms)} terms, {index.doc_ids.size} postings, built in {build * 1e3:.0f} ms")
+
+    texts = queries()
+    naive = NaiveBM25(catalog.index)
+    rows = [
+        ("postings arrays", time_queries(index.search, texts, args.repeat)),
+        ("  misspelled, uncorrected", time_queries(lambda t: index._corrections.clear() or index.search(t), TYPOS, args.repeat * 20)),
+        ("  + level filter", time_queries(lambda t: index.search(t, level="Graduate"), texts, args.repeat)),
+        ("Python scan over Counters", time_queries(naive.search, texts[:40], 1)),
+    ]
+    print(f"{'':>28} {'n':>6} {'p50 (us)':>10} {'p95 (us)':>10}")
+    for name, d in rows:
+        print(f"{name:>28} {d['n']:6d} {d['p50_us']:10.1f} {d['p95_us']:10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Microbenchmark the catalog-built MessageMatcher against the legacy
+extract_course_codes + extract_degree_id pair.
+
+Run from the repo root:  python -m benchmarks.bench_matcher
+The scaling section grows the synonym list with synthetic phrases to show that the
+matcher's latency stays flat while the nested `in` scan grows linearly.
+"""
+import random
+import re
+import string
+import timeit
+from pathlib import Path
+from typing import Dict, List
+
+import input_parser
+from input_parser import (
+    DEGREE_SYNONYMS,
+    MessageMatcher,
+    build_matcher,
+    extract_course_codes,
+    extract_degree_id,
+)
+from json_data.catalog_store import courses_store
+
+COURSES_PATH = Path("json_data/courses.json")
+
+
+def student_messages() -> List[str]:
+    lines = Path("chat_history.txt").read_text(encoding="utf-8").splitlines()
+    return [line[len("Student: "):] for line in lines if line.startswith("Student: ")]
+
+
+def per_call_us(fn, messages: List[str], number: int) -> float:
+    total = timeit.timeit(lambda: [fn(m) for m in messages], number=number)
+    return total / (number * len(messages)) * 1e6
+
+
+def legacy(message: str, synonyms: Dict[str, List[str]] = DEGREE_SYNONYMS):
+    input_parser.DEGREE_SYNONYMS = synonyms
+    try:
+        return extract_course_codes(message), extract_degree_id(message)
+    finally:
+        input_parser.DEGREE_SYNONYMS = DEGREE_SYNONYMS
+
+
+def synthetic_synonyms(n: int, seed: int = 0) -> Dict[str, List[str]]:
+    rng = random.Random(seed)
+    synonyms = {k: list(v) for k, v in DEGREE_SYNONYMS.items()}
+    for i in range(n):
+        words = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 9))) for _ in range(3)]
+        synonyms.setdefault(f"DEG_{i % 50}", []).append(" ".join(words))
+    return synonyms
+
+
+def main(number: int = 200):
+    messages = student_messages()
+    index = courses_store(COURSES_PATH).get().index
+    matcher = build_matcher(index)
+
+    print(f"{len(messages)} messages from chat_history.txt, {len(matcher.prefixes)} discipline prefixes")
+    print(f"legacy (cs|ds regex + nested in): {per_call_us(legacy, messages, number):8.2f} us/message")
+    print(f"MessageMatcher.match:             {per_call_us(matcher.match, messages, number):8.2f} us/message")
+    print(f"build_matcher (once per catalog): {timeit.timeit(lambda: build_matcher(index), number=5) / 5 * 1e3:8.2f} ms")
+
+    print("\nScaling with synonym count (us/message):")
+    for n in [0, 100, 1000, 5000]:
+        synonyms = synthetic_synonyms(n)
+        scaled = MessageMatcher(matcher.prefixes, synonyms)
+        old = per_call_us(lambda m: legacy(m, synonyms), messages, max(1, number // 10))
+        new = per_call_us(scaled.match, messages, max(1, number // 10))
+        print(f"  {n:5d} extra phrases: legacy {old:9.2f} | matcher {new:7.2f}")
+
+    print("\nScaling with discipline prefixes (us/message):")
+    rng = random.Random(1)
+    for n in [0, 500, 5000]:
+        extra = {"".join(rng.choices(string.ascii_uppercase, k=rng.randint(2, 5))) for _ in range(n)}
+        scaled = MessageMatcher(set(matcher.prefixes) | extra)
+        new = per_call_us(scaled.match, messages, max(1, number // 10))
+        print(f"  {n:5d} extra prefixes: matcher {new:7.2f}")
+
+
+if __name__ == "__main__":
+    main()
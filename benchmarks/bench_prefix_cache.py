@@ -0,0 +1,64 @@
+"""
+Time-to-first-token with and without the cached Alpaca preamble (prompt_cache.py).
+
+Run from the repo root:  python -m benchmarks.bench_prefix_cache [model.gguf]
+Defaults to the small Qwen2 GGUF from download_model.py so it runs on a laptop;
+pass ./wpi-advisor-final.gguf for the real numbers.
+"""
+import statistics
+import sys
+import time
+from pathlib import Path
+
+from llama_cpp import Llama
+
+from input_parser import parse_user_string
+from model_inference import ALPACA_TEMPLATE, CTX_SIZE, GPU_LAYERS, PROMPT_PREFIX
+from prompt_cache import PrefixStateCache
+
+DEFAULT_MODEL = "local_models/qwen2-1_5b-instruct-q4_0.gguf"
+
+
+def student_messages():
+    lines = Path("chat_history.txt").read_text(encoding="utf-8").splitlines()
+    return [line[len("Student: "):] for line in lines if line.startswith("Student: ")]
+
+
+def first_token_seconds(llm: Llama, prompt: str):
+    start = time.perf_counter()
+    out = llm.create_completion(prompt, max_tokens=1, temperature=0.0)
+    return time.perf_counter() - start, out["usage"]["prompt_tokens"]
+
+
+def main(model_path: str = DEFAULT_MODEL):
+    llm = Llama(model_path=model_path, n_gpu_layers=GPU_LAYERS, n_ctx=CTX_SIZE, verbose=False)
+
+    build_start = time.perf_counter()
+    cache = PrefixStateCache(llm, model_path, PROMPT_PREFIX)
+    cache.load_or_build()
+    print(f"Prefix: {len(cache.tokens)} tokens, snapshot ready in {time.perf_counter() - build_start:.3f}s ({cache.path})")
+
+    cold, warm, prefill_cold, prefill_warm = [], [], [], []
+    for message in student_messages():
+        parsed = parse_user_string(message, ["CS4341"])
+        prompt = ALPACA_TEMPLATE.format(instruction=parsed["instruction"], input_ctx=parsed["input"])
+
+        llm.reset()  # what create_embedding leaves behind in get_advice
+        seconds, prompt_tokens = first_token_seconds(llm, prompt)
+        cold.append(seconds)
+        prefill_cold.append(prompt_tokens)
+
+        llm.reset()
+        reused = cache.prepare()
+        seconds, prompt_tokens = first_token_seconds(llm, prompt)
+        warm.append(seconds)
+        prefill_warm.append(prompt_tokens - reused)
+
+    print(f"{'':>16} {'TTFT p50 (ms)':>14} {'TTFT mean (ms)':>15} {'prefill tokens/req':>19}")
+    for name, ttft, prefill in [("no prefix cache", cold, prefill_cold), ("prefix cache", warm, prefill_warm)]:
+        print(f"{name:>16} {statistics.median(ttft) * 1e3:14.1f} {statistics.mean(ttft) * 1e3:15.1f} "
+              f"{statistics.mean(prefill):19.1f}")
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
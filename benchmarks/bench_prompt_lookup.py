@@ -0,0 +1,91 @@
+"""
+How much prompt-lookup drafting (speculative.py) could accept, replayed over the fine-tuning answers.
+
+Run from the repo root:  python -m benchmarks.bench_prompt_lookup [--ngram 3]
+No model needed: for every example of fine_tuning_transformed.json the reference output is decoded
+token by token as if the target model produced exactly it, and at every step the draft is what
+llama-cpp-python's LlamaPromptLookupDecoding would propose from the context so far (same search,
+reimplemented so it runs without llama_cpp). A target forward pass yields the accepted draft tokens
+plus its own, so "tokens/pass" is the decode speedup ceiling when verifying k tokens is as cheap as
+one. Tokens are a word-level split close to Llama 3's pre-tokenizer, not the real BPE vocabulary,
+and the context is the instruction plus the get_info JSON without the Alpaca preamble.
+"""
+import argparse
+import json
+import re
+import statistics
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+PROMPTS_PATH = Path("json_data/fine_tuning_transformed.json")
+PIECE_RE = re.compile(r" ?[A-Za-z]+| ?\d{1,3}| ?[^\sA-Za-z\d]+|\s+(?!\S)|\s+")
+
+
+class Vocab:
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+
+    def encode(self, text: str) -> List[int]:
+        return [self.ids.setdefault(piece, len(self.ids)) for piece in PIECE_RE.findall(text)]
+
+
+def lookup(input_ids: np.ndarray, max_ngram_size: int, num_pred_tokens: int) -> np.ndarray:
+    # LlamaPromptLookupDecoding.find_candidate_pred_tokens: first earlier occurrence of the longest
+    # trailing n-gram that still has tokens after it
+    length = len(input_ids)
+    for ngram_size in range(min(max_ngram_size, length - 1), 0, -1):
+        windows = np.lib.stride_tricks.sliding_window_view(input_ids, (ngram_size,))
+        matches = np.nonzero(np.all(windows == input_ids[-ngram_size:], axis=1))[0]
+        for idx in matches:
+            start = idx + ngram_size
+            if start < length - ngram_size:
+                return input_ids[start:min(start + num_pred_tokens, length)]
+    return input_ids[:0]
+
+
+def replay(context: List[int], answer: List[int], ngram: int, k: int) -> Tuple[int, int, int]:
+    """(target passes, drafted tokens, accepted tokens) to decode `answer` after `context`."""
+    ids = np.asarray(context + answer, dtype=np.intc)
+    pos, passes, drafted, accepted = len(context), 0, 0, 0
+    while pos < len(ids):
+        draft = lookup(ids[:pos], ngram, k)
+        actual = ids[pos:pos + len(draft)]
+        mismatch = np.nonzero(draft[:len(actual)] != actual)[0]
+        n = int(mismatch[0]) if len(mismatch) else len(actual)
+        drafted += len(draft)
+        accepted += n
+        pos += n + 1
+        passes += 1
+    return passes, drafted, accepted
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--ngram", type=int, default=3, help="max_ngram_size (make_draft_model's default)")
+    parser.add_argument("--draft-tokens", default="4,8,10,16")
+    args = parser.parse_args()
+
+    with open(PROMPTS_PATH, "r", encoding="utf-8") as f:
+        examples = json.load(f)
+    vocab = Vocab()
+    encoded = [(vocab.encode(f"{e['instruction']}\n\n{e['input']}\n\n"), vocab.encode(e["output"])) for e in examples]
+    answer_tokens = sum(len(a) for _, a in encoded)
+    print(f"{len(encoded)} examples, {answer_tokens} answer tokens, "
+          f"context p50 {statistics.median(len(c) for c, _ in encoded):.0f} tokens")
+
+    print(f"{'k':>4} {'accepted':>9} {'tokens/pass':>12} {'p10':>6} {'p50':>6} {'p90':>6}   (tokens/pass per answer)")
+    for k in [int(x) for x in args.draft_tokens.split(",")]:
+        passes = drafted = accepted = 0
+        per_answer = []
+        for context, answer in encoded:
+            p, d, a = replay(context, answer, args.ngram, k)
+            passes, drafted, accepted = passes + p, drafted + d, accepted + a
+            per_answer.append(len(answer) / p)
+        q = statistics.quantiles(per_answer, n=10)
+        print(f"{k:4d} {accepted / max(drafted, 1):9.0%} {answer_tokens / passes:12.2f} {q[0]:6.2f} {q[4]:6.2f} {q[8]:6.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Build time and query latency of schedule_index.py against scanning the section time strings per question.
+
+Run from the repo root:  python -m benchmarks.bench_schedule_index [--repeat 200]
+The baseline walks every course's sections and parses their "time" strings on every question, the
+way answering from courses.json directly would. Three lookups are timed: a day/time window over the
+whole catalog, a two-course conflict check and "what overlaps with this course"; every answer from the
+index is checked against the baseline's. The last line is the whole ScheduleRetriever call (question
+parsing and the payload answer included), "other" being questions it returns None for.
+"""
+import argparse
+import time
+from pathlib import Path
+from typing import Dict, List, Set, Tuple
+
+from json_data.catalog_store import courses_store
+from schedule_index import ALL_TERMS, ScheduleIndex, ScheduleRetriever, group_bits, parse_meetings, query_terms, query_window
+from tracing import percentile
+
+COURSES_PATH = Path("json_data/courses.json")
+
+WINDOWS = [
+    "which CS courses fit Tuesday mornings in A term",
+    "anything on fridays after 3pm",
+    "classes before 10 on monday and wednesday in spring",
+    "evening courses in the fall",
+]
+PAIRS = [("CS3013", "CS4341"), ("CS2303", "MA2621"), ("CS2102", "CS2011"), ("ECE2010", "PH1120")]
+SINGLES = ["CS3013", "MA1021", "CS2303", "PH1110"]
+
+
+def live_sections(course: Dict) -> List[Tuple[int, List[Tuple[int, int, int]]]]:
+    return [(group_bits(group), parse_meetings(s.get("time") or ""))
+            for group, sections in (course.get("sections") or {}).items()
+            for s in sections if not (s.get("status") or "").startswith("Cancel")]
+
+
+def naive_window(catalog: Dict[str, Dict], days: int, start: int, end: int, terms: int, discipline: str = None) -> Set[str]:
+    found = set()
+    for code, course in catalog.items():
+        if discipline and (course.get("discipline") or "").upper() != discipline:
+            continue
+        for bits, meetings in live_sections(course):
+            if bits & terms and any(days >> d & 1 and s >= start and e <= end for d, s, e in meetings):
+                found.add(code)
+                break
+    return found
+
+
+def clash(a: List[Tuple[int, List]], b: List[Tuple[int, List]], terms: int) -> bool:
+    return any(ba & bb & terms and da == db and sa < eb and sb < ea
+               for ba, ma in a for bb, mb in b for da, sa, ea in ma for db, sb, eb in mb)
+
+
+def naive_overlapping(catalog: Dict[str, Dict], code: str, terms: int) -> Set[str]:
+    mine = live_sections(catalog[code])
+    return {other for other, course in catalog.items() if other != code and clash(mine, live_sections(course), terms)}
+
+
+def timed(fn, inputs, repeat: int) -> Tuple[float, float]:
+    fn(inputs[0])
+    samples = []
+    for _ in range(repeat):
+        for item in inputs:
+            start = time.perf_counter()
+            fn(item)
+            samples.append(time.perf_counter() - start)
+    return percentile(samples, 0.5) * 1e6, percentile(samples, 0.95) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    catalog = courses_store(COURSES_PATH).get()
+    start = time.perf_counter()
+    index = ScheduleIndex(catalog.index, catalog.digest)
+    print(f"{len(index)} sections, {len(index.meeting_day)} meetings, index built in {(time.perf_counter() - start) * 1e3:.0f} ms")
+
+    # Same answers first
+    for q in WINDOWS:
+        days, lo, hi = query_window(q)
+        discipline = "CS" if "cs " in q.lower() else None
+        got = {index.codes[c] for c in index.find(days, lo, hi, query_terms(q), discipline)}
+        assert got == naive_window(catalog.index, days, lo, hi, query_terms(q), discipline), q
+    for a, b in PAIRS:
+        got = bool(index.conflicts(index.code_ids[a], index.code_ids[b]))
+        assert got == clash(live_sections(catalog.index[a]), live_sections(catalog.index[b]), ALL_TERMS), (a, b)
+    for code in SINGLES:
+        got = {index.codes[c] for c in index.overlapping_courses(index.code_ids[code])}
+        assert got == naive_overlapping(catalog.index, code, ALL_TERMS), code
+    print("answers match the baseline")
+
+    lookups = {
+        "window": (WINDOWS, lambda q: naive_window(catalog.index, *query_window(q.lower()), query_terms(q.lower())),
+                   lambda q: index.find(*query_window(q.lower()), query_terms(q.lower()))),
+        "conflict": (PAIRS, lambda p: clash(live_sections(catalog.index[p[0]]), live_sections(catalog.index[p[1]]), ALL_TERMS),
+                     lambda p: index.conflicts(index.code_ids[p[0]], index.code_ids[p[1]])),
+        "overlaps": (SINGLES, lambda c: naive_overlapping(catalog.index, c, ALL_TERMS),
+                     lambda c: index.overlapping_courses(index.code_ids[c])),
+    }
+    print(f"{'lookup':>10} {'scan p50':>10} {'index p50':>10} {'index p95':>10}   (us)")
+    for name, (inputs, naive, indexed) in lookups.items():
+        # The catalog-wide baseline is slow, so it gets fewer rounds
+        scan, _ = timed(naive, inputs, max(1, args.repeat // 50))
+        p50, p95 = timed(indexed, inputs, args.repeat)
+        print(f"{name:>10} {scan:10.0f} {p50:10.0f} {p95:10.0f}   {scan / p50:.0f}x")
+
+    # What parse_user_string pays: question parsing + lookup + the payload answer
+    retriever = ScheduleRetriever(COURSES_PATH)
+    retriever.index = index
+    answers = {
+        "window": (WINDOWS, lambda q: retriever(q)),
+        "conflict": (PAIRS, lambda p: retriever(f"does {p[0]} conflict with {p[1]}?", p)),
+        "overlaps": (SINGLES, lambda c: retriever(f"what overlaps with {c}?", [c])),
+        "other": (["is there a class on neural networks?", "what should I take after CS 2102?"], lambda q: retriever(q)),
+    }
+    print("full answer p50: " + ", ".join(f"{name} {timed(fn, inputs, args.repeat)[0]:.0f} us" for name, (inputs, fn) in answers.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Lookup latency of semantic_index.SemanticIndex over the full catalog.
+
+Run from the repo root:  python -m benchmarks.bench_semantic_index [--dim 768] [--model nomic.gguf]
+The search cost doesn't depend on the vector values, so the index is filled with random unit
+vectors for every course in courses.json (real codes, disciplines and levels for the filters)
+and compared with scoring the rows one at a time in Python. With --model the real index is
+built/updated next to courses.json and the query embedding time is reported as well.
+"""
+import argparse
+import statistics
+import time
+from pathlib import Path
+
+import numpy as np
+
+from json_data.catalog_store import courses_store
+from semantic_index import QUERY_PREFIX, SemanticIndex
+
+COURSES_PATH = Path("json_data/courses.json")
+QUERIES = 500
+
+
+def random_index(dim: int) -> SemanticIndex:
+    catalog = courses_store(COURSES_PATH).get()
+    codes = sorted(catalog.index)
+    rng = np.random.default_rng(0)
+    matrix = rng.standard_normal((len(codes), dim)).astype(np.float32)
+    matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+    meta = {
+        "codes": codes,
+        "disciplines": [(catalog.index[c].get("discipline") or "").upper() for c in codes],
+        "levels": [catalog.index[c].get("level") or "" for c in codes],
+    }
+    return SemanticIndex(matrix.astype(np.float16), meta)
+
+
+def loop_search(index: SemanticIndex, query: np.ndarray, k: int):
+    rows = np.asarray(index.matrix, dtype=np.float32)
+    scores = [(float(np.dot(row, query)), code) for row, code in zip(rows, index.codes)]
+    return sorted(scores, reverse=True)[:k]
+
+
+def time_us(fn, queries) -> float:
+    samples = []
+    for q in queries:
+        start = time.perf_counter()
+        fn(q)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--model", default=None, help="embedding GGUF, builds the real index")
+    args = parser.parse_args()
+
+    index = random_index(args.dim)
+    rng = np.random.default_rng(1)
+    queries = list(rng.standard_normal((QUERIES, args.dim)).astype(np.float32))
+    index.search(queries[0], args.k)  # build the filter rows once, like the first real request
+
+    print(f"{len(index)} courses x {args.dim} dims, float16 matrix {index.matrix.nbytes / 2**20:.1f} MB, median of {QUERIES} queries")
+    print(f"{'top-k search':>36} {time_us(lambda q: index.search(q, args.k), queries):9.1f} us")
+    print(f"{'  + discipline=CS filter':>36} {time_us(lambda q: index.search(q, args.k, discipline='CS'), queries):9.1f} us")
+    print(f"{'  + CS, Graduate filter':>36} {time_us(lambda q: index.search(q, args.k, 'CS', 'Graduate'), queries):9.1f} us")
+    print(f"{'row-by-row Python loop':>36} {time_us(lambda q: loop_search(index, q, args.k), queries[:50]):9.1f} us")
+
+    if args.model:
+        from embedding_backend import SmallModelEmbedder
+        from semantic_index import SemanticRetriever
+
+        embedder = SmallModelEmbedder(args.model)
+        retriever = SemanticRetriever(COURSES_PATH, embedder.embed, embedder.model_id)
+        start = time.perf_counter()
+        real = retriever.current_index()
+        print(f"\nReal index: {len(real)} x {real.meta['dim']}, loaded/updated in {time.perf_counter() - start:.1f}s")
+        texts = ["is there a class on neural networks?", "web development", "intro to statistics for data science"]
+        print(f"{'query embedding':>36} {time_us(lambda t: embedder.embed(QUERY_PREFIX + t), texts * 10):9.1f} us")
+        print(f"{'embedding + search':>36} {time_us(retriever, texts * 10):9.1f} us")
+        for text in texts:
+            print(f"  {text!r}: {retriever.search(text)}")
+
+
+if __name__ == "__main__":
+    main()
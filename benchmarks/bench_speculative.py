@@ -0,0 +1,84 @@
+"""
+Tokens/sec and output equivalence of speculative decoding (speculative.py) vs. plain decoding.
+
+Run from the repo root:  python -m benchmarks.bench_speculative [model.gguf] [draft.gguf]
+Defaults to the small Qwen2 GGUF from download_model.py as the target; a draft GGUF is only
+tried when given (it must share the target's tokenizer). Every configuration decodes the same
+Alpaca prompts greedily, so a correct speculative setup reproduces the plain output; the
+"same output" column counts prompts whose text is identical to plain decoding.
+"""
+import statistics
+import sys
+import time
+from pathlib import Path
+
+from llama_cpp import Llama
+
+from input_parser import parse_user_string
+from model_inference import ALPACA_TEMPLATE, CTX_SIZE, GPU_LAYERS, STOP, SampledLogprobs
+from speculative import acceptance_rate, make_draft_model
+
+DEFAULT_MODEL = "local_models/qwen2-1_5b-instruct-q4_0.gguf"
+MAX_NEW_TOKENS = 256
+PROMPTS = 12
+
+
+def student_messages():
+    lines = Path("chat_history.txt").read_text(encoding="utf-8").splitlines()
+    return [line[len("Student: "):] for line in lines if line.startswith("Student: ")]
+
+
+def run(model_path: str, speculative, draft_tokens: int, prompts):
+    draft = make_draft_model(speculative, draft_tokens)
+    llm = Llama(model_path=model_path, n_gpu_layers=GPU_LAYERS, n_ctx=CTX_SIZE, draft_model=draft, verbose=False)
+
+    texts, rates, confidences = [], [], []
+    for prompt in prompts:
+        llm.reset()  # every prompt pays for its own prefill, only decode speed differs
+        if draft:
+            draft.reset()
+        logprobs = SampledLogprobs()
+        first = None
+        pieces = []
+        for chunk in llm.create_completion(prompt, max_tokens=MAX_NEW_TOKENS, temperature=0.0, stop=STOP,
+                                           logits_processor=[logprobs], stream=True):
+            if first is None:
+                first = time.perf_counter()
+            pieces.append(chunk["choices"][0]["text"])
+        decode_seconds = time.perf_counter() - first if first else 0.0
+        if decode_seconds > 0 and logprobs.steps > 1:
+            rates.append((logprobs.steps - 1) / decode_seconds)
+        texts.append("".join(pieces))
+        confidences.append(logprobs.mean())
+
+    return {
+        "texts": texts,
+        "tokens_per_second": statistics.mean(rates) if rates else 0.0,
+        "acceptance": acceptance_rate(draft.stats) if draft else None,
+        "confidence": statistics.mean(confidences),
+    }
+
+
+def main(model_path: str = DEFAULT_MODEL, draft_path: str = None):
+    prompts = []
+    for message in student_messages()[:PROMPTS]:
+        parsed = parse_user_string(message, ["CS4341"])
+        prompts.append(ALPACA_TEMPLATE.format(instruction=parsed["instruction"], input_ctx=parsed["input"]))
+
+    configs = [("plain", None, 0)] + [(f"prompt_lookup k={k}", "prompt_lookup", k) for k in (4, 8, 16)]
+    if draft_path:
+        configs += [(f"draft k={k}", draft_path, k) for k in (4, 8)]
+
+    baseline = None
+    print(f"{'':>20} {'tok/s':>7} {'speedup':>8} {'accepted':>9} {'same output':>12} {'confidence':>11}")
+    for name, speculative, k in configs:
+        r = run(model_path, speculative, k, prompts)
+        baseline = baseline or r
+        same = sum(a == b for a, b in zip(r["texts"], baseline["texts"]))
+        accepted = f"{r['acceptance']:.0%}" if r["acceptance"] is not None else "-"
+        print(f"{name:>20} {r['tokens_per_second']:7.1f} {r['tokens_per_second'] / baseline['tokens_per_second']:7.2f}x "
+              f"{accepted:>9} {same:>6}/{len(prompts):<5} {r['confidence']:11.4f}")
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
@@ -0,0 +1,114 @@
+"""
+Tokenize/cache time and padding of the fine-tuning batching modes in training_data.py, on CPU.
+
+Run from the repo root:  python -m benchmarks.bench_training_data [--tokenizer gpt2] [--scale 1]
+Without --tokenizer a small byte-level tokenizer stands in (ids are UTF-8 bytes, so lengths run
+~4x a real BPE's; --max-seq-length is scaled to match). The set is fine_tuning_transformed.json
+repeated --scale times. Besides timings and the padding report, every plan is checked: each example
+in exactly one row, no row longer than max_seq_length, and for packed batches the labels/position_ids
+/segment_mask keep every example to itself.
+"""
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from training_data import IGNORE_INDEX, batch_report, collate, make_plan, prepare, print_report, segment_mask
+
+SOURCE_PATH = Path("json_data/fine_tuning_transformed.json")
+
+
+class ByteTokenizer:
+    """UTF-8 bytes + BOS/EOS, with the parts of the Hugging Face tokenizer API that prepare() uses."""
+    name_or_path = "bytes"
+    bos_token, eos_token = "<s>", "</s>"
+    bos_token_id, eos_token_id, pad_token_id = 256, 257, 258
+
+    def get_vocab(self):
+        return {**{f"<0x{i:02X}>": i for i in range(256)}, "<s>": 256, "</s>": 257, "<pad>": 258}
+
+    def __call__(self, texts, add_special_tokens=True):
+        ids = []
+        for text in texts:
+            body, eos = (text[:-len(self.eos_token)], True) if text.endswith(self.eos_token) else (text, False)
+            ids.append(([self.bos_token_id] if add_special_tokens else []) + list(body.encode("utf-8")) + ([self.eos_token_id] if eos else []))
+        return {"input_ids": ids}
+
+
+def check_plan(dataset, plan, mode, max_seq_length, pad_token_id):
+    rows = [row for batch in plan for row in batch]
+    seen = sorted(i for row in rows for i in row)
+    assert seen == list(range(len(dataset))), f"{mode}: examples missing or repeated"
+    assert all(sum(int(dataset.lengths[i]) for i in row) <= max_seq_length for row in rows), f"{mode}: row too long"
+    for n, batch in enumerate(plan[:50]):
+        arrays = collate(dataset, batch, pad_token_id)
+        for r, row in enumerate(batch):
+            at = 0
+            # The mask is width^2, so it's only built for the first packed batch
+            mask = segment_mask(arrays["position_ids"][r][:int(arrays["attention_mask"][r].sum())]) if mode == "packed" and n == 0 else None
+            for i in row:
+                seq = np.asarray(dataset[i])
+                end = at + len(seq)
+                assert (arrays["input_ids"][r, at:end] == seq).all()
+                assert arrays["labels"][r, at] == IGNORE_INDEX and (arrays["labels"][r, at + 1:end] == seq[1:]).all()
+                assert (arrays["position_ids"][r, at:end] == np.arange(len(seq))).all()
+                if mask is not None:
+                    # Tokens of this example see exactly the earlier tokens of this example
+                    assert mask[at:end, at:end].sum() == len(seq) * (len(seq) + 1) // 2
+                    assert not mask[at:end, :at].any() and not mask[at:end, end:].any()
+                at = end
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tokenizer", default=None, help="Hugging Face tokenizer name or path (default: byte-level)")
+    parser.add_argument("--scale", type=int, default=1)
+    parser.add_argument("--max-seq-length", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=2)
+    parser.add_argument("--gradient-accumulation-steps", type=int, default=4)
+    args = parser.parse_args()
+
+    if args.tokenizer:
+        from transformers import AutoTokenizer
+        tokenizer = AutoTokenizer.from_pretrained(args.tokenizer)
+        max_seq_length = args.max_seq_length or 4096
+    else:
+        tokenizer = ByteTokenizer()
+        max_seq_length = args.max_seq_length or 4 * 4096
+    pad_token_id = tokenizer.pad_token_id if tokenizer.pad_token_id is not None else tokenizer.eos_token_id
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data = Path(tmp) / "train.json"
+        examples = json.loads(SOURCE_PATH.read_text(encoding="utf-8")) * args.scale
+        data.write_text(json.dumps(examples, ensure_ascii=False), encoding="utf-8")
+
+        start = time.perf_counter()
+        dataset = prepare(data, tokenizer, max_seq_length, cache_dir=Path(tmp) / "cache")
+        cold = time.perf_counter() - start
+        start = time.perf_counter()
+        cached = prepare(data, tokenizer, max_seq_length, cache_dir=Path(tmp) / "cache")
+        warm = time.perf_counter() - start
+        assert isinstance(cached.tokens, np.memmap) and (np.asarray(cached.tokens) == np.asarray(dataset.tokens)).all()
+
+        lengths = dataset.lengths
+        print(f"{len(dataset)} examples, {dataset.meta['tokens']} tokens ({dataset.meta['truncated']} truncated), "
+              f"length p50 {int(np.median(lengths))} / max {int(lengths.max())}, max_seq_length {max_seq_length}")
+        print(f"tokenize + cache {cold * 1e3:.0f} ms, load from cache {warm * 1e3:.1f} ms")
+
+        reports = {}
+        for mode in ("padded", "bucketed", "packed"):
+            start = time.perf_counter()
+            plan = make_plan(mode, lengths, args.batch_size, max_seq_length)
+            planned = time.perf_counter() - start
+            check_plan(dataset, plan, mode, max_seq_length, pad_token_id)
+            reports[mode] = batch_report(plan, lengths, args.gradient_accumulation_steps)
+            reports[mode]["plan_ms"] = planned * 1e3
+        print_report(reports)
+        print("plans checked: " + ", ".join(f"{mode} {r['plan_ms']:.1f} ms" for mode, r in reports.items()))
+
+
+if __name__ == "__main__":
+    main()
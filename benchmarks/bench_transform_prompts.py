@@ -0,0 +1,100 @@
+"""
+Wall time of json_data/transform_prompts.py on a fine-tuning set 100x the shipped one.
+
+Run from the repo root:  python -m benchmarks.bench_transform_prompts [--scale 100] [--workers 1,4]
+The set repeats the instructions of fine_tuning_unformatted.json, half of them with their own
+get_info call and half with a random combination of real course codes and degrees, so the cache
+sees both the common repeats and a long tail. The baseline is the original loop (whole file in
+memory, get_info + json.dumps for every example); every run's output is compared byte for byte.
+"""
+import argparse
+import filecmp
+import json
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from json_data import transform_prompts
+from json_data.catalog_store import courses_store, degrees_store
+
+COURSES_PATH = Path("json_data/courses.json")
+DEGREES_PATH = Path("json_data/degrees.json")
+SOURCE_PATH = Path("json_data/fine_tuning_unformatted.json")
+
+
+def make_dataset(path: Path, scale: int, seed: int = 0) -> int:
+    rng = random.Random(seed)
+    examples = json.loads(SOURCE_PATH.read_text(encoding="utf-8"))
+    codes = sorted(courses_store(COURSES_PATH).get().index)
+    degrees = ["", "", "BS_CS", "BS_DS"]
+    n = 0
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("[")
+        for _ in range(scale):
+            for example in examples:
+                example = dict(example)
+                if rng.random() < 0.5:
+                    picked = [f"{c[:-4]} {c[-4:]}" for c in rng.sample(codes, rng.choice([1, 1, 2, 3]))]
+                    example["input"] = f"get_info(courses = {json.dumps(picked)}, degree = \"{rng.choice(degrees)}\")"
+                f.write(("\n" if n == 0 else ",\n") + json.dumps(example, ensure_ascii=False))
+                n += 1
+        f.write("\n]")
+    return n
+
+
+def baseline(train_in: Path, train_out: Path) -> None:
+    courses = courses_store(COURSES_PATH).get()
+    degrees = degrees_store(DEGREES_PATH).get()
+    with open(train_in, "r", encoding="utf-8") as f:
+        train_data = json.load(f)
+    new_data = []
+    for example in train_data:
+        old_input = example.get("input", "")
+        if old_input.startswith("get_info"):
+            params = transform_prompts.parse_get_info_call(old_input)
+            info_payload = transform_prompts.get_info(
+                courses=params.get("courses") or [],
+                degree=params.get("degree") or "",
+                courses_catalog=courses.data,
+                degrees_catalog=degrees.data,
+                course_index=courses.index,
+            )
+            example["input"] = json.dumps(info_payload, indent=2, ensure_ascii=False)
+        new_data.append(example)
+    with open(train_out, "w", encoding="utf-8") as f:
+        json.dump(new_data, f, indent=2, ensure_ascii=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scale", type=int, default=100)
+    parser.add_argument("--workers", default=f"1,{os.cpu_count() or 1}")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        train_in = Path(tmp) / "train.json"
+        n = make_dataset(train_in, args.scale)
+        print(f"{n} examples, {train_in.stat().st_size / 2**20:.1f} MB")
+
+        reference = Path(tmp) / "baseline.json"
+        start = time.perf_counter()
+        baseline(train_in, reference)
+        print(f"{'original loop':>16} {time.perf_counter() - start:8.2f} s")
+
+        for workers in sorted({int(w) for w in args.workers.split(",")}):
+            # Start cold: nothing memoized from an earlier run (forked workers would inherit it)
+            transform_prompts._rendered.clear()
+            transform_prompts._fragments.clear()
+            transform_prompts._escaped.clear()
+            transform_prompts._parse_call.cache_clear()
+            out = Path(tmp) / f"workers-{workers}.json"
+            r = transform_prompts.transform(train_in, out, COURSES_PATH, DEGREES_PATH, workers=workers)
+            same = filecmp.cmp(reference, out, shallow=False)
+            print(f"{f'{workers} workers':>16} {r['seconds']:8.2f} s   get_info cache {r['hits']} hits / {r['misses']} misses "
+                  f"({r['hit_rate']:.0%})  {'identical' if same else 'DIFFERENT'}")
+
+
+if __name__ == "__main__":
+    main()
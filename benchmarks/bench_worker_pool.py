@@ -0,0 +1,102 @@
+"""
+Throughput of worker_pool.WorkerPool versus worker count and thread split.
+
+Run from the repo root:  python -m benchmarks.bench_worker_pool [model.gguf]
+Defaults to the small Qwen2 GGUF from download_model.py. Every configuration answers the
+same student questions from chat_history.txt (response cache off, MAX_NEW_TOKENS each) with
+2 requests in flight per worker. Memory is reported as the summed RSS of the workers and
+their summed PSS, which counts the shared mmapped weights only once across processes.
+"""
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from worker_pool import WorkerPool
+
+DEFAULT_MODEL = "local_models/qwen2-1_5b-instruct-q4_0.gguf"
+MAX_NEW_TOKENS = 64
+
+
+def student_messages():
+    lines = Path("chat_history.txt").read_text(encoding="utf-8").splitlines()
+    return [line[len("Student: "):] for line in lines if line.startswith("Student: ")]
+
+
+def memory_mb(pid: int):
+    rss = pss = 0
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            if line.startswith("Rss:"):
+                rss = int(line.split()[1])
+            elif line.startswith("Pss:"):
+                pss = int(line.split()[1])
+    return rss / 1024, pss / 1024
+
+
+def configurations(cores: int):
+    configs, workers = [], 1
+    while workers <= cores:
+        configs.append((workers, cores // workers))
+        if workers > 1 and cores // workers > 1:
+            configs.append((workers, max(1, cores // workers // 2)))  # undersubscribed split
+        workers *= 2
+    return configs
+
+
+def run(model_path: str, workers: int, threads: int, messages):
+    options = {"response_cache": False, "prefix_cache": True, "max_tokens": MAX_NEW_TOKENS}
+    start = time.perf_counter()
+    with WorkerPool(model_path, n_workers=workers, threads_per_worker=threads, advisor_options=options) as pool:
+        pool.wait_ready()
+        ready = time.perf_counter() - start  # every worker loads the model and builds its catalog indexes
+        pool.get_advice(messages[0])  # warm up, builds the prefix snapshot once
+
+        latencies, tokens = [], []
+
+        def one(message):
+            start = time.perf_counter()
+            stream = pool.get_advice_stream(message, ["CS4341"])
+            "".join(stream)
+            latencies.append(time.perf_counter() - start)
+            tokens.append((stream.timings or {}).get("completion_tokens", 0))
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=2 * workers) as clients:
+            list(clients.map(one, messages))
+        elapsed = time.perf_counter() - start
+
+        rss = pss = 0.0
+        if os.path.exists("/proc/self/smaps_rollup"):
+            for worker in pool.workers:
+                r, p = memory_mb(worker.process.pid)
+                rss += r
+                pss += p
+
+    return {
+        "requests_per_second": len(messages) / elapsed,
+        "tokens_per_second": sum(tokens) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1e3,
+        "rss_mb": rss,
+        "pss_mb": pss,
+        "ready_seconds": ready,
+    }
+
+
+def main(model_path: str = DEFAULT_MODEL):
+    cores = os.cpu_count() or 1
+    messages = student_messages()
+    print(f"{cores} cores, {len(messages)} requests per configuration, {MAX_NEW_TOKENS} new tokens each")
+    print(f"{'workers':>7} {'threads':>7} {'ready (s)':>9} {'req/s':>7} {'tok/s':>7} {'p50 (ms)':>9} {'sum RSS (MB)':>13} {'sum PSS (MB)':>13}")
+    baseline = None
+    for workers, threads in configurations(cores):
+        r = run(model_path, workers, threads, messages)
+        baseline = baseline or r["requests_per_second"]
+        print(f"{workers:7d} {threads:7d} {r['ready_seconds']:9.1f} {r['requests_per_second']:7.2f} {r['tokens_per_second']:7.1f} {r['p50_ms']:9.0f} "
+              f"{r['rss_mb']:13.0f} {r['pss_mb']:13.0f}   x{r['requests_per_second'] / baseline:.2f}")
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
@@ -0,0 +1,115 @@
+"""
+Deterministic stand-in for llama_cpp.Llama, enough of its API for AdvisorSystem.
+
+Tokens are 4-byte chunks of the UTF-8 text (roughly the ratio of the real tokenizers),
+prefill costs `prefill_ms` per prompt token not already in the KV cache and decoding
+`token_ms` per generated token, so the timings have the shape of a real model without one.
+The answer is always the same canned text, cut at max_tokens. save_state/load_state only carry
+the token ids (the "KV cache"), which is all prompt_cache.py's preamble snapshot needs; they
+import llama_cpp for LlamaState, so prefix_cache=True needs llama-cpp-python installed.
+"""
+import time
+import zlib
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+ANSWER = (
+    "CS 4341: Introduction To Artificial Intelligence is offered in A, B, C and D term. "
+    "The recommended background is CS 2102 and CS 2223, plus some probability. "
+    "It is a good fit for a BS in Computer Science student interested in machine learning, "
+    "and it pairs well with CS 4342 in a later term. Check the section status before registering. "
+)
+VOCAB = 256
+EOS = 0
+
+
+class FakeLlama:
+    def __init__(self, model_path: str = "fake.gguf", n_ctx: int = 4096, token_ms: float = 20.0, prefill_ms: float = 0.5,
+                 answer: str = ANSWER, **kwargs: Any):
+        self.model_path = model_path
+        self._n_ctx = n_ctx
+        self.token_ms = token_ms
+        self.prefill_ms = prefill_ms
+        self.answer = answer
+        self._input_ids = np.zeros(0, dtype=np.intc)
+        self.stats = {"completions": 0, "prefill_tokens": 0, "completion_tokens": 0}
+
+    @staticmethod
+    def longest_token_prefix(a: Sequence[int], b: Sequence[int]) -> int:
+        n = 0
+        for x, y in zip(a, b):
+            if x != y:
+                break
+            n += 1
+        return n
+
+    def n_ctx(self) -> int:
+        return self._n_ctx
+
+    def n_vocab(self) -> int:
+        return VOCAB
+
+    def token_eos(self) -> int:
+        return EOS
+
+    def tokenize(self, text: bytes, add_bos: bool = True, special: bool = False) -> List[int]:
+        tokens = [1] if add_bos else []
+        tokens += [zlib.crc32(text[i:i + 4]) % (VOCAB - 2) + 2 for i in range(0, len(text), 4)]
+        return tokens
+
+    _logits_all = False
+
+    def reset(self) -> None:
+        self._input_ids = np.zeros(0, dtype=np.intc)
+
+    def eval(self, tokens: Sequence[int]) -> None:
+        time.sleep(len(tokens) * self.prefill_ms / 1e3)
+        self.stats["prefill_tokens"] += len(tokens)
+        self._input_ids = np.concatenate([self._input_ids, np.asarray(tokens, dtype=np.intc)])
+
+    def save_state(self):
+        from llama_cpp.llama import LlamaState
+
+        return LlamaState(input_ids=self._input_ids.copy(), scores=np.zeros((1, VOCAB), dtype=np.single),
+                          n_tokens=len(self._input_ids), llama_state=b"", llama_state_size=0, seed=0)
+
+    def load_state(self, state) -> None:
+        self._input_ids = np.asarray(state.input_ids[:state.n_tokens], dtype=np.intc).copy()
+
+    def _pieces(self) -> List[str]:
+        return [self.answer[i:i + 4] for i in range(0, len(self.answer), 4)]
+
+    def create_completion(self, prompt, max_tokens: int = 16, stop: Optional[List[str]] = None, echo: bool = False,
+                          temperature: float = 0.0, logits_processor=None, stream: bool = False, **kwargs: Any):
+        tokens = list(prompt) if not isinstance(prompt, str) else self.tokenize(prompt.encode("utf-8"))
+        chunks = self._stream(tokens, max_tokens, logits_processor or [])
+        if stream:
+            return chunks
+        text = "".join(c["choices"][0]["text"] for c in chunks)
+        return {"choices": [{"text": text, "index": 0, "finish_reason": "length"}]}
+
+    def __call__(self, prompt, **kwargs: Any):
+        return self.create_completion(prompt, **kwargs)
+
+    def _stream(self, tokens: List[int], max_tokens: int, logits_processor) -> Iterator[Dict[str, Any]]:
+        reused = self.longest_token_prefix(self._input_ids.tolist(), tokens)
+        # Evaluate the part of the prompt that isn't in the "KV cache" yet
+        time.sleep((len(tokens) - reused) * self.prefill_ms / 1e3)
+        self.stats["completions"] += 1
+        self.stats["prefill_tokens"] += len(tokens) - reused
+
+        ids = list(tokens)
+        pieces = self._pieces()
+        for step in range(max_tokens):
+            logits = np.full(VOCAB, -5.0, dtype=np.float32)
+            token = 2 + step % (VOCAB - 2)
+            logits[token] = 5.0
+            for processor in logits_processor:
+                logits = processor(np.array(ids, dtype=np.intc), logits)
+            if step:
+                time.sleep(self.token_ms / 1e3)
+            ids.append(token)
+            self.stats["completion_tokens"] += 1
+            yield {"choices": [{"text": pieces[step % len(pieces)], "index": 0, "finish_reason": None}]}
+        self._input_ids = np.array(ids, dtype=np.intc)
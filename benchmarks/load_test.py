@@ -0,0 +1,138 @@
+"""
+Load test for server.py: many concurrent clients against the asyncio front end.
+
+Run from the repo root:  python -m benchmarks.load_test --clients 32 --requests 256
+By default the model is replaced by StubAdvisor (real parse_user_string retrieval, fake
+token-by-token generation with a fixed per-token delay), so queueing, backpressure and the
+latency percentiles can be measured without a GGUF. Pass --model to load AdvisorSystem instead.
+"""
+import argparse
+import asyncio
+import json
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from input_parser import parse_user_string
+from server import AdvisorServer, HOST, percentile
+
+
+class StubStream:
+    def __init__(self, pieces: List[str], delay: float):
+        self.pieces = pieces
+        self.delay = delay
+        self.confidence = None
+        self.timings = None
+        self._closed = False
+
+    def __iter__(self):
+        for piece in self.pieces:
+            if self._closed:
+                return
+            time.sleep(self.delay)
+            yield piece
+        self.confidence = -0.5
+        self.timings = {"prompt_tokens": 0, "completion_tokens": len(self.pieces)}
+
+    def close(self):
+        self._closed = True
+
+
+class StubAdvisor:
+    """Stands in for AdvisorSystem: same retrieve/get_advice_stream surface, no model."""
+
+    def __init__(self, tokens: int = 64, token_delay: float = 0.002):
+        self.tokens = tokens
+        self.token_delay = token_delay
+
+    def retrieve(self, user_query, manual_courses=None):
+        return parse_user_string(user_query, manual_courses or [])
+
+    def get_advice_stream(self, user_query, manual_courses=None, session_id=None, parsed=None):
+        return StubStream([f" tok{i}" for i in range(self.tokens)], self.token_delay)
+
+
+def student_messages() -> List[str]:
+    lines = Path("chat_history.txt").read_text(encoding="utf-8").splitlines()
+    return [line[len("Student: "):] for line in lines if line.startswith("Student: ")]
+
+
+async def one_request(port: int, prompt: str) -> Dict[str, Optional[float]]:
+    start = time.perf_counter()
+    reader, writer = await asyncio.open_connection(HOST, port)
+    body = json.dumps({"prompt": prompt, "stream": True}).encode("utf-8")
+    writer.write(
+        b"POST /v1/completions HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+        + f"Content-Length: {len(body)}\r\n\r\n".encode("latin-1") + body
+    )
+    await writer.drain()
+
+    status = int((await reader.readline()).split()[1])
+    first_token = None
+    while True:
+        line = await reader.readline()
+        if not line:
+            break
+        if first_token is None and line.startswith(b"data: {") and b'"text": ""' not in line:
+            first_token = time.perf_counter() - start
+    writer.close()
+    return {"status": status, "latency": time.perf_counter() - start, "first_token": first_token}
+
+
+async def run(advisors, clients: int, requests: int, queue_size: int, port: int, backoff: float) -> None:
+    server = AdvisorServer(advisors, queue_size=queue_size)
+    listener = await server.start(HOST, port)
+    port = listener.sockets[0].getsockname()[1]
+    messages = student_messages()
+
+    results = []
+    todo = iter(range(requests))
+
+    async def client():
+        for i in todo:
+            result = await one_request(port, messages[i % len(messages)])
+            results.append(result)
+            if result["status"] == 503:
+                await asyncio.sleep(backoff)  # a polite client waits before its next request
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    elapsed = time.perf_counter() - start
+
+    listener.close()
+    await server.stop()
+
+    ok = [r for r in results if r["status"] == 200]
+    rejected = sum(1 for r in results if r["status"] == 503)
+    latencies = [r["latency"] for r in ok]
+    first = [r["first_token"] for r in ok if r["first_token"] is not None]
+    print(f"{len(results)} requests from {clients} clients in {elapsed:.2f}s ({len(ok) / elapsed:.1f} completed/s)")
+    print(f"  ok={len(ok)}  rejected(503)={rejected}  other={len(results) - len(ok) - rejected}")
+    for name, values in (("latency", latencies), ("first token", first)):
+        print(f"  {name:<12} p50={percentile(values, 0.5) * 1000:7.1f} ms  "
+              f"p95={percentile(values, 0.95) * 1000:7.1f} ms  p99={percentile(values, 0.99) * 1000:7.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent load test for the advisor HTTP server")
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=256)
+    parser.add_argument("--queue-size", type=int, default=16)
+    parser.add_argument("--advisors", type=int, default=1, help="stub advisors (model threads)")
+    parser.add_argument("--tokens", type=int, default=64)
+    parser.add_argument("--token-delay", type=float, default=0.002, help="seconds per stub token")
+    parser.add_argument("--model", default=None, help="GGUF to load with AdvisorSystem instead of the stub")
+    parser.add_argument("--backoff", type=float, default=0.25, help="seconds a client waits after a 503")
+    parser.add_argument("--port", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.model:
+        from model_inference import AdvisorSystem
+        advisors = [AdvisorSystem(args.model)]
+    else:
+        advisors = [StubAdvisor(args.tokens, args.token_delay) for _ in range(args.advisors)]
+    asyncio.run(run(advisors, args.clients, args.requests, args.queue_size, args.port, args.backoff))
+
+
+if __name__ == "__main__":
+    main()
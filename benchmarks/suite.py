@@ -0,0 +1,319 @@
+"""
+Offline benchmark suite for the retrieval and inference pipeline, results saved as JSON.
+
+Run from the repo root:  python -m benchmarks.suite [--gguf small.gguf] [--compare benchmarks/results/<commit>.json]
+Sections:
+  micro   parse_user_string (plain and compacted), extract_course_codes, filter_known_courses,
+          get_info, the fast path, the BM25 course retriever and Alpaca prompt construction over
+          the chat_history.txt and fine-tuning questions, and SampledLogprobs per generated token
+          at Llama 3's vocabulary size
+  e2e     AdvisorSystem.get_advice on benchmarks/fake_llama.FakeLlama (--token-ms per generated
+          token, --prefill-ms per prompt token), also with the KV cache cleared before every
+          request with and without the preamble snapshot, and on a real GGUF when --gguf is given
+  export  json_data/export.py on synthetic raw Workday data built from courses.json
+Every result is a latency distribution in microseconds; the file goes to
+benchmarks/results/<commit>.json and --compare prints the p50 ratio against an older one.
+"""
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from tracing import percentile
+
+RESULTS_DIR = Path("benchmarks/results")
+COURSES_PATH = Path("json_data/courses.json")
+PROMPTS_PATH = Path("json_data/fine_tuning_transformed.json")
+LLAMA3_VOCAB = 128256
+
+
+def queries() -> List[str]:
+    lines = Path("chat_history.txt").read_text(encoding="utf-8").splitlines()
+    messages = [line[len("Student: "):] for line in lines if line.startswith("Student: ")]
+    with open(PROMPTS_PATH, "r", encoding="utf-8") as f:
+        messages += [e["instruction"] for e in json.load(f)]
+    return messages
+
+
+def distribution(samples: List[float]) -> Dict[str, float]:
+    return {
+        "n": len(samples),
+        "mean_us": sum(samples) / len(samples) * 1e6,
+        "p50_us": percentile(samples, 0.5) * 1e6,
+        "p95_us": percentile(samples, 0.95) * 1e6,
+    }
+
+
+def time_calls(fn: Callable[[Any], Any], inputs: List[Any], repeat: int) -> Dict[str, float]:
+    fn(inputs[0])  # warm caches (catalog load, compiled regexes) outside the measurement
+    samples = []
+    for _ in range(repeat):
+        for item in inputs:
+            start = time.perf_counter()
+            fn(item)
+            samples.append(time.perf_counter() - start)
+    return distribution(samples)
+
+
+def bench_micro(repeat: int) -> Dict[str, Dict[str, float]]:
+    from context_compaction import ContextCompactor
+    from fast_path import FastPathRouter
+    from input_parser import extract_course_codes, filter_known_courses, parse_user_string
+    from json_data.catalog_store import courses_store, degrees_store
+    from json_data.transform_prompts import get_info
+    from lexical_index import LexicalRetriever
+    from schedule_index import ScheduleRetriever
+
+    messages = queries()
+    courses = courses_store(COURSES_PATH).get()
+    degrees = degrees_store(Path("json_data/degrees.json")).get()
+    compactor = ContextCompactor()
+    codes = [sorted(extract_course_codes(m) | {"CS4341"}) for m in messages]
+    parsed = [parse_user_string(m, ["CS4341"]) for m in messages]
+    router = FastPathRouter()
+    lexical = LexicalRetriever(COURSES_PATH)
+    schedule = ScheduleRetriever(COURSES_PATH)
+
+    results = {
+        "parse_user_string": time_calls(lambda m: parse_user_string(m, ["CS4341"]), messages, repeat),
+        "parse_user_string_compacted": time_calls(
+            lambda m: parse_user_string(m, ["CS4341"], compactor=compactor, token_budget=3000), messages, repeat),
+        "extract_course_codes": time_calls(extract_course_codes, messages, repeat),
+        "filter_known_courses": time_calls(lambda c: filter_known_courses(set(c), courses.data), codes, repeat),
+        "filter_known_courses_indexed": time_calls(lambda c: filter_known_courses(set(c), courses.data, courses.index), codes, repeat),
+        "get_info": time_calls(lambda c: get_info(c, "BS_CS", courses.data, degrees.data), codes, repeat),
+        "fast_path_route": time_calls(lambda i: router.route(messages[i], parsed[i]), list(range(len(messages))), repeat),
+        "lexical_retrieval": time_calls(lexical, messages, repeat),
+        "schedule_index": time_calls(lambda m: schedule(m, extract_course_codes(m)), messages, repeat),
+    }
+
+    try:
+        from model_inference import ALPACA_TEMPLATE, SampledLogprobs
+    except ImportError as e:
+        print(f"[micro] prompt construction and confidence scoring skipped: {e}")
+    else:
+        results["prompt_construction"] = time_calls(
+            lambda p: ALPACA_TEMPLATE.format(instruction=p["instruction"], input_ctx=p["input"]), parsed, repeat)
+        # The confidence logits_processor runs once per generated token over the whole vocabulary
+        logits = np.random.default_rng(0).normal(size=(8, LLAMA3_VOCAB)).astype(np.float32)
+        scorer = SampledLogprobs()
+        scorer(np.zeros(100, dtype=np.intc), logits[0])  # a 100-token prompt
+        ids = np.zeros(100 + 400 * repeat + 2, dtype=np.intc)
+        results["sampled_logprobs_per_token"] = time_calls(lambda i: scorer(ids, logits[i % 8]), list(range(400)), repeat)
+    return results
+
+
+def run_advisor(advisor, messages: List[str], cold: bool = False) -> Dict[str, Dict[str, float]]:
+    latencies, first_tokens, rates = [], [], []
+    for message in messages:
+        if cold:
+            advisor.llm.reset()  # what another session's state or a create_embedding on the main model leaves behind
+        start = time.perf_counter()
+        stream = advisor.get_advice_stream(message, ["CS4341"])
+        first = None
+        for _ in stream:
+            if first is None:
+                first = time.perf_counter() - start
+        latencies.append(time.perf_counter() - start)
+        first_tokens.append(first or 0.0)
+        if stream.timings.get("tokens_per_second"):
+            rates.append(1 / stream.timings["tokens_per_second"])  # seconds per token
+    results = {"latency": distribution(latencies), "time_to_first_token": distribution(first_tokens)}
+    if rates:
+        results["seconds_per_token"] = distribution(rates)
+    return results
+
+
+def bench_e2e(args) -> Dict[str, Dict[str, float]]:
+    try:
+        import model_inference
+    except ImportError as e:
+        print(f"[e2e] skipped: {e}")
+        return {}
+    from benchmarks.fake_llama import FakeLlama
+
+    class TimedFakeLlama(FakeLlama):
+        def __init__(self, **kwargs):
+            super().__init__(token_ms=args.token_ms, prefill_ms=args.prefill_ms, **kwargs)
+
+    messages = queries()[:args.requests]
+    options = {"prefix_cache": False, "response_cache": False, "plot": False, "trace": False,
+               "lexical_retrieval": False, "semantic_retrieval": False, "schedule_index": False,
+               "max_tokens": args.max_tokens}
+    results = {}
+    real_llama = model_inference.Llama
+    model_inference.Llama = TimedFakeLlama
+    try:
+        with contextlib.redirect_stdout(io.StringIO()), tempfile.TemporaryDirectory() as tmp:
+            plain = model_inference.AdvisorSystem("fake.gguf", fast_path=False, **options)
+            fast = model_inference.AdvisorSystem("fake.gguf", fast_path=True, **options)
+            # The preamble snapshot is stored next to the model file, so that has to exist
+            fake_path = Path(tmp) / "fake.gguf"
+            fake_path.touch()
+            prefix = model_inference.AdvisorSystem(str(fake_path), fast_path=False, **{**options, "prefix_cache": True})
+            configs = [("fake", plain, False), ("fake_fast_path", fast, False),
+                       ("fake_cold", plain, True), ("fake_cold_prefix_cache", prefix, True)]
+            for name, advisor, cold in configs:
+                for metric, value in run_advisor(advisor, messages, cold).items():
+                    results[f"get_advice_{name}_{metric}"] = value
+    finally:
+        model_inference.Llama = real_llama
+
+    if args.gguf:
+        advisor = model_inference.AdvisorSystem(args.gguf, **{**options, "prefix_cache": True})
+        for metric, value in run_advisor(advisor, messages).items():
+            results[f"get_advice_gguf_{metric}"] = value
+    return results
+
+
+def synthetic_rows(seed: int = 0) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """Endless Workday-style raw rows (what export.py reads) as (course number, row), courses copied from courses.json with fresh codes."""
+    with open(COURSES_PATH, "r", encoding="utf-8") as f:
+        catalog = [course for discipline in json.load(f).values() for course in discipline.values()]
+    rng = random.Random(seed)
+    i = 0
+    while True:
+        course = rng.choice(catalog)
+        code = f"{course.get('discipline') or 'CS'} {1000 + i % 9000}{'' if i < 9000 else chr(65 + i // 9000)}"
+        description = f"<p>{course.get('description', '')}</p><ul><li>Cat. I</li></ul>".replace("\\", "/")
+        for sections in (course.get("sections") or {"Fall A": [{}]}).values():
+            for s in sections:
+                yield i, {
+                    "Course_Title": f"{code} - {course.get('title', '')}",
+                    "Academic_Level": course.get("level", ""),
+                    "Course_Description": description,
+                    "Course_Section_Description": "<b>Section</b> notes &amp; details",
+                    "Public_Notes": None if rng.random() < 0.5 else "<i>Public</i> note",
+                    "Offering_Period": s.get("term", "2025 Fall A Term"),
+                    "Meeting_Patterns": s.get("time", ""),
+                    "Section_Status": s.get("status", "Open"),
+                    "Instructors": s.get("instructor", ""),
+                    "Delivery_Mode": s.get("delivery_mode", "In-Person"),
+                    "Section_Details": s.get("details", ""),
+                    "Meeting_Day_Patterns": s.get("days", ""),
+                    "Instructional_Format": s.get("format", "Lecture"),
+                }
+        i += 1
+
+
+def synthetic_raw(n_courses: int, seed: int = 0) -> Dict[str, Any]:
+    """Raw dump of synthetic_rows for n_courses."""
+    return {"Report_Entry": [row for _, row in itertools.takewhile(lambda r: r[0] < n_courses, synthetic_rows(seed))]}
+
+
+def bench_export(n_courses: int, repeat: int) -> Dict[str, Dict[str, float]]:
+    sys.path.insert(0, str(Path("json_data").resolve()))
+    import export
+
+    raw = synthetic_raw(n_courses)
+    cwd = os.getcwd()
+    samples = []
+    with tempfile.TemporaryDirectory() as tmp:
+        # export.main() reads/writes fixed names in the working directory
+        with open(Path(tmp) / "prod-data-raw.json", "w", encoding="utf-8") as f:
+            json.dump(raw, f)
+        os.chdir(tmp)
+        try:
+            for _ in range(repeat):
+                start = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    export.main()
+                samples.append(time.perf_counter() - start)
+        finally:
+            os.chdir(cwd)
+    result = distribution(samples)
+    result["rows"] = len(raw["Report_Entry"])
+    return {f"export_{n_courses}_courses": result}
+
+
+def commit_id() -> str:
+    try:
+        sha = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True, text=True).stdout.strip()
+        return sha + ("-dirty" if dirty else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def print_results(results: Dict[str, Dict[str, float]], baseline: Optional[Dict[str, Dict[str, float]]], tolerance: float) -> int:
+    regressions = 0
+    print(f"{'benchmark':>44} {'n':>6} {'p50 (us)':>12} {'p95 (us)':>12} {'vs base':>8}")
+    for name, r in results.items():
+        compare = ""
+        old = (baseline or {}).get(name)
+        if old and old["p50_us"] > 0:
+            ratio = r["p50_us"] / old["p50_us"]
+            compare = f"{ratio:7.2f}x"
+            if ratio > 1 + tolerance:
+                compare += " !"
+                regressions += 1
+        print(f"{name:>44} {r['n']:6d} {r['p50_us']:12.1f} {r['p95_us']:12.1f} {compare:>8}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks for retrieval, inference (fake or small model) and export")
+    parser.add_argument("--sections", default="micro,e2e,export")
+    parser.add_argument("--repeat", type=int, default=5, help="passes over the queries in the micro section")
+    parser.add_argument("--requests", type=int, default=20, help="get_advice calls per end-to-end configuration")
+    parser.add_argument("--token-ms", type=float, default=20.0, help="fake model decode latency per token")
+    parser.add_argument("--prefill-ms", type=float, default=0.5, help="fake model prefill latency per prompt token")
+    parser.add_argument("--max-tokens", type=int, default=64)
+    parser.add_argument("--gguf", default=None, help="also run get_advice on this (small) GGUF")
+    parser.add_argument("--export-courses", type=int, default=2000)
+    parser.add_argument("--out", type=Path, default=None, help="defaults to benchmarks/results/<commit>.json")
+    parser.add_argument("--compare", type=Path, default=None, help="an earlier results file")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="p50 slowdown flagged as a regression")
+    args = parser.parse_args()
+
+    sections = set(args.sections.split(","))
+    results: Dict[str, Dict[str, float]] = {}
+    if "micro" in sections:
+        results.update(bench_micro(args.repeat))
+    if "e2e" in sections:
+        results.update(bench_e2e(args))
+    if "export" in sections:
+        results.update(bench_export(args.export_courses, repeat=3))
+
+    commit = commit_id()
+    report = {
+        "commit": commit,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": f"{platform.system()} {platform.machine()}, {os.cpu_count()} cores",
+        "config": {k: (str(v) if isinstance(v, Path) else v) for k, v in vars(args).items()},
+        "results": results,
+    }
+    out = args.out or RESULTS_DIR / f"{commit}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline_report = json.load(f)
+        baseline = baseline_report["results"]
+        print(f"Comparing against {baseline_report['commit']} ({baseline_report['created']})")
+    regressions = print_results(results, baseline, args.tolerance)
+    print(f"\nSaved {out}")
+    if regressions:
+        print(f"{regressions} benchmark(s) more than {args.tolerance:.0%} slower than the baseline")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from model_inference import AdviceStream, AdvisorSystem, MODEL_PATH
+
+# Confidence-gated cascade: answer with a small GGUF first, re-run on the 70B only when unsure
+#
+# The small model's answer is kept when its average token logprob (the same confidence score
+# get_advice reports) is at least THRESHOLD; otherwise the question is escalated. The small
+# answer is generated completely before anything is streamed, so a student never sees a
+# half answer that is then replaced. Session turns always go to the 70B, their KV state lives
+# there. Every request is logged to LOG_PATH with the tier that answered and the latencies;
+# pick THRESHOLD with cascade_replay.py.
+
+SMALL_MODEL_PATH = "./local_models/qwen2-1_5b-instruct-q4_0.gguf"
+THRESHOLD = -0.45
+LOG_PATH = Path("cascade_log.jsonl")
+
+
+class CascadeAdvisor:
+    def __init__(self, small: AdvisorSystem, large: AdvisorSystem, threshold: float = THRESHOLD, log_path: Optional[Path] = LOG_PATH):
+        self.small = small
+        self.large = large
+        self.threshold = threshold
+        self.log_path = Path(log_path) if log_path else None
+        self._log_lock = threading.Lock()
+        self.stats = {"requests": 0, "small": 0, "large": 0, "escalated": 0, "small_seconds": 0.0, "large_seconds": 0.0}
+        self.last_tier = None
+
+    @property
+    def escalation_rate(self) -> float:
+        answered_small_first = self.stats["small"] + self.stats["escalated"]
+        return self.stats["escalated"] / answered_small_first if answered_small_first else 0.0
+
+    def get_advice(self, user_query, manual_courses=None, session_id=None):
+        stream = self.get_advice_stream(user_query, manual_courses, session_id)
+        response_text = "".join(stream)
+        return response_text, stream.confidence
+
+    def get_advice_stream(self, user_query, manual_courses=None, session_id=None):
+        return AdviceStream(self._generate(user_query, manual_courses, session_id))
+
+    def _generate(self, user_query, manual_courses, session_id):
+        start = time.perf_counter()
+        record: Dict[str, Any] = {"time": time.time(), "session": session_id is not None}
+
+        small_confidence = None
+        if session_id is None:
+            small_start = time.perf_counter()
+            text, small_confidence = self.small.get_advice(user_query, manual_courses)
+            record["small_seconds"] = time.perf_counter() - small_start
+            record["small_confidence"] = small_confidence
+            self.stats["small_seconds"] += record["small_seconds"]
+
+            if small_confidence >= self.threshold:
+                yield text
+                return self._finish(record, "small", small_confidence, dict(self.small.last_timings), start)
+
+        large_start = time.perf_counter()
+        stream = self.large.get_advice_stream(user_query, manual_courses, session_id)
+        yield from stream
+        record["large_seconds"] = time.perf_counter() - large_start
+        self.stats["large_seconds"] += record["large_seconds"]
+        if small_confidence is not None:
+            self.stats["escalated"] += 1
+        return self._finish(record, "large", stream.confidence, dict(stream.timings or {}), start)
+
+    def _finish(self, record, tier, confidence, timings, start):
+        self.stats["requests"] += 1
+        self.stats[tier] += 1
+        self.last_tier = tier
+        record.update({
+            "tier": tier,
+            "escalated": tier == "large" and "small_confidence" in record,
+            "confidence": confidence,
+            "total_seconds": time.perf_counter() - start,
+        })
+        timings.update(tier=tier, total_seconds=record["total_seconds"])
+        if self.log_path:
+            with self._log_lock, open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+        return confidence, timings
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Chat with the small -> 70B cascade")
+    parser.add_argument("--small", default=SMALL_MODEL_PATH)
+    parser.add_argument("--large", default=MODEL_PATH)
+    parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    args = parser.parse_args()
+
+    cascade = CascadeAdvisor(AdvisorSystem(args.small, plot=False), AdvisorSystem(args.large), args.threshold)
+    print("\n--- WPI AI Advisor (cascade) Ready! (Type 'quit' to exit) ---")
+    while True:
+        user_input = input("\nStudent: ")
+        if user_input.lower() in ['quit', 'exit']:
+            break
+
+        stream = cascade.get_advice_stream(user_input, manual_courses=["CS4341"])
+        print("\nModel Response: ", end="", flush=True)
+        for piece in stream:
+            print(piece, end="", flush=True)
+        print()
+        print(f"\n[System] Answered by the {cascade.last_tier} model, confidence {stream.confidence:.4f}, {stream.timings['total_seconds']:.2f}s")
+        print(f"[System] Escalation rate so far: {cascade.escalation_rate:.0%}")
@@ -0,0 +1,142 @@
+import argparse
+import json
+import re
+import statistics
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+
+# Offline threshold picker for cascade.py
+#
+# Step 1 (needs both models): every prompt is answered by the small and the large model and
+# the confidences, latencies and texts are saved to a records JSONL.
+# Step 2 (no models): for each candidate threshold, simulate the cascade on those records:
+# latency = small latency (+ large latency when escalated), quality = token F1 of the answer
+# that would have been returned against the reference answer ("output" in the fine-tuning
+# data), or against the 70B's own answer when the prompt set has none.
+#
+#   python cascade_replay.py --prompts json_data/fine_tuning_transformed.json --limit 50
+#   python cascade_replay.py --records cascade_replay.jsonl   # re-sweep without the models
+
+PROMPTS_PATH = Path("json_data/fine_tuning_transformed.json")
+RECORDS_PATH = Path("cascade_replay.jsonl")
+WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def token_f1(answer: str, reference: str) -> float:
+    a = Counter(WORD_RE.findall(answer.lower()))
+    b = Counter(WORD_RE.findall(reference.lower()))
+    overlap = sum((a & b).values())
+    if not overlap:
+        return 0.0
+    precision = overlap / sum(a.values())
+    recall = overlap / sum(b.values())
+    return 2 * precision * recall / (precision + recall)
+
+
+def load_prompts(path: Path, limit: int) -> List[Dict[str, Any]]:
+    """Fine-tuning style JSON (instruction/output) or a JSONL prompt file (see batch_inference.py)."""
+    if path.suffix == ".jsonl":
+        from batch_inference import iter_requests
+        prompts = [{"prompt": r["prompt"], "manual_courses": r["manual_courses"], "reference": None} for r in iter_requests(path)]
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            prompts = [{"prompt": e["instruction"], "manual_courses": [], "reference": e.get("output")} for e in json.load(f)]
+    return prompts[:limit] if limit else prompts
+
+
+def replay(prompts: List[Dict[str, Any]], small_path: str, large_path: str, out_path: Path) -> List[Dict[str, Any]]:
+    from model_inference import AdvisorSystem
+
+    # Both tiers answer everything, caches and the PCA graph would only skew the timings
+    options = {"plot": False, "response_cache": False}
+    tiers = {"small": AdvisorSystem(small_path, **options), "large": AdvisorSystem(large_path, **options)}
+
+    records = []
+    with open(out_path, "w", encoding="utf-8") as out:
+        for i, prompt in enumerate(prompts):
+            record = {"prompt": prompt["prompt"], "reference": prompt["reference"]}
+            for tier, advisor in tiers.items():
+                start = time.perf_counter()
+                text, confidence = advisor.get_advice(prompt["prompt"], prompt["manual_courses"])
+                record[tier] = {"text": text, "confidence": confidence, "seconds": time.perf_counter() - start}
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+            records.append(record)
+            print(f"[Replay] {i + 1}/{len(prompts)}  small {record['small']['confidence']:.3f}  large {record['large']['confidence']:.3f}")
+    return records
+
+
+def read_records(path: Path) -> Iterator[Dict[str, Any]]:
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def sweep(records: List[Dict[str, Any]], thresholds: List[float]) -> List[Dict[str, float]]:
+    for r in records:
+        reference = r["reference"] or r["large"]["text"]
+        r["quality"] = {tier: token_f1(r[tier]["text"], reference) for tier in ("small", "large")}
+
+    rows = []
+    for threshold in thresholds:
+        latency, quality, escalated = [], [], 0
+        for r in records:
+            if r["small"]["confidence"] >= threshold:
+                latency.append(r["small"]["seconds"])
+                quality.append(r["quality"]["small"])
+            else:
+                escalated += 1
+                latency.append(r["small"]["seconds"] + r["large"]["seconds"])
+                quality.append(r["quality"]["large"])
+        rows.append({
+            "threshold": threshold,
+            "escalation_rate": escalated / len(records),
+            "mean_seconds": statistics.mean(latency),
+            "quality": statistics.mean(quality),
+        })
+    return rows
+
+
+def candidate_thresholds(records: List[Dict[str, Any]]) -> List[float]:
+    # Every observed small-model confidence is a point where the decision changes
+    values = sorted({round(r["small"]["confidence"], 4) for r in records})
+    return [float("-inf")] + values + [float("inf")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay prompts through both cascade tiers and pick a confidence threshold")
+    parser.add_argument("--prompts", type=Path, default=PROMPTS_PATH)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--records", type=Path, default=None, help="reuse a previous replay instead of running the models")
+    parser.add_argument("--out", type=Path, default=RECORDS_PATH)
+    parser.add_argument("--small", default=None, help="defaults to cascade.SMALL_MODEL_PATH")
+    parser.add_argument("--large", default=None, help="defaults to model_inference.MODEL_PATH")
+    parser.add_argument("--max-quality-drop", type=float, default=0.02, help="allowed quality loss vs. always using the 70B")
+    args = parser.parse_args()
+
+    if args.records:
+        records = list(read_records(args.records))
+    else:
+        from cascade import SMALL_MODEL_PATH
+        from model_inference import MODEL_PATH
+        records = replay(load_prompts(args.prompts, args.limit), args.small or SMALL_MODEL_PATH, args.large or MODEL_PATH, args.out)
+
+    rows = sweep(records, candidate_thresholds(records))
+    always_large = rows[-1]["quality"]  # threshold +inf escalates everything
+    large_only_seconds = statistics.mean(r["large"]["seconds"] for r in records)
+
+    print(f"{'threshold':>10} {'escalated':>10} {'mean latency (s)':>17} {'quality (F1)':>13}")
+    for row in rows:
+        print(f"{row['threshold']:10.4f} {row['escalation_rate']:10.0%} {row['mean_seconds']:17.2f} {row['quality']:13.3f}")
+
+    acceptable = [row for row in rows if row["quality"] >= always_large - args.max_quality_drop]
+    best = min(acceptable, key=lambda row: row["mean_seconds"])
+    print(f"\nRecommended THRESHOLD = {best['threshold']:.4f}: {best['escalation_rate']:.0%} escalated, "
+          f"{best['mean_seconds']:.2f}s mean latency, quality {best['quality']:.3f} (70B only: {always_large:.3f}, {large_only_seconds:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
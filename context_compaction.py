@@ -0,0 +1,278 @@
+import copy
+import json
+import re
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+# Shrinks the get_info payload before it goes into the prompt
+# The pretty-printed payload repeats every section field (term, days, time inside details, ...)
+# and a single course can cost thousands of prompt tokens, which is both prefill latency and
+# a real risk of overflowing CTX_SIZE. The stages below are applied in order until the
+# payload fits the per-request token budget.
+
+TokenCounter = Callable[[str], int]
+
+# A lowercase "a" before "term" is usually the article ("offered a term", "take a term off"),
+# so term A needs a capital letter or a hyphen ("a-term")
+TERM_LETTER_RE = re.compile(r"\b(?P<letter>(?-i:[A-E])|[b-e]|a(?=-))[\s-]?terms?\b", flags=re.IGNORECASE)
+SEASON_TERM_RE = re.compile(r"\b(?P<season>fall|spring|summer)\s+(?P<letter>(?-i:[A-E])|[b-e])\b", flags=re.IGNORECASE)
+SEASON_RE = re.compile(r"\b(?P<season>fall|spring|summer)\b", flags=re.IGNORECASE)
+
+LETTER_SEASON = {"A": "Fall", "B": "Fall", "C": "Spring", "D": "Spring", "E": "Summer"}
+
+
+def approx_token_count(text: str) -> int:
+    """Fallback when no tokenizer is available (~4 characters per token for English/JSON)."""
+    return (len(text) + 3) // 4
+
+
+def dumps_pretty(payload: Dict[str, Any]) -> str:
+    # Same formatting parse_user_string and transform_prompts have always used
+    return json.dumps(payload, indent=2, ensure_ascii=False)
+
+
+def dumps_minified(payload: Dict[str, Any]) -> str:
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+
+
+def detect_terms(text: str) -> Optional[Set[str]]:
+    """
+    Return the section groups (keys of a course's "sections") the message asks about,
+    or None when no term is mentioned. "A term" -> {"Fall A", "Fall S"}, since semester
+    sections also meet during A term; a bare "spring" -> every Spring group.
+    """
+    terms: Set[str] = set()
+    seasons: Set[str] = set()
+
+    for m in SEASON_TERM_RE.finditer(text):
+        letter = m.group("letter").upper()
+        season = m.group("season").capitalize()
+        terms.update({f"{season} {letter}", f"{season} S"})
+    for m in TERM_LETTER_RE.finditer(text):
+        letter = m.group("letter").upper()
+        season = LETTER_SEASON[letter]
+        terms.update({f"{season} {letter}", f"{season} S"})
+    if not terms:
+        seasons = {m.group("season").capitalize() for m in SEASON_RE.finditer(text)}
+
+    if not terms and not seasons:
+        return None
+    return terms | {f"season:{s}" for s in seasons}
+
+
+def _term_wanted(group: str, wanted: Set[str]) -> bool:
+    return group in wanted or f"season:{group.split(' ')[0]}" in wanted
+
+
+def _compact_section(section: Dict[str, Any]) -> Dict[str, Any]:
+    row = {k: v for k, v in section.items() if v not in ("", None)}
+
+    time = row.get("time", "")
+    details = row.get("details", "")
+    # details is "location | days | time"; keep only the location when the rest repeats "time"
+    if time and details.endswith(time) and details.count(" | ") == 2:
+        location = details[: -len(time)].rstrip(" |")
+        del row["details"]
+        if location:
+            row["location"] = location
+    elif details and details == time:
+        del row["details"]
+
+    days = row.get("days")
+    if days and time and days == "; ".join(part.split(" | ")[0] for part in time.split("; ")):
+        del row["days"]
+
+    return row
+
+
+def _hoist(rows: List[Dict[str, Any]]) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    """Split rows into (fields shared by every row, per-row remainder)."""
+    if not rows:
+        return {}, []
+    common = {k: v for k, v in rows[0].items() if all(r.get(k, object()) == v for r in rows[1:])}
+    rest = [{k: v for k, v in r.items() if k not in common} for r in rows]
+    return common, rest
+
+
+def compact_sections(sections: Dict[str, List[Dict[str, Any]]]) -> Dict[str, Any]:
+    """
+    {"Fall A": [section, ...]} -> {"shared": {...}, "Fall A": {...shared in term, "sections": [...]}}
+    Only the fields that actually differ are repeated per section.
+    """
+    groups: Dict[str, Dict[str, Any]] = {}
+    for group, rows in sections.items():
+        common, rest = _hoist([_compact_section(s) for s in rows])
+        rest = [r for r in rest if r]
+        groups[group] = dict(common, sections=rest) if rest else common
+
+    # Fields identical across every term (delivery mode, format, ...) move up one more level
+    shared, per_group = _hoist(
+        [{k: v for k, v in g.items() if k != "sections"} for g in groups.values()]
+    ) if len(groups) > 1 else ({}, None)
+
+    out: Dict[str, Any] = {"shared": shared} if shared else {}
+    for (group, g), trimmed in zip(groups.items(), per_group or groups.values()):
+        entry = dict(trimmed)
+        if "sections" in g:
+            entry["sections"] = g["sections"]
+        out[group] = entry
+    return out
+
+
+def _summarize_sections(sections: Dict[str, Any]) -> Dict[str, Any]:
+    """Last resort before dropping sections: only which terms run and their statuses."""
+    summary = {}
+    for group, entry in sections.items():
+        if group == "shared":
+            continue
+        statuses = [entry.get("status")] if "status" in entry else [s.get("status") for s in entry.get("sections", [])]
+        statuses = [s for s in statuses if s] or [sections.get("shared", {}).get("status", "")]
+        summary[group] = ", ".join(sorted(set(s for s in statuses if s)))
+    return summary
+
+
+def _background_first(description: str, limit: int) -> str:
+    """Shorten a description but keep the "Recommended background" sentence."""
+    if not description or len(description) <= limit:
+        return description
+    head, sep, background = description.partition("Recommended background")
+    head = head[:limit].rsplit(" ", 1)[0] + "..."
+    return f"{head} {sep}{background}".strip() if sep else head
+
+
+class CompactionReport:
+    def __init__(self, original_tokens: int, compacted_tokens: int, budget: Optional[int],
+                 steps: List[str], terms: Optional[Set[str]]):
+        self.original_tokens = original_tokens
+        self.compacted_tokens = compacted_tokens
+        self.budget = budget
+        self.steps = steps
+        self.terms = terms
+
+    @property
+    def saved_tokens(self) -> int:
+        return self.original_tokens - self.compacted_tokens
+
+    @property
+    def within_budget(self) -> bool:
+        return self.budget is None or self.compacted_tokens <= self.budget
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "original_tokens": self.original_tokens,
+            "compacted_tokens": self.compacted_tokens,
+            "saved_tokens": self.saved_tokens,
+            "budget": self.budget,
+            "within_budget": self.within_budget,
+            "steps": self.steps,
+            "terms": sorted(self.terms) if self.terms else None,
+        }
+
+
+class ContextCompactor:
+    """
+    Turns a get_info payload into the smallest prompt input that still fits `budget` tokens.
+
+    Stages (each only runs if the previous result is still over budget, except the first
+    three which always run since they lose no information for the question):
+      1. minified JSON
+      2. section de-duplication (location split out of details, shared fields hoisted)
+      3. sections filtered to the term the student asked about
+      4. keywords dropped
+      5. descriptions shortened (recommended background kept)
+      6. sections reduced to per-term status for lower-priority courses, then for all
+      7. lower-priority courses dropped (manual/hard-coded courses before ones the student typed)
+    """
+
+    def __init__(self, count_tokens: TokenCounter = approx_token_count, description_chars: int = 300):
+        self.count_tokens = count_tokens
+        self.description_chars = description_chars
+
+    def compact(
+        self,
+        payload: Dict[str, Any],
+        message: str = "",
+        budget: Optional[int] = None,
+        priority_codes: Iterable[str] = (),
+    ) -> Tuple[str, CompactionReport]:
+        original_tokens = self.count_tokens(dumps_pretty(payload))
+        terms = detect_terms(message)
+        priority = {c.upper() for c in priority_codes}
+
+        payload = copy.deepcopy(payload)
+        courses: List[Dict[str, Any]] = payload.get("courses_info", [])
+        # Courses the student named come first so truncation removes the others first
+        courses.sort(key=lambda c: c.get("normalized_code", "").upper() not in priority)
+        steps = ["minify"]
+
+        for course in courses:
+            if "sections" not in course:
+                continue
+            sections = course["sections"]
+            if terms is not None:
+                sections = {g: s for g, s in sections.items() if _term_wanted(g, terms)}
+            course["sections"] = compact_sections(sections)
+        steps.append("dedupe_sections")
+        if terms is not None:
+            steps.append("filter_terms")
+
+        def fits() -> Tuple[bool, str, int]:
+            text = dumps_minified(payload)
+            n = self.count_tokens(text)
+            return (budget is None or n <= budget), text, n
+
+        ok, text, n = fits()
+
+        truncations: List[Tuple[str, Callable[[], bool]]] = [
+            ("drop_keywords", lambda: _drop_field(courses, "keywords")),
+            ("shorten_descriptions", lambda: _shorten_descriptions(courses, self.description_chars)),
+        ]
+        # Summarize sections course by course, lowest priority (last) first
+        for i in reversed(range(len(courses))):
+            truncations.append((f"summarize_sections:{courses[i].get('normalized_code')}",
+                                lambda c=courses[i]: _summarize_course_sections(c)))
+        for i in reversed(range(1, len(courses))):
+            truncations.append((f"drop_course:{courses[i].get('normalized_code')}",
+                                lambda c=courses[i]: _drop_course(courses, c)))
+
+        for name, apply in truncations:
+            if ok:
+                break
+            if apply():
+                steps.append(name)
+                ok, text, n = fits()
+
+        return text, CompactionReport(original_tokens, n, budget, steps, terms)
+
+
+def _drop_field(courses: List[Dict[str, Any]], field: str) -> bool:
+    changed = False
+    for course in courses:
+        if course.pop(field, None) is not None:
+            changed = True
+    return changed
+
+
+def _shorten_descriptions(courses: List[Dict[str, Any]], limit: int) -> bool:
+    changed = False
+    for course in courses:
+        desc = course.get("description")
+        short = _background_first(desc, limit) if isinstance(desc, str) else desc
+        if short != desc:
+            course["description"] = short
+            changed = True
+    return changed
+
+
+def _summarize_course_sections(course: Dict[str, Any]) -> bool:
+    if "sections" not in course or "terms_offered" in course:
+        return False
+    course["terms_offered"] = _summarize_sections(course.pop("sections"))
+    return True
+
+
+def _drop_course(courses: List[Dict[str, Any]], course: Dict[str, Any]) -> bool:
+    for i, c in enumerate(courses):
+        if c is course:
+            del courses[i]
+            return True
+    return False
@@ -0,0 +1,80 @@
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+from llama_cpp import Llama
+
+# Embeddings for the PCA graph, kept off the 70B generation model unless asked for
+#
+#   "small" - a separate embedding GGUF on the CPU (EMBEDDING_MODEL_PATH in model_inference.py),
+#             milliseconds per question and it never touches the generation model's KV cache
+#   "main"  - the generation model itself, the original behaviour: a full extra forward pass
+#             through the 70B per request, needs embedding=True and clears its KV cache
+#   "none"  - no embeddings, the PCA graph is skipped
+
+BACKENDS = ("small", "main", "none")
+
+
+def model_id(metadata: Dict[str, str], model_path: str) -> str:
+    """
+    Which embedding model this is, from its GGUF metadata (name, architecture, quantization, width),
+    so semantic_index.py re-embeds the catalog for a different model but not for a touched or copied file.
+    """
+    arch = metadata.get("general.architecture", "")
+    parts = [metadata.get("general.name") or Path(model_path).name, arch,
+             metadata.get("general.file_type", ""), metadata.get(f"{arch}.embedding_length", "")]
+    return "|".join(parts)
+
+
+def pool(raw) -> np.ndarray:
+    """Mean-pool per-token embeddings (models without a pooling layer return one row per token)."""
+    embedding = np.asarray(raw, dtype=np.float32)
+    if embedding.ndim == 2:
+        embedding = embedding.mean(axis=0)
+    return embedding
+
+
+class SmallModelEmbedder:
+    clears_kv = False
+
+    def __init__(self, model_path: str, n_ctx: int = 512, n_gpu_layers: int = 0):
+        self.llm = Llama(model_path=model_path, embedding=True, n_ctx=n_ctx, n_gpu_layers=n_gpu_layers, verbose=False)
+        self._lock = threading.Lock()  # retrieval threads may embed at the same time
+        self.model_id = model_id(getattr(self.llm, "metadata", None) or {}, model_path)
+
+    def embed(self, text: str) -> np.ndarray:
+        with self._lock:
+            return pool(self.llm.embed(text, truncate=True))
+
+
+class MainModelEmbedder:
+    clears_kv = True  # callers must release a live session first
+
+    HIDDEN_SIZE = 8192
+
+    def __init__(self, llm: Llama):
+        self.llm = llm
+
+    def embed(self, text: str) -> np.ndarray:
+        raw_embed_response = self.llm.create_embedding(text)
+        if 'data' not in raw_embed_response or len(raw_embed_response['data']) == 0:
+            return np.zeros(self.HIDDEN_SIZE, dtype=np.float32)
+
+        embedding_np = np.asarray(raw_embed_response['data'][0]['embedding'], dtype=np.float32)
+        if embedding_np.ndim == 1 and embedding_np.size > self.HIDDEN_SIZE:
+            embedding_np = embedding_np.reshape(-1, self.HIDDEN_SIZE)
+        return pool(embedding_np)
+
+
+def make_embedder(backend: str, llm: Optional[Llama] = None, model_path: Optional[str] = None):
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend {backend!r}, expected one of {BACKENDS}")
+    if backend == "main":
+        return MainModelEmbedder(llm)
+    if backend == "small":
+        if model_path is None or not Path(model_path).exists():
+            print(f"[Embeddings] {model_path} not found, PCA graph disabled (set EMBEDDING_BACKEND = \"main\" to use the generation model)")
+            return None
+        return SmallModelEmbedder(model_path)
+    return None
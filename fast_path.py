@@ -0,0 +1,340 @@
+import re
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from context_compaction import detect_terms
+
+# Deterministic answers for pure catalog lookups, so they never reach the LLM
+#
+# Sits in front of AdvisorSystem's generation: the question is checked against a few intent
+# patterns (recommended background, which terms a course runs, section times, instructors,
+# seat status, the text of one degree requirement) and answered from a template filled with the
+# get_info payload retrieve() already built. Course intents need exactly one course named in
+# the message, a lookup phrase for the intent ("when does X meet", "who teaches X", "is X full")
+# and nothing else: a question with content words outside the intent's own, the term and the
+# filler words ("does CS 4341 cover state space search?") falls through to the model, as does
+# anything that asks for judgement ("should", "same time", "before", "is X a prerequisite for Y",
+# ...) or matches more than one intent.
+#
+#   python fast_path.py   # share of the fine-tuning questions answered here, and how many agree with the reference
+
+INTENTS = ("background", "offered", "sections", "requirement")
+
+# Asking for advice, a comparison or a yes/no about a relation between things
+FALLTHROUGH_RE = re.compile(
+    r"\b(should|best|reasonable|recommend(?!ed background)|good|worth|hard|difficult|easy|together|both|overload"
+    r"|before|after|order|compare|difference|better|why|how (?:hard|many|long)|relevant|count|instead|possible"
+    r"|can i|same (?:time|term|semester)|an? (?:prereq\w*|requirement)|usually taken)\b"
+)
+# Lookup phrases, matched after the course code is replaced by "@" (see COURSE_CODE_RE)
+BACKGROUND_Q_RE = re.compile(r"\b(background|prereq(?:uisite)?s?)\b")
+OFFERED_Q_RE = re.compile(r"\b(offered|occurs?|run|held|which terms?|what terms?|when is @ (?:taught|given))\b")
+SECTION_Q_RE = {
+    "time": re.compile(r"(\bwhat times?|\bmeeting (?:times?|days?)|\b(?:what|which) days|(?:@|\bit) meets?|\btimes? (?:for|of) @)\b"),
+    "instructor": re.compile(r"\b(who (?:is |'s )?teach(?:es|ing)|who'?s teaching|who is the (?:professor|instructor|prof)|instructors?|professors?|prof|taught by)\b"),
+    "status": re.compile(
+        r"(\b(?:is|are) (?:@|it|the (?:class|course)|(?:the |any )?sections?(?: of @)?) (?:still )?(?:open|closed|full|wait ?listed|cancell?ed)"
+        r"|\b(?:open |available )?seats?|\bspots? (?:left|available|open)|\bwait ?list(?:ed)?|\bstatus)\b"
+    ),
+}
+COURSE_CODE_RE = re.compile(r"\b[a-z]{2,4}\s?-?\d{3,4}x?\b")
+WORD_RE = re.compile(r"[a-z0-9@]+")
+
+# Words a lookup question may contain besides its intent's own; anything else falls through
+FILLER_WORDS = set(
+    "@ a an the is are was be will does do did it its this that there any what which when where who how i im m s me my "
+    "am in on at for of to and or with about still also currently now please tell know want wondering interested "
+    "taking take course courses class classes section sections lecture lectures lab labs".split()
+)
+TERM_WORDS = set("term terms semester semesters fall spring summer a b c d e1 e2 quarter session year next".split())
+INTENT_WORDS = {
+    "background": set("background recommended suggested required prerequisite prerequisites prereq prereqs need needed".split()),
+    "offered": set("offered occur occurs usually typically run runs held taught given".split()),
+    "time": set(
+        "time times meet meets meeting days day schedule scheduled held location room monday mondays tuesday tuesdays "
+        "wednesday wednesdays thursday thursdays friday fridays".split()
+    ),
+    "instructor": set("teaches teaching teach taught by professor professors instructor instructors prof".split()),
+    "status": set("open closed full seats seat spots spot left available waitlist waitlisted wait list cancelled canceled status".split()),
+}
+REQUIREMENT_Q_RE = re.compile(r"\brequirements?\b")
+SEMESTER_RE = re.compile(r"\b(?P<letter>[fs])[\s-]?semesters?\b")
+
+BACKGROUND_RE = re.compile(
+    r"\b(?P<label>(?:Recommended|Suggested|Required) [Bb]ackground|Prerequisites?|Students (?:should|must) have)"
+    r"\s*:?\s*(?P<text>[^.]*(?:\.\d[^.]*)*)"
+)
+
+# Names students use for the requirement keys in degrees.json, on top of the key itself
+REQUIREMENT_ALIASES = {
+    "Humanities": ["hua", "humanities and arts", "humanities"],
+    "Wellness And Physical Education": ["wellness", "physical education", "pe", "wpe"],
+    "Social Science": ["social science", "social sciences"],
+    "The Interactive Qualifying Project (IQP)": ["iqp", "interactive qualifying project"],
+    "Free Electives": ["free elective", "free electives"],
+    "Mathematics": ["math", "mathematics"],
+    "Mathematical Sciences": ["math", "mathematical sciences", "mathematics"],
+    "Basic Science and/or Engineering Science": ["basic science", "engineering science", "science"],
+    "Science": ["science"],
+    "Data Science Core": ["data science core", "ds core"],
+    "Computer Science": ["computer science", "cs"],
+    "Business Courses": ["business"],
+    "Disciplinary Elective Courses": ["disciplinary elective", "disciplinary electives"],
+    "Data Privacy and Ethics": ["data privacy", "ethics", "data privacy and ethics"],
+    "MQP": ["mqp", "major qualifying project"],
+}
+
+
+def display_code(code: str) -> str:
+    # "CS4341" -> "CS 4341", the way the catalog and the reference answers write it
+    return re.sub(r"^([A-Z]+)\s*", r"\1 ", code.upper())
+
+
+def other_words(text: str, intents: List[str]) -> Set[str]:
+    """Words of the question (course code already "@") that aren't filler, term or the intents' own words."""
+    allowed = FILLER_WORDS | TERM_WORDS
+    for intent in intents:
+        allowed = allowed | INTENT_WORDS[intent]
+    return {w for w in WORD_RE.findall(text) if w not in allowed and not w.isdigit()}
+
+
+def wanted_groups(text: str) -> Optional[Set[str]]:
+    """Section groups the question is limited to (see context_compaction.detect_terms), None = all."""
+    wanted = detect_terms(text) or set()
+    for m in SEMESTER_RE.finditer(text):
+        wanted.add("Fall S" if m.group("letter") == "f" else "Spring S")
+    return wanted or None
+
+
+def group_wanted(group: str, wanted: Optional[Set[str]]) -> bool:
+    return wanted is None or group in wanted or f"season:{group.split(' ')[0]}" in wanted
+
+
+def live_sections(course: Dict[str, Any]) -> List[Tuple[str, Dict[str, Any]]]:
+    return [
+        (group, s)
+        for group, sections in (course.get("sections") or {}).items()
+        for s in sections
+        if not s.get("status", "").startswith("Cancel")
+    ]
+
+
+def location(section: Dict[str, Any]) -> str:
+    # details is "location | days | time"
+    details, when = section.get("details", ""), section.get("time", "")
+    if when and details.endswith(when):
+        return details[: -len(when)].rstrip(" |")
+    return ""
+
+
+class FastAnswer:
+    def __init__(self, intent: str, text: str, seconds: float):
+        self.intent = intent
+        self.text = text
+        self.seconds = seconds
+
+
+class FastPathRouter:
+    def __init__(self):
+        self.stats: Dict[str, int] = {"requests": 0, "fallthrough": 0, **{intent: 0 for intent in INTENTS}}
+        self._requirement_res = {
+            key: re.compile(
+                r"\b(?:" + "|".join(re.escape(a) for a in aliases) + r")\b(?:\s+\w+)?\s+requirements?\b"
+                r"|\brequirements?\s+(?:for|of)\s+(?:the\s+)?(?:" + "|".join(re.escape(a) for a in aliases) + r")\b"
+            )
+            for key, aliases in REQUIREMENT_ALIASES.items()
+        }
+
+    def route(self, user_query: str, parsed: Dict[str, Any]) -> Optional[FastAnswer]:
+        """Answer `user_query` from the retrieved payload (parse_user_string's result), or None to use the model."""
+        start = time.perf_counter()
+        self.stats["requests"] += 1
+        answer = self._answer(user_query.lower(), parsed)
+        if answer is None:
+            self.stats["fallthrough"] += 1
+            return None
+        intent, text = answer
+        self.stats[intent] += 1
+        return FastAnswer(intent, text, time.perf_counter() - start)
+
+    def _answer(self, text: str, parsed: Dict[str, Any]) -> Optional[Tuple[str, str]]:
+        if FALLTHROUGH_RE.search(text):
+            return None
+        payload = parsed.get("payload") or {}
+        mentioned = parsed.get("mentioned_courses") or []
+
+        if not mentioned:
+            return self._requirement(text, payload.get("degree_info"))
+        if len(mentioned) != 1:
+            return None
+        course = next((c for c in payload.get("courses_info", []) if c.get("normalized_code") == mentioned[0]), None)
+        if course is None or course.get("found") is False:
+            return None
+
+        question = COURSE_CODE_RE.sub("@", text)
+        fields = [field for field, pattern in SECTION_Q_RE.items() if pattern.search(question)]
+        matched = [
+            intent for intent, hit in (
+                ("background", BACKGROUND_Q_RE.search(question)),
+                ("offered", OFFERED_Q_RE.search(question)),
+                ("sections", fields),
+            ) if hit
+        ]
+        if len(matched) != 1:
+            return None
+        intent = matched[0]
+        if other_words(question, fields if intent == "sections" else [intent]):
+            return None
+        if intent == "background":
+            return intent, self._background(course)
+        if intent == "offered":
+            return intent, self._offered(course, text, wanted_groups(text))
+        return intent, self._sections(course, fields, wanted_groups(text))
+
+    def _background(self, course: Dict[str, Any]) -> str:
+        name = f"{display_code(course['normalized_code'])}: {course.get('title')}"
+        found = []
+        for m in BACKGROUND_RE.finditer(course.get("description") or ""):
+            body = m.group("text").strip()
+            if body.endswith(")") and body.count(")") > body.count("("):
+                body = body[:-1]  # "(Prerequisites: ...)" wraps the whole sentence
+            if body:
+                found.append((m.group("label"), body))
+        if not found:
+            return f"The catalog description of {name} doesn't list a recommended background or prerequisites."
+        return " ".join(f"{name}. {label.capitalize()}: {body}." for label, body in found)
+
+    def _offered(self, course: Dict[str, Any], text: str, wanted: Optional[Set[str]]) -> str:
+        name = f"{display_code(course['normalized_code'])}: {course.get('title')}"
+        terms = []
+        for _, section in live_sections(course):
+            if section.get("term") and section["term"] not in terms:
+                terms.append(section["term"])
+        if not terms:
+            return f"{name} has no sections in the current schedule."
+
+        listed = f"{name} has sections in: {', '.join(terms)}."
+        if wanted is None or " or " in text:
+            return listed
+        asked = {group for group, _ in live_sections(course) if group_wanted(group, wanted)}
+        return ("Yes. " if asked else "No, not in that term. ") + listed
+
+    def _sections(self, course: Dict[str, Any], fields: List[str], wanted: Optional[Set[str]]) -> str:
+        name = f"{display_code(course['normalized_code'])}: {course.get('title')}"
+        sections = [s for group, s in live_sections(course) if group_wanted(group, wanted)]
+        if not sections:
+            return f"{name} has no sections {'in that term ' if wanted else ''}in the current schedule."
+
+        lines = [f"{name} sections:"]
+        for s in sections:
+            parts = [f"{s.get('term')} {s.get('format') or 'section'}"]
+            if "time" in fields:
+                where = location(s)
+                parts.append((s.get("time") or "time TBA") + (f", {where}" if where else "") + f" ({s.get('delivery_mode', 'In-Person')})")
+            if "instructor" in fields:
+                parts.append(s.get("instructor") or "instructor TBA")
+            if "status" in fields:
+                parts.append(s.get("status") or "status unknown")
+            lines.append("- " + " | ".join(parts))
+        return "\n".join(lines)
+
+    def _requirement(self, text: str, degree: Optional[Dict[str, Any]]) -> Optional[Tuple[str, str]]:
+        if not degree or not degree.get("found") or not REQUIREMENT_Q_RE.search(text):
+            return None
+        requirements = degree["requirements"]
+        keys = [key for key in requirements if key in self._requirement_res and self._requirement_res[key].search(text)]
+        if len(keys) != 1:
+            return None
+        return "requirement", f"{degree['name']}, {keys[0]} requirement: {requirements[keys[0]]}"
+
+
+# Reference-agreement checks for the report, the reference answers are free text
+CODE_RE = re.compile(r"\b([A-Z]{2,4})\s?(\d{3,4})\b")
+TERM_WORD_RE = re.compile(r"\b([a-d])[\s-]?terms?\b|\b(fall|spring)\b|\(([fs])\)|\b([fs]) semester\b", flags=re.IGNORECASE)
+NUMBER_RE = re.compile(r"\b\d+\b")
+
+
+def _codes(text: str) -> Set[str]:
+    return {a + b for a, b in CODE_RE.findall(text)}
+
+
+def _terms(text: str) -> Set[str]:
+    found = set()
+    for m in TERM_WORD_RE.finditer(text):
+        letter, season, short, semester = m.groups()
+        if letter:
+            found.add(letter.upper())
+        else:
+            found.add({"f": "fall", "s": "spring"}.get((short or semester or "").lower(), (season or "").lower()))
+    for m in re.finditer(r"\b20\d\d (Fall|Spring) ([A-D]) Term|\b20\d\d (Fall|Spring) Semester", text):
+        found.add(m.group(2) if m.group(2) else m.group(3).lower())
+    return found
+
+
+def agrees(intent: str, question: str, answer: str, reference: str) -> Optional[bool]:
+    """Whether the fast answer states the same facts as the reference, None when it can't be judged."""
+    if intent == "background":
+        asked = _codes(question)
+        ours, theirs = _codes(answer) - asked, _codes(reference) - asked
+        return bool(ours & theirs) if theirs else not ours
+    if intent == "offered":
+        theirs = _terms(reference)
+        if not theirs:
+            return None
+        seasons = {"A": "fall", "B": "fall", "C": "spring", "D": "spring"}
+        ours = _terms(answer)
+        ours |= {seasons[t] for t in ours if t in seasons}
+        return bool(theirs & ours)
+    if intent == "requirement":
+        return set(NUMBER_RE.findall(reference)) <= set(NUMBER_RE.findall(answer))
+    return None  # sections: the references predate the scraped schedule
+
+
+def main():
+    import argparse
+    import json
+    import statistics
+    from collections import defaultdict
+
+    from input_parser import parse_user_string
+
+    parser = argparse.ArgumentParser(description="Coverage and accuracy of the fast path on a set of questions")
+    parser.add_argument("--prompts", default="json_data/fine_tuning_transformed.json")
+    parser.add_argument("--show", action="store_true", help="print every answered question")
+    args = parser.parse_args()
+
+    with open(args.prompts, "r", encoding="utf-8") as f:
+        entries = json.load(f)
+
+    router = FastPathRouter()
+    by_intent = defaultdict(list)
+    route_seconds = []
+    for e in entries:
+        parsed = parse_user_string(e["instruction"])
+        answer = router.route(e["instruction"], parsed)
+        if answer is None:
+            continue
+        route_seconds.append(answer.seconds)
+        verdict = agrees(answer.intent, e["instruction"], answer.text, e["output"])
+        by_intent[answer.intent].append(verdict)
+        if args.show:
+            print(f"[{answer.intent}, {verdict}] {e['instruction']}\n  fast: {answer.text}\n  ref:  {e['output'][:200]}\n")
+
+    handled = sum(len(v) for v in by_intent.values())
+    print(f"{'intent':>12} {'answered':>9} {'judged':>7} {'agree':>7}")
+    judged_total = agree_total = 0
+    for intent in INTENTS:
+        verdicts = by_intent.get(intent, [])
+        judged = [v for v in verdicts if v is not None]
+        judged_total += len(judged)
+        agree_total += sum(judged)
+        accuracy = f"{sum(judged) / len(judged):.0%}" if judged else "-"
+        print(f"{intent:>12} {len(verdicts):9d} {len(judged):7d} {accuracy:>7}")
+    print(f"\nFast path answered {handled}/{len(entries)} questions ({handled / len(entries):.1%}), "
+          f"{agree_total}/{judged_total} judged answers agree with the reference")
+    if route_seconds:
+        print(f"Routing + templating: {statistics.median(route_seconds) * 1e6:.0f} us median per answered question")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,24 @@
 from unsloth import FastLanguageModel
 import torch
-from trl import SFTTrainer
-from transformers import TrainingArguments
-from datasets import load_dataset
+from transformers import Trainer, TrainingArguments
+from datasets import Dataset
 import matplotlib.pyplot as plt
 import json
 import os
+from pathlib import Path
+from training_data import prepare, make_plan, batch_report, print_report, PlanCollator
 
 MODEL_NAME = "unsloth/Llama-3.3-70B-Instruct-bnb-4bit" # unsloth has over 1000 models to choose from on their huggingface page
 NEW_MODEL_NAME = "wpi-advisor-70b"
 MAX_SEQ_LENGTH = 4096  # 4096 fits comfortably on an NVIDIA H100
 DTYPE = None # auto-detect (float16 or bfloat16)
 LOAD_IN_4BIT = True
+TRAIN_DATA = Path("json_data/fine_tuning_transformed.json")
+BATCH_SIZE = 2
+GRADIENT_ACCUMULATION_STEPS = 4
+# "bucketed" = examples of similar length batched together, "packed" = several examples per row (kept apart
+# by position_ids, needs flash-attention varlen), "padded" = random batches like the old SFTTrainer run (see training_data.py)
+BATCHING = "bucketed"
 
 model, tokenizer = FastLanguageModel.from_pretrained(
     model_name = MODEL_NAME,
@@ -21,32 +28,18 @@ model, tokenizer = FastLanguageModel.from_pretrained(
 )
 
 # Alpaca format is used to map prompts into a consistent format (no messy JSON)
-# This same exact format is used during inference to maximize performance on the fine-tuned data
-alpaca_prompt = """Below is an instruction that describes a task, paired with an input that provides further context. Write a response that appropriately completes the request.
+# This same exact format is used during inference to maximize performance on the fine-tuned data (training_data.ALPACA_PROMPT)
+# Tokenized once into dataset_cache/, re-runs with the same data, tokenizer and template just memmap it
+prepared = prepare(TRAIN_DATA, tokenizer, MAX_SEQ_LENGTH)
+print(f"{len(prepared)} examples, {prepared.meta['tokens']} tokens ({prepared.meta['truncated']} truncated to {MAX_SEQ_LENGTH})")
 
-### Instruction:
-{}
-
-### Input:
-{}
-
-### Response:
-{}"""
-
-EOS_TOKEN = tokenizer.eos_token # end-of-sequence token is necessary, otherwise model can generate forever
-
-def formatting_prompts_func(examples):
-    instructions = examples["instruction"]
-    inputs = examples["input"]
-    outputs = examples["output"]
-    texts = []
-    for instruction, input, output in zip(instructions, inputs, outputs):
-        text = alpaca_prompt.format(instruction, input, output) + EOS_TOKEN
-        texts.append(text)
-    return { "text" : texts, }
-
-dataset = load_dataset("json", data_files="json_data/fine_tuning_transformed.json", split="train")
-dataset = dataset.map(formatting_prompts_func, batched = True)
+# The batches are fixed up front, the Trainer only shuffles their order (one batch per dataset row)
+plan = make_plan(BATCHING, prepared.lengths, BATCH_SIZE, MAX_SEQ_LENGTH, seed = 3407)
+print_report({mode: batch_report(make_plan(mode, prepared.lengths, BATCH_SIZE, MAX_SEQ_LENGTH), prepared.lengths, GRADIENT_ACCUMULATION_STEPS)
+              for mode in ("padded", "bucketed", "packed")})
+print(f"Training with {BATCHING} batches")
+dataset = Dataset.from_dict({"batch": list(range(len(plan)))})
+pad_token_id = tokenizer.pad_token_id if tokenizer.pad_token_id is not None else tokenizer.eos_token_id
 
 model = FastLanguageModel.get_peft_model(
     model,
@@ -62,19 +55,17 @@ model = FastLanguageModel.get_peft_model(
     loftq_config = None, 
 )
 
-trainer = SFTTrainer(
+trainer = Trainer(
     model = model,
     tokenizer = tokenizer,
     train_dataset = dataset,
-    dataset_text_field = "text",
-    max_seq_length = MAX_SEQ_LENGTH,
-    dataset_num_proc = 2,
-    packing = False,
+    data_collator = PlanCollator(prepared, plan, pad_token_id),
     args = TrainingArguments(
-        per_device_train_batch_size = 2,
-        gradient_accumulation_steps = 4,
+        per_device_train_batch_size = 1, # each row is already a batch of BATCH_SIZE (see above)
+        gradient_accumulation_steps = GRADIENT_ACCUMULATION_STEPS,
+        remove_unused_columns = False, # the collator needs the "batch" column
         warmup_steps = 5,
-        max_steps = 60, # change based on dataset size, 60 steps covers the ~200 prompts with batch 8
+        max_steps = 60, # change based on dataset size, 60 steps covers the ~200 prompts with batch 8 (packed needs fewer, see the report)
         learning_rate = 2e-4,
         fp16 = not torch.cuda.is_bf16_supported(),
         bf16 = torch.cuda.is_bf16_supported(),
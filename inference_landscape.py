@@ -0,0 +1,144 @@
+import os
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+from sklearn.decomposition import IncrementalPCA
+
+from tracing import get_tracer
+
+# The 3D "inference landscape" graph (PCA of question embeddings x confidence), kept off the
+# request path
+#
+# Points live in a preallocated float32 ring buffer, so memory stays at capacity x dim no
+# matter how long the process runs. The PCA is updated with partial_fit on the new points only
+# instead of being refit from scratch, and rendering happens on a background thread: any number
+# of render requests that arrive while it is busy (or within `debounce` seconds) become one render.
+
+PLOT_PATH = Path("live_inference_graph.png")
+MIN_POINTS = 3
+
+
+class InferenceLandscape:
+    def __init__(self, capacity: int = 512, path: Path = PLOT_PATH, debounce: float = 0.25):
+        self.capacity = capacity
+        self.path = Path(path)
+        self.debounce = debounce
+
+        self.embeddings: Optional[np.ndarray] = None  # (capacity, dim), allocated on the first point
+        self.confidences = np.zeros(capacity, dtype=np.float32)
+        self.labels: List[str] = [""] * capacity
+        self.total = 0  # points ever added, the next one goes to total % capacity
+        self._fitted = 0  # points already passed to the PCA
+        self.pca = IncrementalPCA(n_components=2)
+
+        self._lock = threading.Lock()
+        self._signal_lock = threading.Lock()  # keeps _dirty/_idle consistent for flush()
+        self._dirty = threading.Event()
+        self._idle = threading.Event()
+        self._idle.set()
+        self._thread: Optional[threading.Thread] = None
+        self.stats = {"points": 0, "render_requests": 0, "renders": 0, "render_seconds": 0.0}
+
+    def __len__(self) -> int:
+        return min(self.total, self.capacity)
+
+    def add(self, embedding: np.ndarray, confidence: float, label: str) -> None:
+        """Called on the request path, only copies one row."""
+        embedding = np.asarray(embedding, dtype=np.float32).ravel()
+        with self._lock:
+            if self.embeddings is None or self.embeddings.shape[1] != embedding.size:
+                # First point, or the embedding backend changed: start a new landscape
+                self.embeddings = np.zeros((self.capacity, embedding.size), dtype=np.float32)
+                self.total = self._fitted = 0
+                self.pca = IncrementalPCA(n_components=2)
+            slot = self.total % self.capacity
+            self.embeddings[slot] = embedding
+            self.confidences[slot] = confidence
+            self.labels[slot] = label
+            self.total += 1
+            self.stats["points"] += 1
+
+    def request_render(self) -> None:
+        self.stats["render_requests"] += 1
+        with self._signal_lock:
+            self._idle.clear()
+            self._dirty.set()
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._worker, name="landscape-render", daemon=True)
+            self._thread.start()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until the requested renders are written, e.g. before the process exits."""
+        return self._idle.wait(timeout)
+
+    def _snapshot(self):
+        with self._lock:
+            n = len(self)
+            if self.embeddings is None or n < MIN_POINTS:
+                return None
+            order = np.arange(self.total - n, self.total) % self.capacity  # oldest first
+            # Points that were overwritten before the worker got to them are simply never fitted
+            new = min(self.total - self._fitted, n)
+            self._fitted = self.total
+            return (
+                self.embeddings[order],
+                self.confidences[order],
+                [self.labels[i] for i in order],
+                new,
+            )
+
+    def _worker(self) -> None:
+        while True:
+            self._dirty.wait()
+            time.sleep(self.debounce)  # let a burst of updates pile up
+            self._dirty.clear()
+            try:
+                snapshot = self._snapshot()
+                if snapshot is not None:
+                    start = time.perf_counter()
+                    self._render(*snapshot)
+                    seconds = time.perf_counter() - start
+                    self.stats["renders"] += 1
+                    self.stats["render_seconds"] += seconds
+                    get_tracer().observe("plot_render", seconds)  # not part of any request's trace
+            except Exception as e:  # a failed plot must never take the advisor down
+                print(f"[Graph] Render failed: {e!r}")
+            with self._signal_lock:
+                if not self._dirty.is_set():
+                    self._idle.set()
+
+    def _render(self, embeddings: np.ndarray, confidences: np.ndarray, labels: List[str], new: int) -> None:
+        if new:
+            self.pca.partial_fit(embeddings[-new:])
+        coords = self.pca.transform(embeddings)
+
+        # Figure + Agg canvas instead of pyplot, which is not safe to use off the main thread
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+
+        x_vals = coords[:, 0]
+        y_vals = coords[:, 1]
+        z_vals = confidences  # prediction confidence
+
+        fig = Figure(figsize=(10, 7))
+        FigureCanvasAgg(fig)
+        ax = fig.add_subplot(111, projection='3d')
+
+        ax.scatter(x_vals, y_vals, z_vals, c=z_vals, cmap='viridis', s=60)
+
+        # Attach the response text to the point on the graph
+        for i, txt in enumerate(labels):
+            ax.text(x_vals[i], y_vals[i], z_vals[i], txt, size=8)
+
+        ax.set_xlabel('Input Variation 1')
+        ax.set_ylabel('Input Variation 2')
+        ax.set_zlabel('Model Prediction')
+        ax.set_title(f'WPI Advisor Inference Landscape (n={len(labels)})')
+
+        # Write next to the target and rename, so viewers never see a half-written PNG
+        tmp_path = self.path.with_name(self.path.stem + ".tmp" + self.path.suffix)
+        fig.savefig(tmp_path)
+        os.replace(tmp_path, self.path)
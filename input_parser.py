@@ -1,20 +1,23 @@
 import json
 import re
 from pathlib import Path
-from typing import Dict, Any, List, Optional, Set
+from typing import Dict, Any, List, Optional, Set, Collection, Iterable, Mapping, Tuple, Callable
 
 # Reuse script components from the fine-tuning prompt processor
 from json_data.transform_prompts import (
     get_info,
-    load_json,
     normalize_course_code,
     DEGREE_ALIAS_MAP,
 )
+from json_data.catalog_store import courses_store, degrees_store
+from json_data.catalog_binary import open_binary_catalog
+from context_compaction import ContextCompactor
+from tracing import span
 
 COURSES_PATH = Path("json_data/courses.json")
 DEGREES_PATH = Path("json_data/degrees.json")
 
-# Regex to find course codes
+# Regex to find course codes (legacy CS/DS only, the catalog-built MessageMatcher below covers every discipline)
 COURSE_CODE_RE = re.compile(
     r"\b(?P<prefix>cs|ds)\s*(?P<number>\d{4})\b",
     flags=re.IGNORECASE,
@@ -48,6 +51,97 @@ DEGREE_SYNONYMS: Dict[str, List[str]] = {
 }
 
 
+def _trie_pattern(words: Iterable[str]) -> str:
+    """
+    Compile literal words into a regex shaped like a trie, e.g. ["cs", "ce", "ch"] -> "c(?:e|h|s)".
+    At each position the regex engine walks one trie path instead of trying every word,
+    so matching cost depends on word length, not on how many words there are.
+    """
+    trie: Dict[str, Any] = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = {}  # end-of-word marker
+
+    def emit(node: Dict[str, Any]) -> str:
+        is_end = "" in node
+        branches = [re.escape(ch) + emit(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        if len(branches) == 1 and not is_end:
+            return branches[0]
+        group = "(?:" + "|".join(branches) + ")"
+        return group + "?" if is_end else group
+
+    return emit(trie)
+
+
+class MessageMatcher:
+    """
+    Finds course codes and degree phrases in one left-to-right pass over a message.
+
+    Built once from the catalog: the discipline prefixes (every prefix in courses.json)
+    and the degree synonyms are compiled into trie-shaped alternations inside a single
+    regex. Degree phrases are matched in a zero-width lookahead so they never consume text
+    a course code might need, mirroring the old substring check.
+    """
+
+    def __init__(self, prefixes: Iterable[str], degree_synonyms: Dict[str, List[str]] = DEGREE_SYNONYMS):
+        self.prefixes = sorted({p.lower() for p in prefixes})
+        self.phrase_to_degree: Dict[str, str] = {}
+        self.degree_rank: Dict[str, int] = {}
+        for rank, (degree_id, phrases) in enumerate(degree_synonyms.items()):
+            self.degree_rank[degree_id] = rank
+            for phrase in phrases:
+                self.phrase_to_degree.setdefault(phrase.lower(), degree_id)
+
+        code_part = (
+            rf"\b(?P<prefix>{_trie_pattern(self.prefixes)})\s*(?P<number>\d{{4}}|\d{{3}}x?)\b"
+        )
+        degree_part = rf"(?=(?P<degree>{_trie_pattern(self.phrase_to_degree)}))"
+        # Patterns are lower-case and the message is lowered once, which is cheaper than re.IGNORECASE
+        self.pattern = re.compile(f"{code_part}|{degree_part}")
+
+    def match(self, text: str) -> Tuple[Set[str], Optional[str]]:
+        """Return (normalized course codes, degree ID or None) found in `text`."""
+        codes: Set[str] = set()
+        degree_id: Optional[str] = None
+
+        for m in self.pattern.finditer(text.lower()):
+            phrase = m.group("degree")
+            if phrase is None:
+                codes.add(normalize_course_code(m.group("prefix") + m.group("number")))
+                continue
+            found = self.phrase_to_degree[phrase]
+            # Same tie-break as extract_degree_id: the first degree in DEGREE_SYNONYMS wins
+            if degree_id is None or self.degree_rank[found] < self.degree_rank[degree_id]:
+                degree_id = found
+
+        return codes, degree_id
+
+
+def build_matcher(catalog_codes: Iterable[str]) -> MessageMatcher:
+    prefixes = set()
+    for code in catalog_codes:
+        m = re.match(r"[A-Za-z]+", code)
+        if m:
+            prefixes.add(m.group(0))
+    return MessageMatcher(prefixes)
+
+
+_MATCHER_CACHE: List[Tuple[Mapping[str, Any], MessageMatcher]] = []
+
+
+def get_matcher(course_index: Mapping[str, Any]) -> MessageMatcher:
+    """Matcher for the given course index, rebuilt only when the catalog object changes."""
+    if _MATCHER_CACHE and _MATCHER_CACHE[0][0] is course_index:
+        return _MATCHER_CACHE[0][1]
+    matcher = build_matcher(course_index)
+    _MATCHER_CACHE[:] = [(course_index, matcher)]
+    return matcher
+
+
 def extract_course_codes(text: str) -> Set[str]:
     codes: Set[str] = set()
 
@@ -61,6 +155,14 @@ def extract_course_codes(text: str) -> Set[str]:
     return codes
 
 
+def resolve_manual_degree(manual_degree: Optional[str]) -> Optional[str]:
+    if manual_degree:
+        md = manual_degree.strip().upper()
+        if md in DEGREE_ALIAS_MAP:
+            return md
+    return None
+
+
 def extract_degree_id(text: str, manual_degree: Optional[str] = None) -> Optional[str]:
     """
     Return the canonical degree ID used in training ("BS_CS" or "BS_DS"),
@@ -68,10 +170,9 @@ def extract_degree_id(text: str, manual_degree: Optional[str] = None) -> Optiona
     """
     text_l = text.lower()
 
-    if manual_degree:
-        md = manual_degree.strip().upper()
-        if md in DEGREE_ALIAS_MAP:
-            return md
+    md = resolve_manual_degree(manual_degree)
+    if md:
+        return md
 
     for degree_id, phrases in DEGREE_SYNONYMS.items():
         for phrase in phrases:
@@ -84,13 +185,16 @@ def extract_degree_id(text: str, manual_degree: Optional[str] = None) -> Optiona
 def filter_known_courses(
     codes: Set[str],
     courses_catalog: Dict[str, Any],
+    catalog_codes: Optional[Collection[str]] = None,
 ) -> List[str]:
     known_codes: Set[str] = set()
 
-    catalog_codes: Set[str] = set()
-    for discipline, courses in courses_catalog.items():
-        for code in courses.keys():
-            catalog_codes.add(code.upper())
+    # Pass the prebuilt code index (CatalogStore) to skip rebuilding the set every call
+    if catalog_codes is None:
+        catalog_codes = set()
+        for discipline, courses in courses_catalog.items():
+            for code in courses.keys():
+                catalog_codes.add(code.upper())
 
     for code in codes:
         if code.upper() in catalog_codes:
@@ -105,12 +209,25 @@ def parse_user_string(
     manual_degree: Optional[str] = None,
     courses_path: Path = COURSES_PATH,
     degrees_path: Path = DEGREES_PATH,
-) -> Dict[str, str]:
-    
-    courses_catalog = load_json(courses_path)
-    degrees_catalog = load_json(degrees_path)
+    compactor: Optional[ContextCompactor] = None,
+    token_budget: Optional[int] = None,
+    retriever: Optional[Callable[[str], List[str]]] = None,
+    schedule: Optional[Callable[[str, List[str]], Optional[Dict[str, Any]]]] = None,
+) -> Dict[str, Any]:
+    # Catalogs are parsed once per process and only reloaded when the file changes
+    # The compiled, mmapped catalog (json_data/catalog_binary.py) is used instead when it is up to date
+    # Stage timings go to the request's trace when tracing is on (see tracing.py)
+    with span("catalog_load"):
+        courses_catalog: Dict[str, Any] = {}
+        course_index = open_binary_catalog(courses_path)
+        if course_index is None:
+            courses = courses_store(courses_path).get()
+            courses_catalog, course_index = courses.data, courses.index
+        degrees = degrees_store(degrees_path).get()
 
-    parsed_codes = extract_course_codes(user_message)
+    # Course codes and degree phrases come out of a single pass over the message
+    with span("parse"):
+        parsed_codes, parsed_degree = get_matcher(course_index).match(user_message)
 
     # Allow hard-coded courses to feed to the model in case the string parsing fails
     manual_codes: Set[str] = set()
@@ -118,23 +235,60 @@ def parse_user_string(
         for c in manual_courses:
             manual_codes.add(normalize_course_code(c))
 
-    all_codes = parsed_codes | manual_codes
+    # No course code in the message: ask the retriever (lexical_index.py / semantic_index.py) which courses it is about
+    retrieved_codes: Set[str] = set()
+    if retriever is not None and not parsed_codes:
+        with span("course_retrieval"):
+            retrieved_codes = set(retriever(user_message))
 
-    final_codes = filter_known_courses(all_codes, courses_catalog)
+    all_codes = parsed_codes | manual_codes | retrieved_codes
 
-    degree_id = extract_degree_id(user_message, manual_degree) or ""
+    final_codes = filter_known_courses(all_codes, courses_catalog, course_index)
 
-    info_payload = get_info(
-        courses=final_codes,
-        degree=degree_id,
-        courses_catalog=courses_catalog,
-        degrees_catalog=degrees_catalog,
-    )
+    degree_id = resolve_manual_degree(manual_degree) or parsed_degree or ""
+
+    with span("get_info"):
+        info_payload = get_info(
+            courses=final_codes,
+            degree=degree_id,
+            courses_catalog=courses_catalog,
+            degrees_catalog=degrees.data,
+            course_index=course_index,
+        )
+
+    # The raw payload and the courses the student typed are what fast_path.py answers from
+    mentioned_courses = filter_known_courses(parsed_codes, courses_catalog, course_index)
+
+    # Day/time/conflict questions get their answer from the section schedule index (schedule_index.py)
+    if schedule is not None:
+        with span("schedule"):
+            answer = schedule(user_message, mentioned_courses)
+        if answer is not None:
+            info_payload["schedule"] = answer
+
+    if compactor is None:
+        with span("serialize"):
+            input_ctx = json.dumps(info_payload, indent=2, ensure_ascii=False)
+        return {
+            "instruction": user_message,
+            "input": input_ctx,
+            "output": "", # blank for inference
+            "payload": info_payload,
+            "mentioned_courses": mentioned_courses,
+            "retrieved_courses": sorted(retrieved_codes),
+        }
 
+    # Courses the student actually typed outrank the manual/hard-coded ones when truncating
+    with span("serialize"):
+        input_ctx, report = compactor.compact(info_payload, user_message, token_budget, priority_codes=parsed_codes | retrieved_codes)
     return {
         "instruction": user_message,
-        "input": json.dumps(info_payload, indent=2, ensure_ascii=False),
-        "output": "" # blank for inference
+        "input": input_ctx,
+        "output": "",
+        "context_report": report.as_dict(),
+        "payload": info_payload,
+        "mentioned_courses": mentioned_courses,
+        "retrieved_courses": sorted(retrieved_codes),
     }
 
 # ONLY USED FOR TESTING!
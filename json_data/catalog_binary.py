@@ -0,0 +1,195 @@
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterator, Mapping, Optional, Tuple
+
+# Compact on-disk version of courses.json
+#
+#   header   : magic, version, course count, key width, index offset, source (mtime_ns, size)
+#   index    : course count entries of [code padded to key width][record offset u64]
+#              sorted by code so lookups are a binary search straight over the mmap
+#   records  : [payload length u32][minified JSON of one course block]
+#
+# The file is opened read-only with mmap, so every worker process shares the same
+# page-cache pages and a course is only decoded when get_info asks for it.
+
+MAGIC = b"WPICAT\x00\x01"
+VERSION = 1
+HEADER = struct.Struct("<8sIIIQqQ")
+INDEX_OFFSET = struct.Struct("<Q")
+RECORD_LEN = struct.Struct("<I")
+
+
+def binary_path_for(courses_path: Path) -> Path:
+    return Path(courses_path).with_suffix(".bin")
+
+
+def compile_catalog(courses_path: Path, out_path: Optional[Path] = None) -> Path:
+    """Compile courses.json into the binary format described above."""
+    courses_path = Path(courses_path)
+    out_path = Path(out_path) if out_path else binary_path_for(courses_path)
+
+    with courses_path.open("r", encoding="utf-8") as f:
+        courses_catalog = json.load(f)
+    st = os.stat(courses_path)
+
+    records = {}
+    for discipline, courses in courses_catalog.items():
+        for code, course_block in courses.items():
+            records[code.upper().encode("ascii")] = json.dumps(
+                course_block, ensure_ascii=False, separators=(",", ":")
+            ).encode("utf-8")
+
+    codes = sorted(records)
+    key_width = max((len(c) for c in codes), default=1)
+    entry_size = key_width + INDEX_OFFSET.size
+    index_offset = HEADER.size
+    record_offset = index_offset + entry_size * len(codes)
+
+    index_parts = []
+    record_parts = []
+    for code in codes:
+        payload = records[code]
+        index_parts.append(code.ljust(key_width, b"\x00") + INDEX_OFFSET.pack(record_offset))
+        record_parts.append(RECORD_LEN.pack(len(payload)) + payload)
+        record_offset += RECORD_LEN.size + len(payload)
+
+    header = HEADER.pack(
+        MAGIC, VERSION, len(codes), key_width, index_offset, st.st_mtime_ns, st.st_size
+    )
+
+    # Write to a temp file and rename so readers never mmap a half-written catalog
+    tmp_path = out_path.with_suffix(out_path.suffix + ".tmp")
+    with tmp_path.open("wb") as f:
+        f.write(header)
+        f.write(b"".join(index_parts))
+        f.write(b"".join(record_parts))
+    os.replace(tmp_path, out_path)
+    return out_path
+
+
+class BinaryCatalog(Mapping[str, Any]):
+    """
+    Read-only {CODE: course} mapping backed by an mmapped binary catalog.
+
+    It can be passed anywhere a course index is accepted (get_info's course_index,
+    filter_known_courses's catalog_codes).
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with self.path.open("rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (magic, version, self._n, self._key_width, self._index_offset,
+         self.source_mtime_ns, self.source_size) = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{self.path} is not a version {VERSION} binary catalog")
+        self._entry_size = self._key_width + INDEX_OFFSET.size
+
+    def _key_at(self, i: int) -> bytes:
+        start = self._index_offset + i * self._entry_size
+        return self._mm[start:start + self._key_width].rstrip(b"\x00")
+
+    def _find(self, code: str) -> int:
+        try:
+            key = code.upper().encode("ascii")
+        except UnicodeEncodeError:
+            return -1
+        lo, hi = 0, self._n
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key_at(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self._n and self._key_at(lo) == key:
+            return lo
+        return -1
+
+    def raw_record(self, code: str) -> Optional[bytes]:
+        i = self._find(code)
+        if i < 0:
+            return None
+        start = self._index_offset + i * self._entry_size + self._key_width
+        (offset,) = INDEX_OFFSET.unpack_from(self._mm, start)
+        (length,) = RECORD_LEN.unpack_from(self._mm, offset)
+        payload_start = offset + RECORD_LEN.size
+        return self._mm[payload_start:payload_start + length]
+
+    def __getitem__(self, code: str) -> Dict[str, Any]:
+        raw = self.raw_record(code)
+        if raw is None:
+            raise KeyError(code)
+        return json.loads(raw.decode("utf-8"))
+
+    def __contains__(self, code: object) -> bool:
+        return isinstance(code, str) and self._find(code) >= 0
+
+    def __len__(self) -> int:
+        return self._n
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(self._n):
+            yield self._key_at(i).decode("ascii")
+
+    def is_fresh_for(self, courses_path: Path) -> bool:
+        st = os.stat(courses_path)
+        return (st.st_mtime_ns, st.st_size) == (self.source_mtime_ns, self.source_size)
+
+    def close(self) -> None:
+        self._mm.close()
+
+
+_OPEN: Dict[Path, Tuple[Tuple[int, int], BinaryCatalog]] = {}
+_OPEN_LOCK = threading.Lock()
+
+
+def open_binary_catalog(courses_path: Path) -> Optional[BinaryCatalog]:
+    """
+    Return the mmapped catalog compiled from `courses_path`, or None if there is no
+    compiled file or it is stale (courses.json changed since it was compiled).
+    """
+    bin_path = binary_path_for(courses_path)
+    try:
+        st = os.stat(bin_path)
+    except FileNotFoundError:
+        return None
+    stat_key = (st.st_mtime_ns, st.st_size)
+
+    resolved = bin_path.resolve()
+    cached = _OPEN.get(resolved)
+    if cached is None or cached[0] != stat_key:
+        with _OPEN_LOCK:
+            cached = _OPEN.get(resolved)
+            if cached is None or cached[0] != stat_key:
+                # Old mappings are left to the garbage collector since readers may still hold them
+                cached = (stat_key, BinaryCatalog(bin_path))
+                _OPEN[resolved] = cached
+
+    catalog = cached[1]
+    return catalog if catalog.is_fresh_for(courses_path) else None
+
+
+def open_course_index(courses_path: Path) -> Mapping[str, Any]:
+    """
+    {CODE: course} to build a retrieval index from (lexical_index.py, schedule_index.py,
+    semantic_index.py): the mmapped catalog when it is up to date, else a one-off parse of
+    courses.json. Neither stays resident once the caller's index is built.
+    """
+    catalog = open_binary_catalog(courses_path)
+    if catalog is not None:
+        return catalog
+    with Path(courses_path).open("r", encoding="utf-8") as f:
+        courses_catalog = json.load(f)
+    return {code.upper(): course for courses in courses_catalog.values() for code, course in courses.items()}
+
+
+if __name__ == "__main__":
+    src = Path(sys.argv[1]) if len(sys.argv) > 1 else Path("courses.json")
+    out = compile_catalog(src)
+    print(f"Compiled {src} -> {out} ({os.path.getsize(out)} bytes)")
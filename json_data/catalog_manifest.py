@@ -0,0 +1,93 @@
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set
+
+try:
+    from json_data.catalog_store import file_digest
+except ImportError:  # run as a script from inside json_data/
+    from catalog_store import file_digest
+
+# Change manifest for courses.json
+#
+# `export.py --incremental` compares every course's source hash with the one recorded for the old
+# file (courses.sources.json) and appends one line per refresh to courses.manifest.jsonl:
+#   {"time": ..., "from": <old sha256>, "to": <new sha256>, "added": [...], "changed": [...], "removed": [...]}
+# Anything built from the catalog remembers the file digest it was built against and asks
+# changes_since() which course codes to redo; None means the history doesn't reach back that far
+# (or the file was replaced some other way) and everything has to be rebuilt.
+
+MAX_ENTRIES = 200  # refreshes kept in the manifest
+VERSION_CHARS = 16  # digests are matched on this many hex characters
+
+
+def manifest_path(courses_path: Path) -> Path:
+    courses_path = Path(courses_path)
+    return courses_path.with_name(courses_path.stem + ".manifest.jsonl")
+
+
+def diff_hashes(old: Dict[str, str], new: Dict[str, str]) -> Dict[str, List[str]]:
+    return {
+        "added": sorted(new.keys() - old.keys()),
+        "changed": sorted(code for code in new.keys() & old.keys() if new[code] != old[code]),
+        "removed": sorted(old.keys() - new.keys()),
+    }
+
+
+def read_entries(courses_path: Path) -> List[Dict[str, Any]]:
+    try:
+        with open(manifest_path(courses_path), "r", encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+    except (OSError, ValueError):
+        return []
+
+
+def append_entry(courses_path: Path, old_digest: str, new_digest: str, changes: Dict[str, List[str]]) -> Dict[str, Any]:
+    entry = {"time": time.time(), "from": old_digest, "to": new_digest, **changes}
+    entries = read_entries(courses_path)[-(MAX_ENTRIES - 1):] + [entry]
+    path = manifest_path(courses_path)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        for e in entries:
+            f.write(json.dumps(e) + "\n")
+    os.replace(tmp, path)
+    return entry
+
+
+def changes_since(courses_path: Path, digest: Optional[str], current: Optional[str] = None) -> Optional[Set[str]]:
+    """
+    Course codes added, changed or removed between the catalog with `digest` and the current one
+    (or `current`), following the manifest backwards. Empty when nothing changed, None when unknown.
+    """
+    if not digest:
+        return None
+    current = (current or file_digest(courses_path))[:VERSION_CHARS]
+    digest = digest[:VERSION_CHARS]
+    by_target = {e["to"][:VERSION_CHARS]: e for e in read_entries(courses_path) if e.get("from")}
+    codes: Set[str] = set()
+    for _ in range(MAX_ENTRIES):
+        if current == digest:
+            return codes
+        entry = by_target.get(current)
+        if entry is None:
+            return None
+        codes.update(entry["added"], entry["changed"], entry["removed"])
+        current = entry["from"][:VERSION_CHARS]
+    return None
+
+
+# The response cache stamps entries with one version for both catalogs; keeping the two digests
+# readable in it lets a course refresh expire only the entries that used the changed courses
+
+def catalog_version(courses_path: Path, degrees_path: Path) -> str:
+    return f"{file_digest(courses_path)[:VERSION_CHARS]}.{file_digest(degrees_path)[:VERSION_CHARS]}"
+
+
+def changed_courses(courses_path: Path, old_version: str, new_version: str) -> Optional[Set[str]]:
+    """Course codes that differ between two catalog_version() strings, None when that can't be told."""
+    old_courses, _, old_degrees = old_version.partition(".")
+    new_courses, _, new_degrees = new_version.partition(".")
+    if not old_degrees or old_degrees != new_degrees:
+        return None
+    return changes_since(courses_path, old_courses, current=new_courses)
@@ -0,0 +1,136 @@
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+# Process-wide cache for the JSON catalogs (courses.json / degrees.json)
+# Each file is parsed once per process and only re-parsed when it actually changes on disk,
+# so the per-message cost of retrieval is a stat() call instead of a 3.6 MB json.load
+
+IndexBuilder = Callable[[Dict[str, Any]], Dict[str, Any]]
+
+
+def build_course_index(courses_catalog: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Flatten {discipline: {code: course}} into {CODE: course} so lookups don't have to
+    guess the discipline from the code (e.g. "AE230X" lives under "AE", not "AEX").
+    """
+    index: Dict[str, Any] = {}
+    for discipline, courses in courses_catalog.items():
+        for code, course_block in courses.items():
+            index[code.upper()] = course_block
+    return index
+
+
+class CatalogSnapshot:
+    """One immutable, fully-built version of a catalog file."""
+
+    def __init__(
+        self,
+        data: Dict[str, Any],
+        index: Dict[str, Any],
+        digest: str,
+        stat_key: Tuple[int, int],
+    ):
+        self.data = data
+        self.index = index
+        self.digest = digest  # sha256 of the raw file bytes
+        self.stat_key = stat_key  # (mtime_ns, size) seen when the snapshot was (re)validated
+
+
+class CatalogStore:
+    """
+    Loads a JSON catalog once and hands out the current CatalogSnapshot.
+
+    get() only stats the file; when (mtime, size) moved it hashes the bytes and re-parses
+    only if the content hash changed. The new snapshot is built completely before it
+    replaces the old one, so readers never see a half-built catalog.
+    """
+
+    def __init__(self, path: Path, index_builder: Optional[IndexBuilder] = None):
+        self.path = Path(path)
+        self.index_builder = index_builder
+        self.reloads = 0
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._lock = threading.Lock()
+
+    def _stat_key(self) -> Tuple[int, int]:
+        st = os.stat(self.path)
+        return (st.st_mtime_ns, st.st_size)
+
+    def get(self) -> CatalogSnapshot:
+        snapshot = self._snapshot
+        stat_key = self._stat_key()
+        if snapshot is not None and snapshot.stat_key == stat_key:
+            return snapshot
+
+        with self._lock:
+            # Another thread may have reloaded while we waited on the lock
+            snapshot = self._snapshot
+            if snapshot is not None and snapshot.stat_key == stat_key:
+                return snapshot
+
+            raw = self.path.read_bytes()
+            digest = hashlib.sha256(raw).hexdigest()
+
+            if snapshot is not None and snapshot.digest == digest:
+                # File was touched but the content is identical, keep the parsed data
+                new_snapshot = CatalogSnapshot(snapshot.data, snapshot.index, digest, stat_key)
+            else:
+                data = json.loads(raw.decode("utf-8"))
+                index = self.index_builder(data) if self.index_builder else data
+                new_snapshot = CatalogSnapshot(data, index, digest, stat_key)
+                self.reloads += 1
+
+            self._snapshot = new_snapshot  # single reference swap
+            return new_snapshot
+
+    @property
+    def data(self) -> Dict[str, Any]:
+        return self.get().data
+
+    @property
+    def index(self) -> Dict[str, Any]:
+        return self.get().index
+
+
+_STORES: Dict[Tuple[Path, Optional[IndexBuilder]], CatalogStore] = {}
+_STORES_LOCK = threading.Lock()
+
+
+def get_catalog_store(path: Path, index_builder: Optional[IndexBuilder] = None) -> CatalogStore:
+    """Return the process-wide store for `path`, creating it on first use."""
+    key = (Path(path).resolve(), index_builder)
+    store = _STORES.get(key)
+    if store is None:
+        with _STORES_LOCK:
+            store = _STORES.get(key)
+            if store is None:
+                store = CatalogStore(Path(path), index_builder)
+                _STORES[key] = store
+    return store
+
+
+def courses_store(path: Path) -> CatalogStore:
+    return get_catalog_store(path, build_course_index)
+
+
+def degrees_store(path: Path) -> CatalogStore:
+    return get_catalog_store(path)
+
+
+_DIGESTS: Dict[Path, Tuple[Tuple[int, int], str]] = {}
+
+
+def file_digest(path: Path) -> str:
+    """sha256 of a file, re-hashed only when its (mtime, size) changes."""
+    path = Path(path)
+    st = os.stat(path)
+    stat_key = (st.st_mtime_ns, st.st_size)
+    cached = _DIGESTS.get(path)
+    if cached is None or cached[0] != stat_key:
+        cached = (stat_key, hashlib.sha256(path.read_bytes()).hexdigest())
+        _DIGESTS[path] = cached
+    return cached[1]
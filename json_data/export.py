@@ -1,148 +1,491 @@
-import pandas as pd
-import re
-import html
-import json
-
-def clean_html(raw_html):
-    if not isinstance(raw_html, str):
-        return str(raw_html)
-    
-    raw_html = raw_html.replace('\u2019', "'")
-    
-    cleanr = re.compile('<.*?>')
-    cleantext = re.sub(cleanr, ' ', raw_html)
-    
-    cleantext = html.unescape(cleantext)
-    
-    cleantext = re.sub(r'(Cat\. [IVX0-9]+)([A-Za-z])', r'\1 \2', cleantext)
-    
-    cleantext = cleantext.replace('/', '\\')
-    
-    cleantext = re.sub(r'\s+', ' ', cleantext).strip()
-    
-    return cleantext
-
-def extract_subject(title):
-    if not isinstance(title, str):
-        return ""
-    parts = title.split()
-    if parts:
-        return parts[0]
-    return ""
-
-def extract_course_code(title):
-    if not isinstance(title, str):
-        return ""
-    parts = title.split('-')
-    if parts:
-        code_part = parts[0].strip()
-        return code_part.replace(" ", "")
-    return ""
-
-def extract_course_title_only(title):
-    if not isinstance(title, str):
-        return ""
-    parts = title.split('-', 1)
-    if len(parts) > 1:
-        return parts[1].strip()
-    return title
-
-def main():
-    input_file = 'prod-data-raw.json'
-    output_file = 'output.json'
-
-    try:
-        print(f"Reading {input_file}...")
-        df = pd.read_json(input_file)
-        
-        if 'Report_Entry' in df.columns:
-            print("Normalizing nested JSON data...")
-            df = pd.json_normalize(df['Report_Entry'])
-
-        section_columns = [
-            'Offering_Period', 
-            'Meeting_Patterns', 
-            'Section_Status', 
-            'Instructors', 
-            'Delivery_Mode', 
-            'Section_Details',
-            'Meeting_Day_Patterns',
-            'Instructional_Format'
-        ]
-
-        if 'Course_Title' in df.columns:
-            df['Subject'] = df['Course_Title'].apply(extract_subject)
-            df['Course_Code'] = df['Course_Title'].apply(extract_course_code)
-            df['Clean_Title'] = df['Course_Title'].apply(extract_course_title_only)
-
-        cols_to_clean = ['Course_Description', 'Course_Section_Description', 'Public_Notes']
-        for col in cols_to_clean:
-            if col in df.columns:
-                df[col] = df[col].apply(clean_html)
-
-        df.fillna('', inplace=True)
-
-        print(f"Writing to {output_file}...")
-        
-        output_data = {}
-        
-        if 'Course_Code' in df.columns:
-            for course_code, course_group in df.groupby('Course_Code'):
-                first_row = course_group.iloc[0]
-                
-                course_obj = {
-                    "level": first_row.get('Academic_Level', ''),
-                    "title": first_row.get('Clean_Title', ''),
-                    "discipline": first_row.get('Subject', ''),
-                    "description": first_row.get('Course_Description', ''),
-                    "sections": {}
-                }
-                
-                for _, row in course_group.iterrows():
-                    section_obj = {}
-                    
-                    term_raw = row.get('Offering_Period', '')
-                    term_group = "Other"
-                    if isinstance(term_raw, str):
-                         match = re.search(r'(Fall|Spring|Summer)\s+([A-Z])', term_raw)
-                         if match:
-                             term_group = f"{match.group(1)} {match.group(2)}"
-                         else:
-                             term_group = term_raw
-                    
-                    if term_group not in course_obj['sections']:
-                        course_obj['sections'][term_group] = []
-
-                    for col in section_columns:
-                        if col in df.columns:
-                            key_map = {
-                                'Offering_Period': 'term',
-                                'Meeting_Patterns': 'time',
-                                'Section_Status': 'status',
-                                'Instructors': 'instructor',
-                                'Delivery_Mode': 'delivery_mode',
-                                'Section_Details': 'details',
-                                'Meeting_Day_Patterns': 'days',
-                                'Instructional_Format': 'format'
-                            }
-                            key = key_map.get(col, col)
-                            section_obj[key] = row[col]
-                    course_obj['sections'][term_group].append(section_obj)
-                
-                discipline = course_obj.get('discipline', 'Unknown')
-                if discipline not in output_data:
-                    output_data[discipline] = {}
-                output_data[discipline][course_code] = course_obj
-        
-        with open(output_file, 'w') as f:
-            json.dump(output_data, f, indent=4)
-            
-        print("Done.")
-
-    except ValueError as e:
-        print(f"Error reading JSON: {e}")
-    except Exception as e:
-        print(f"An error occurred: {e}")
-
-if __name__ == "__main__":
-    main()
+import pandas as pd
+import re
+import os
+import html
+import json
+import hashlib
+from json.encoder import encode_basestring_ascii
+
+try:
+    from json_data.catalog_manifest import append_entry, diff_hashes
+    from json_data.json_stream import Buffer, array_items
+except ImportError:  # run as a script from inside json_data/
+    from catalog_manifest import append_entry, diff_hashes
+    from json_stream import Buffer, array_items
+
+TAG_RE = re.compile('<.*?>')
+CAT_RE = re.compile(r'(Cat\. [IVX0-9]+)([A-Za-z])')
+SPACE_RE = re.compile(r'\s+')
+TERM_RE = re.compile(r'(Fall|Spring|Summer)\s+([A-Z])')
+
+SECTION_KEYS = {
+    'Offering_Period': 'term',
+    'Meeting_Patterns': 'time',
+    'Section_Status': 'status',
+    'Instructors': 'instructor',
+    'Delivery_Mode': 'delivery_mode',
+    'Section_Details': 'details',
+    'Meeting_Day_Patterns': 'days',
+    'Instructional_Format': 'format'
+}
+SECTION_COLUMNS = list(SECTION_KEYS)
+
+MISSING = object()  # key absent from a row (pandas fills it with NaN)
+
+def clean_html(raw_html):
+    if not isinstance(raw_html, str):
+        return str(raw_html)
+
+    raw_html = raw_html.replace('\u2019', "'")
+
+    cleantext = TAG_RE.sub(' ', raw_html)
+
+    cleantext = html.unescape(cleantext)
+
+    cleantext = CAT_RE.sub(r'\1 \2', cleantext)
+
+    cleantext = cleantext.replace('/', '\\')
+
+    cleantext = SPACE_RE.sub(' ', cleantext).strip()
+
+    return cleantext
+
+def extract_subject(title):
+    if not isinstance(title, str):
+        return ""
+    parts = title.split()
+    if parts:
+        return parts[0]
+    return ""
+
+def extract_course_code(title):
+    if not isinstance(title, str):
+        return ""
+    parts = title.split('-')
+    if parts:
+        code_part = parts[0].strip()
+        return code_part.replace(" ", "")
+    return ""
+
+def extract_course_title_only(title):
+    if not isinstance(title, str):
+        return ""
+    parts = title.split('-', 1)
+    if len(parts) > 1:
+        return parts[1].strip()
+    return title
+
+def term_group(term_raw):
+    if not isinstance(term_raw, str):
+        return "Other"
+    match = TERM_RE.search(term_raw)
+    if match:
+        return f"{match.group(1)} {match.group(2)}"
+    return term_raw
+
+
+# Streaming reader
+# The raw Workday dump is {"Report_Entry": [row, row, ...]}, rows are decoded one at a time out of a
+# rolling text buffer instead of materializing the whole file (and a DataFrame of it) in memory
+
+def flatten(row, prefix='', out=None):
+    # Same column names as pd.json_normalize: nested objects become "parent.child"
+    if not prefix and not any(value.__class__ is dict for value in row.values()):
+        return row
+    if out is None:
+        out = {}
+    for key, value in row.items():
+        if isinstance(value, dict):
+            flatten(value, f"{prefix}{key}.", out)
+        else:
+            out[prefix + key] = value
+    return out
+
+def iter_rows(input_file):
+    """Yield the rows of a raw dump one at a time: the Report_Entry list (flattened), or a top-level list of rows."""
+    decoder = json.JSONDecoder()
+    with open(input_file, 'r', encoding='utf-8') as f:
+        buf = Buffer(f)
+        if buf.peek() == '[':
+            yield from array_items(buf, decoder)
+            return
+        buf.expect('{')
+        if buf.peek() == '}':
+            return
+        while True:
+            key = buf.value(decoder)
+            buf.expect(':')
+            if key == 'Report_Entry' and buf.peek() == '[':
+                for row in array_items(buf, decoder):
+                    yield flatten(row)
+            else:
+                buf.value(decoder)
+            if buf.peek() == ',':
+                buf.pos += 1
+                continue
+            buf.expect('}')
+            return
+
+
+# One pass over the rows
+# Everything that is derived from a string is computed once per distinct value: the dump repeats the
+# course title and description on every section and uses a handful of term names, so cleaning and
+# splitting run per course/term rather than per section. Sections are grouped as they stream by.
+
+class CatalogBuilder:
+    def __init__(self):
+        self.courses = {}  # code -> [first row fields, {term group: [section values]}]
+        self.columns = set()
+        self.description_kinds = set()
+        self._titles = {}
+        self._descriptions = {}
+        self._terms = {}
+        self._strings = {}
+
+    def _title_parts(self, title):
+        if not isinstance(title, str):
+            if title is None or title is MISSING:
+                return "", "", ""
+            return extract_subject(title), extract_course_code(title), extract_course_title_only(title)
+        parts = self._titles.get(title)
+        if parts is None:
+            parts = self._titles[title] = (extract_subject(title), extract_course_code(title), extract_course_title_only(title))
+        return parts
+
+    def _section_value(self, value):
+        # Sections share one object per distinct string ('Open', instructor names...)
+        if value is None or value is MISSING:
+            return ''
+        if isinstance(value, str):
+            return self._strings.setdefault(value, value)
+        return value
+
+    def add(self, row):
+        self.columns.update(row)
+        description = row.get('Course_Description', MISSING)
+        self.description_kinds.add(
+            'missing' if description is MISSING else 'none' if description is None else 'str' if isinstance(description, str) else 'other'
+        )
+
+        subject, code, title = self._title_parts(row.get('Course_Title', MISSING))
+        course = self.courses.get(code)
+        if course is None:
+            level = row.get('Academic_Level', MISSING)
+            if isinstance(description, str):
+                description = self._clean(description)
+            course = self.courses[code] = [(self._section_value(level), title, subject, description), {}]
+
+        term_raw = self._section_value(row.get('Offering_Period', MISSING))
+        group = self._terms.get(term_raw) if isinstance(term_raw, str) else None
+        if group is None:
+            group = term_group(term_raw)
+            if isinstance(term_raw, str):
+                self._terms[term_raw] = group
+        get, strings = row.get, self._strings
+        section = []
+        for col in SECTION_COLUMNS:
+            value = get(col)
+            if value is None:
+                value = ''
+            elif value.__class__ is str:
+                value = strings.setdefault(value, value)
+            section.append(value)
+        course[1].setdefault(group, []).append(tuple(section))
+
+    def _clean(self, raw):
+        text = self._descriptions.get(raw)
+        if text is None:
+            text = self._descriptions[raw] = clean_html(raw)
+        return text
+
+    def description(self, raw):
+        # Strings were cleaned when the course was added. pandas turns missing/None descriptions into NaN
+        # ("nan" after clean_html) when the column is strings, but keeps None ("None") when every value
+        # is None or the column holds other types
+        if 'Course_Description' not in self.columns:
+            return ''
+        if raw is MISSING:
+            return 'nan'
+        if raw is None:
+            if 'other' in self.description_kinds or self.description_kinds == {'none'}:
+                return 'None'
+            return 'nan'
+        if not isinstance(raw, str):
+            return clean_html(raw)
+        return raw
+
+
+def _encode(value, indent):
+    if isinstance(value, str):
+        return encode_basestring_ascii(value)
+    # Lists/numbers from the raw dump, laid out exactly as json.dump(indent=4) nests them
+    return json.dumps(value, indent=4).replace('\n', '\n' + ' ' * indent)
+
+def _course_text(builder, code, keys):
+    # One course, from its key to its closing brace, laid out as json.dump(indent=4) nests it
+    (level, title, subject, description), sections = builder.courses[code]
+    parts = ['        ' + encode_basestring_ascii(code) + ': {\n',
+             '            "level": ' + _encode(level, 12) + ',\n',
+             '            "title": ' + _encode(title, 12) + ',\n',
+             '            "discipline": ' + _encode(subject, 12) + ',\n',
+             '            "description": ' + _encode(builder.description(description), 12) + ',\n',
+             '            "sections": {']
+    for g, (group, rows) in enumerate(sections.items()):
+        parts.append(('\n' if g == 0 else ',\n') + '                ' + encode_basestring_ascii(group) + ': [')
+        for r, section in enumerate(rows):
+            parts.append('\n                    {' if r == 0 else ',\n                    {')
+            if keys:
+                parts.append(',\n'.join(['\n                        ' + key + ': ' + _encode(section[i], 24) if n == 0
+                                         else '                        ' + key + ': ' + _encode(section[i], 24)
+                                         for n, (i, key) in enumerate(keys)]))
+                parts.append('\n                    }')
+            else:
+                parts.append('}')
+        parts.append('\n                ]')
+    parts.append('\n            }\n        }')
+    return ''.join(parts)
+
+def section_keys(builder):
+    return [(i, encode_basestring_ascii(SECTION_KEYS[col])) for i, col in enumerate(SECTION_COLUMNS) if col in builder.columns]
+
+def write_catalog(builder, f, reuse=None):
+    """
+    Stream the catalog as json.dump(..., indent=4) would write it, one course at a time.
+    `reuse` maps course codes to text already encoded for them (see update_catalog). Returns the
+    {code: (start, end)} span of every course in the output (it is all ASCII, so chars == bytes).
+    """
+    if 'Course_Title' not in builder.columns or not builder.courses:
+        f.write('{}')
+        return {}
+    keys = section_keys(builder)
+    reuse = reuse or {}
+
+    # groupby sorts the course codes, disciplines come out in order of their first course
+    by_discipline = {}
+    for code in sorted(builder.courses):
+        by_discipline.setdefault(builder.courses[code][0][2], []).append(code)
+
+    spans = {}
+    pos = 0
+    for d, (discipline, codes) in enumerate(by_discipline.items()):
+        head = ('{\n' if d == 0 else ',\n') + '    ' + encode_basestring_ascii(discipline) + ': {'
+        f.write(head)
+        pos += len(head)
+        for c, code in enumerate(codes):
+            text = reuse.get(code) or _course_text(builder, code, keys)
+            f.write('\n' if c == 0 else ',\n')
+            f.write(text)
+            pos += 1 + (c > 0)
+            spans[code] = (pos, pos + len(text))
+            pos += len(text)
+        f.write('\n    }')
+        pos += 6
+    f.write('\n}')
+    return spans
+
+def export(input_file, output_file, incremental=False):
+    builder = CatalogBuilder()
+    for row in iter_rows(input_file):
+        builder.add(row)
+    if incremental and os.path.exists(output_file):
+        update_catalog(builder, output_file)
+        return builder
+    print(f"Writing to {output_file}...")
+    with open(output_file, 'w') as f:
+        write_catalog(builder, f)
+    return builder
+
+def _sha256(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+# Incremental refreshes
+# Next to the output, <name>.sources.json keeps, for the file with digest "digest", every course's
+# source hash (what the builder extracted from the dump for it) and its byte span in the file.
+# A refresh only encodes the courses whose source hash changed and copies the others' text from the
+# old file; the manifest's added/changed/removed lists come from the same hashes.
+
+def sources_path(output_file):
+    root, _ = os.path.splitext(output_file)
+    return root + '.sources.json'
+
+def source_hash(builder, code):
+    (level, title, subject, description), sections = builder.courses[code]
+    text = repr((level, title, subject, builder.description(description), sections))
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+
+def read_sources(output_file, digest):
+    """The sidecar for the output file with `digest`, None when missing or written for another file."""
+    try:
+        with open(sources_path(output_file), 'r', encoding='utf-8') as f:
+            sources = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return sources if sources.get('digest') == digest else None
+
+def write_sources(output_file, digest, keys, hashes, spans):
+    sources = {'digest': digest, 'keys': keys, 'courses': {code: [hashes[code], *spans[code]] for code in spans}}
+    path = sources_path(output_file)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(sources, f, separators=(',', ':'))
+    os.replace(tmp, path)
+
+def update_catalog(builder, output_file):
+    """
+    Replace output_file only if the catalog actually changed, and record which courses did in the
+    change manifest (see catalog_manifest.py) so caches and indexes over it only redo those.
+    An unchanged refresh leaves the file (and its mtime) alone, so nothing downstream even reloads.
+    Without a sidecar matching the current file (first run, or the file was replaced some other way)
+    every course is encoded and no manifest entry is written, so consumers rebuild everything once.
+    """
+    old_digest = _sha256(output_file)
+    previous = read_sources(output_file, old_digest)
+    keys = [key for _, key in section_keys(builder)]
+    hashes = {code: source_hash(builder, code) for code in builder.courses}
+
+    reuse, old_hashes = {}, None
+    if previous is not None:
+        if previous['keys'] == keys:
+            old_hashes = {code: entry[0] for code, entry in previous['courses'].items()}
+            with open(output_file, 'rb') as f:
+                old_text = f.read()
+            reuse = {code: old_text[entry[1]:entry[2]].decode('ascii') for code, entry in previous['courses'].items()
+                     if hashes.get(code) == entry[0]}
+        else:
+            old_hashes = dict.fromkeys(previous['courses'], '')  # different section fields: every course changed
+
+    tmp = f"{output_file}.{os.getpid()}.tmp"
+    with open(tmp, 'w') as f:
+        spans = write_catalog(builder, f, reuse)
+    new_digest = _sha256(tmp)
+    if old_digest == new_digest:
+        os.remove(tmp)
+        if previous is None:
+            write_sources(output_file, old_digest, keys, hashes, spans)
+        print(f"No changes, {output_file} left as is")
+        return None
+
+    os.replace(tmp, output_file)
+    write_sources(output_file, new_digest, keys, hashes, spans)
+    if old_hashes is None:
+        print(f"Updated {output_file}, no source hashes for the old file so every course was rebuilt")
+        return None
+    changes = diff_hashes(old_hashes, hashes)
+    append_entry(output_file, old_digest, new_digest, changes)
+    print(f"Updated {output_file}: {len(changes['added'])} added, {len(changes['changed'])} changed, {len(changes['removed'])} removed, "
+          f"{len(reuse)} courses copied from the old file")
+    return changes
+
+
+# The original DataFrame implementation, kept as the reference output for benchmarks/bench_export.py
+def export_pandas(input_file, output_file):
+    df = pd.read_json(input_file)
+
+    if 'Report_Entry' in df.columns:
+        print("Normalizing nested JSON data...")
+        df = pd.json_normalize(df['Report_Entry'])
+
+    section_columns = [
+        'Offering_Period',
+        'Meeting_Patterns',
+        'Section_Status',
+        'Instructors',
+        'Delivery_Mode',
+        'Section_Details',
+        'Meeting_Day_Patterns',
+        'Instructional_Format'
+    ]
+
+    if 'Course_Title' in df.columns:
+        df['Subject'] = df['Course_Title'].apply(extract_subject)
+        df['Course_Code'] = df['Course_Title'].apply(extract_course_code)
+        df['Clean_Title'] = df['Course_Title'].apply(extract_course_title_only)
+
+    cols_to_clean = ['Course_Description', 'Course_Section_Description', 'Public_Notes']
+    for col in cols_to_clean:
+        if col in df.columns:
+            df[col] = df[col].apply(clean_html)
+
+    df.fillna('', inplace=True)
+
+    print(f"Writing to {output_file}...")
+
+    output_data = {}
+
+    if 'Course_Code' in df.columns:
+        for course_code, course_group in df.groupby('Course_Code'):
+            first_row = course_group.iloc[0]
+
+            course_obj = {
+                "level": first_row.get('Academic_Level', ''),
+                "title": first_row.get('Clean_Title', ''),
+                "discipline": first_row.get('Subject', ''),
+                "description": first_row.get('Course_Description', ''),
+                "sections": {}
+            }
+
+            for _, row in course_group.iterrows():
+                section_obj = {}
+
+                term_raw = row.get('Offering_Period', '')
+                term_group = "Other"
+                if isinstance(term_raw, str):
+                     match = re.search(r'(Fall|Spring|Summer)\s+([A-Z])', term_raw)
+                     if match:
+                         term_group = f"{match.group(1)} {match.group(2)}"
+                     else:
+                         term_group = term_raw
+
+                if term_group not in course_obj['sections']:
+                    course_obj['sections'][term_group] = []
+
+                for col in section_columns:
+                    if col in df.columns:
+                        key_map = {
+                            'Offering_Period': 'term',
+                            'Meeting_Patterns': 'time',
+                            'Section_Status': 'status',
+                            'Instructors': 'instructor',
+                            'Delivery_Mode': 'delivery_mode',
+                            'Section_Details': 'details',
+                            'Meeting_Day_Patterns': 'days',
+                            'Instructional_Format': 'format'
+                        }
+                        key = key_map.get(col, col)
+                        section_obj[key] = row[col]
+                course_obj['sections'][term_group].append(section_obj)
+
+            discipline = course_obj.get('discipline', 'Unknown')
+            if discipline not in output_data:
+                output_data[discipline] = {}
+            output_data[discipline][course_code] = course_obj
+
+    with open(output_file, 'w') as f:
+        json.dump(output_data, f, indent=4)
+
+def main(input_file='prod-data-raw.json', output_file='output.json', legacy=False, incremental=False):
+    try:
+        print(f"Reading {input_file}...")
+        if legacy:
+            export_pandas(input_file, output_file)
+        else:
+            export(input_file, output_file, incremental=incremental)
+        print("Done.")
+
+    except ValueError as e:
+        print(f"Error reading JSON: {e}")
+    except Exception as e:
+        print(f"An error occurred: {e}")
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build courses.json from a raw Workday dump")
+    parser.add_argument("input", nargs="?", default="prod-data-raw.json")
+    parser.add_argument("output", nargs="?", default="output.json")
+    parser.add_argument("--pandas", action="store_true", help="use the original DataFrame implementation")
+    parser.add_argument("--incremental", action="store_true", help="only replace the output if it changed, and log which courses did")
+    args = parser.parse_args()
+    main(args.input, args.output, legacy=args.pandas, incremental=args.incremental)
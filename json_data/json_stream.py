@@ -0,0 +1,78 @@
+import json
+import re
+
+# Incremental reader for large JSON files (the raw Workday dump, training sets)
+# The file is read CHUNK_SIZE characters at a time and values are decoded out of the buffer with
+# raw_decode, so a top-level array can be walked item by item without holding the whole file.
+
+CHUNK_SIZE = 1 << 20  # characters read at a time
+NUMBER_TAIL_RE = re.compile(r'[0-9.eE+-]*')
+
+class Buffer:
+    def __init__(self, f):
+        self.f = f
+        self.text = ''
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+        # Drop what's been consumed, then append the next chunk
+        if self.pos > CHUNK_SIZE:
+            self.text = self.text[self.pos:]
+            self.pos = 0
+        chunk = self.f.read(CHUNK_SIZE)
+        if not chunk:
+            self.eof = True
+        self.text += chunk
+
+    def peek(self):
+        # Next non-whitespace character ('' at the end of the file)
+        while True:
+            while self.pos < len(self.text) and self.text[self.pos] in ' \t\n\r':
+                self.pos += 1
+            if self.pos < len(self.text) or self.eof:
+                return self.text[self.pos:self.pos + 1]
+            self.fill()
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise json.JSONDecodeError(f"Expecting '{char}'", self.text, self.pos)
+        self.pos += 1
+
+    def value(self, decoder):
+        self.peek()
+        while True:
+            try:
+                obj, end = decoder.raw_decode(self.text, self.pos)
+            except json.JSONDecodeError:
+                # Most likely the value runs past the end of the buffer
+                if self.eof:
+                    raise
+                self.fill()
+                continue
+            if not self.eof and NUMBER_TAIL_RE.fullmatch(self.text, end):
+                # A number at the end of the buffer may continue in the next chunk ("12" of "125",
+                # "-0" of "-0.5", "1.5" of "1.5e3" with only "1.5e" read so far)
+                self.fill()
+                continue
+            self.pos = end
+            return obj
+
+def array_items(buf, decoder):
+    buf.expect('[')
+    if buf.peek() == ']':
+        buf.pos += 1
+        return
+    while True:
+        yield buf.value(decoder)
+        if buf.peek() == ',':
+            buf.pos += 1
+            continue
+        buf.expect(']')
+        return
+
+def iter_array(path):
+    """Yield the items of a file holding one top-level JSON array."""
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8') as f:
+        yield from array_items(Buffer(f), decoder)
@@ -1,7 +1,22 @@
 import json
 import ast
+import os
+import time
+import argparse
+from collections import deque
+from functools import lru_cache
+from itertools import islice
+from json.encoder import encode_basestring
+from multiprocessing import Pool
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
+
+try:
+    from json_data.catalog_store import courses_store, degrees_store
+    from json_data.json_stream import iter_array
+except ImportError:  # run as a script from inside json_data/
+    from catalog_store import courses_store, degrees_store
+    from json_stream import iter_array
 
 def load_json(path: Path) -> Dict[str, Any]:
     with path.open("r", encoding="utf-8") as f:
@@ -29,7 +44,9 @@ def get_info(
     degree: Optional[str],
     courses_catalog: Dict[str, Any],
     degrees_catalog: Dict[str, Any],
+    course_index: Optional[Dict[str, Any]] = None,
 ) -> Dict[str, Any]:
+    # course_index ({CODE: course}, see catalog_store.build_course_index) skips the discipline guess
 
     result: Dict[str, Any] = {}
 
@@ -38,7 +55,10 @@ def get_info(
         for raw_code in courses:
             normalized = normalize_course_code(raw_code)
             discipline = "".join([c for c in normalized if c.isalpha()])  # e.g., "CS"
-            course_block = courses_catalog.get(discipline, {}).get(normalized)
+            if course_index is not None:
+                course_block = course_index.get(normalized)
+            else:
+                course_block = courses_catalog.get(discipline, {}).get(normalized)
 
             if course_block is None:
                 courses_info.append({
@@ -114,46 +134,180 @@ def parse_get_info_call(call_str: str) -> Dict[str, Any]:
 
     return kwargs
 
-def main():
-    courses_catalog = load_json(COURSES_PATH)
-    degrees_catalog = load_json(DEGREES_PATH)
+# Transforming the training set
+# Examples are streamed in and written out in chunks, and the chunks are spread over a process pool.
+# Most examples ask about the same few course/degree combinations, so each worker keeps the rendered
+# get_info payload per (courses, degree) and only calls get_info + json.dumps once per combination.
+# A new combination is pieced together from the already rendered courses and degree: json.dumps with
+# indent runs the pure-Python encoder, which is most of the cost, so each one is only encoded once.
+
+CHUNK_EXAMPLES = 256  # examples per pool task
+
+_rendered: Dict[Tuple[str, str, Any, str], str] = {}
+_fragments: Dict[Tuple[str, str, str, str], str] = {}
+_escaped: Dict[str, str] = {}  # rendered payload -> its JSON string literal
+
+@lru_cache(maxsize=65536)
+def _parse_call(call_str: str) -> Tuple[Any, Any]:
+    params = parse_get_info_call(call_str)
+    return params.get("courses") or [], params.get("degree") or ""
+
+def transform_input(old_input: str, courses, degrees, stats: Dict[str, int]) -> str:
+    try:
+        courses_param, degree_param = _parse_call(old_input)
+    except Exception as e:
+        return json.dumps(
+            {"error": f"Failed to parse get_info: {str(e)}",
+             "raw_input": old_input},
+            indent=2
+        )
 
-    with TRAIN_IN_PATH.open("r", encoding="utf-8") as f:
-        train_data = json.load(f)
+    codes = tuple(courses_param) if isinstance(courses_param, list) else courses_param
+    key = (courses.digest, degrees.digest, codes, degree_param)
+    try:
+        rendered = _rendered.get(key)
+    except TypeError:  # unhashable literal in the call, don't memoize it
+        key, rendered = None, None
+    if rendered is not None:
+        stats["hits"] += 1
+        return rendered
 
-    new_data = []
+    stats["misses"] += 1
+    if isinstance(courses_param, list) and isinstance(degree_param, str) and all(isinstance(c, str) for c in courses_param):
+        rendered = render_payload(courses_param, degree_param, courses, degrees)
+    else:
+        info_payload = get_info(
+            courses=courses_param,
+            degree=degree_param,
+            courses_catalog=courses.data,
+            degrees_catalog=degrees.data,
+            course_index=courses.index,
+        )
+        rendered = json.dumps(info_payload, indent=2, ensure_ascii=False)
+    if key is not None:
+        _rendered[key] = rendered
+    return rendered
+
+def _fragment(kind: str, value: str, courses, degrees) -> str:
+    # One course entry (rendered at the depth of the courses_info list) or the degree_info block
+    key = (courses.digest, degrees.digest, kind, value)
+    text = _fragments.get(key)
+    if text is None:
+        if kind == "course":
+            payload = get_info([value], "", courses.data, degrees.data, course_index=courses.index)
+            text = json.dumps(payload["courses_info"][0], indent=2, ensure_ascii=False).replace("\n", "\n    ")
+        else:
+            payload = get_info(None, value, courses.data, degrees.data, course_index=courses.index)
+            text = json.dumps(payload["degree_info"], indent=2, ensure_ascii=False).replace("\n", "\n  ")
+        _fragments[key] = text
+    return text
+
+def render_payload(course_codes: List[str], degree: str, courses, degrees) -> str:
+    """Same text as json.dumps(get_info(course_codes, degree, ...), indent=2, ensure_ascii=False)."""
+    parts = []
+    if course_codes:
+        entries = ",\n    ".join(_fragment("course", code, courses, degrees) for code in course_codes)
+        parts.append('"courses_info": [\n    ' + entries + "\n  ]")
+    if degree:
+        parts.append('"degree_info": ' + _fragment("degree", degree, courses, degrees))
+    if not parts:
+        return "{}"
+    return "{\n  " + ",\n  ".join(parts) + "\n}"
+
+def _dump_example(example, payload_input: bool) -> str:
+    # Examples are flat {str: str} dicts, written here without the pure-Python indent encoder;
+    # the payload text repeats across examples, so its escaped form is kept as well
+    if not example or not all(type(k) is str and type(v) is str for k, v in example.items()):
+        return "  " + json.dumps(example, indent=2, ensure_ascii=False).replace("\n", "\n  ")
+    fields = []
+    for k, v in example.items():
+        if k == "input" and payload_input:
+            literal = _escaped.get(v)
+            if literal is None:
+                literal = _escaped[v] = encode_basestring(v)
+        else:
+            literal = encode_basestring(v)
+        fields.append(encode_basestring(k) + ": " + literal)
+    return "  {\n    " + ",\n    ".join(fields) + "\n  }"
 
-    for example in train_data:
+def transform_chunk(args) -> Tuple[str, Dict[str, int]]:
+    """Transform a list of examples, returned as their part of the output array (items at indent 2)."""
+    examples, courses_path, degrees_path = args
+    courses = courses_store(courses_path).get()
+    degrees = degrees_store(degrees_path).get()
+    stats = {"examples": len(examples), "hits": 0, "misses": 0}
+    items = []
+    for example in examples:
         old_input = example.get("input", "")
+        transformed = old_input.startswith("get_info")
+        if transformed:
+            example["input"] = transform_input(old_input, courses, degrees, stats)
+        items.append(_dump_example(example, transformed))
+    return ",\n".join(items), stats
 
-        if old_input.startswith("get_info"):
-            try:
-                params = parse_get_info_call(old_input)
-            except Exception as e:
-                example["input"] = json.dumps(
-                    {"error": f"Failed to parse get_info: {str(e)}",
-                     "raw_input": old_input},
-                    indent=2
-                )
-                new_data.append(example)
-                continue
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
 
-            courses_param = params.get("courses") or []
-            degree_param = params.get("degree") or ""
+def _ordered(pool, tasks, window):
+    # Like pool.imap, but only `window` chunks in flight (imap would read the whole input ahead)
+    pending = deque()
+    for task in tasks:
+        pending.append(pool.apply_async(transform_chunk, (task,)))
+        if len(pending) >= window:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
 
-            info_payload = get_info(
-                courses=courses_param,
-                degree=degree_param,
-                courses_catalog=courses_catalog,
-                degrees_catalog=degrees_catalog,
-            )
+def transform(train_in: Path, train_out: Path, courses_path: Path = COURSES_PATH, degrees_path: Path = DEGREES_PATH,
+              workers: Optional[int] = None, chunk_examples: int = CHUNK_EXAMPLES) -> Dict[str, Any]:
+    """
+    Same output as json.dump(transformed examples, indent=2, ensure_ascii=False), written chunk by chunk.
+    workers=1 runs in this process; returns counts, cache hits and timing.
+    """
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    tasks = ((chunk, courses_path, degrees_path) for chunk in _chunks(iter_array(train_in), chunk_examples))
+    totals = {"examples": 0, "hits": 0, "misses": 0}
 
-            example["input"] = json.dumps(info_payload, indent=2, ensure_ascii=False)
+    pool = Pool(workers) if workers > 1 else None
+    try:
+        results = _ordered(pool, tasks, 2 * workers) if pool else map(transform_chunk, tasks)
+        with open(train_out, "w", encoding="utf-8") as f:
+            f.write("[")
+            for text, stats in results:
+                if not stats["examples"]:
+                    continue
+                f.write(("\n" if totals["examples"] == 0 else ",\n") + text)
+                for k in totals:
+                    totals[k] += stats[k]
+            f.write("\n]" if totals["examples"] else "]")
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
 
-        new_data.append(example)
+    calls = totals["hits"] + totals["misses"]
+    totals.update(
+        workers=workers,
+        seconds=time.perf_counter() - start,
+        hit_rate=totals["hits"] / calls if calls else 0.0,
+    )
+    return totals
 
-    with TRAIN_OUT_PATH.open("w", encoding="utf-8") as f:
-        json.dump(new_data, f, indent=2, ensure_ascii=False)
+def main(train_in=TRAIN_IN_PATH, train_out=TRAIN_OUT_PATH, workers=None):
+    report = transform(Path(train_in), Path(train_out), workers=workers)
+    print(f"Transformed {report['examples']} examples in {report['seconds']:.2f}s with {report['workers']} workers; "
+          f"get_info cache: {report['hits']} hits / {report['misses']} misses ({report['hit_rate']:.0%})")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Fill in the get_info(...) inputs of the fine-tuning set from the catalogs")
+    parser.add_argument("input", nargs="?", default=str(TRAIN_IN_PATH))
+    parser.add_argument("output", nargs="?", default=str(TRAIN_OUT_PATH))
+    parser.add_argument("--workers", type=int, default=None, help="processes to use (default: all cores, 1 = no pool)")
+    args = parser.parse_args()
+    main(args.input, args.output, workers=args.workers)
@@ -0,0 +1,332 @@
+import re
+import threading
+from collections import Counter
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+from input_parser import DEGREE_SYNONYMS
+from json_data.catalog_binary import open_course_index
+from json_data.catalog_store import file_digest
+from semantic_index import infer_level
+
+# Model-free course retrieval: BM25 over titles, descriptions and keywords
+#
+# Built in memory from courses.json (~0.4s, redone when the file changes). Postings are
+# stored CSR-style: one int32 array of document ids and one float32 array of precomputed BM25 impacts
+# per (term, course), with an offsets array per term, so a query is a handful of slices, one bincount
+# and an argpartition. Title and keyword words count more than description words. Query words that
+# aren't in the catalog are corrected to a catalog word within one or two edits ("machne" -> "machine"),
+# the candidates come from a trigram -> word postings array built the same way.
+
+K1 = 1.2
+B = 0.75
+FIELD_WEIGHTS = {"title": 3, "keywords": 2, "description": 1}
+TOP_K = 3
+MIN_SCORE = 4.0  # one rare word in a description scores about this much
+RELATIVE_SCORE = 0.5  # hits below this share of the best score are dropped
+MIN_COVERAGE = 0.6  # share of the query's idf a hit has to match, one stray word in a long question isn't a topic
+TYPO_MIN_LENGTH = 4
+TYPO_MIN_SIMILARITY = 0.2  # Jaccard similarity of the trigram sets, just a prefilter
+TYPO_CANDIDATES = 8
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+# Prerequisite text names other courses ("Recommended background: CS 2102 Object-Oriented Design"),
+# indexing it would rank a course for its prerequisites' topics
+BACKGROUND_CUT_RE = re.compile(r"\b(?:(?:Recommended|Suggested|Required) [Bb]ackground|Prerequisites?|Students (?:should|must) have)\b")
+# "the BS Computer Science degree" is about degrees.json, not courses that mention computer science
+DEGREE_RE = re.compile(
+    r"\b(?:bs|ms|bs\+ms|b\.s\.|m\.s\.|bachelor of science|master of science)\s+(?:in\s+)?(?:computer science|data science|cs|ds)\b|"
+    + "|".join(re.escape(p) for p in sorted((p for ps in DEGREE_SYNONYMS.values() for p in ps), key=len, reverse=True)),
+    flags=re.IGNORECASE,
+)
+CATEGORY_RE = re.compile(r"^\s*Cat\.\s*[I1V]+\b\s*")
+
+STOPWORDS = frozenset("""
+a about after all also an and any either neither are as at be been before being but by can could course courses class classes
+do does did for from get had has have how i if in into is it its me more my no not of on or our over should so
+some such than that the their them then there these they this those through to too under up us was we were what
+when where which while who why will with would you your
+offered offer offering take taking took teach teaches taught cover covers covering learn learning about topic
+topics intro introduction introductory student students semester term terms wpi anything something want looking
+need recommend recommended good best like many much lot kind list show tell know explain help please
+graduate grad undergrad undergraduate freshman sophomore junior senior first year years major minor degree credit
+credits requirement requirements prerequisite prerequisites background spring fall summer winter morning afternoon
+evening professor instructor section sections seat seats open time times day days schedule available
+bs ms bachelor bachelors master masters phd program programs information description give required different
+possible reasonable regular same both multiple one two three four instead still complete starting start
+mqp hua depth breadth project projects thesis overload difference difficulty focus focused structure number level
+elective department frame typical typically general generally long total allowed finish faster less minimum
+standard primary academic key option stand id equivalent interested pursuing consider considering thinking per
+single done doing getting work specifically during cs ds able am between taken completed completing multi
+next upcoming coming now currently later soon going plan planning
+""".split())
+# "learning" is an advising word in "I want to learn about..." but half of "machine learning"
+STOPWORDS = STOPWORDS - {"learning"}
+
+
+@lru_cache(maxsize=65536)
+def stem(word: str) -> str:
+    # Just enough to merge plurals and the common verb/noun endings, not a real stemmer
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    # "es" is only the plural ending after a sibilant ("classes", "boxes", "approaches"),
+    # "databases" is "database" + "s"
+    if len(word) > 4 and word.endswith(("sses", "xes", "zes", "ches", "shes")):
+        return word[:-2]
+    for suffix in ("ing", "ed", "s"):
+        if len(word) - len(suffix) >= 4 and word.endswith(suffix) and not word.endswith("ss"):
+            return word[: -len(suffix)]
+    return word
+
+
+def words(text: str) -> List[str]:
+    # Bare numbers are course numbers or levels ("500-level"), the code matcher already handles those
+    return [t for t in TOKEN_RE.findall(text.lower()) if len(t) > 1 and t not in STOPWORDS and not t.isdigit()]
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Optimal string alignment distance (a transposition counts as one edit), capped at limit + 1."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous, current = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        before, previous, current = previous, current, [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if before is not None and i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], before[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+    return current[-1]
+
+
+def trigrams(term: str) -> List[str]:
+    padded = f" {term} "
+    return sorted({padded[i:i + 3] for i in range(len(padded) - 2)})
+
+
+def course_fields(course: Dict[str, Any]) -> Dict[str, str]:
+    description = CATEGORY_RE.sub("", course.get("description") or "")
+    description = BACKGROUND_CUT_RE.split(description, maxsplit=1)[0]
+    return {
+        "title": course.get("title") or "",
+        "keywords": " ".join(course.get("keywords") or []),
+        "description": description,
+    }
+
+
+class LexicalIndex:
+    def __init__(self, catalog_index: Mapping[str, Any], digest: str = ""):
+        self.digest = digest
+        self.codes: List[str] = sorted(catalog_index)
+        courses = [catalog_index[c] for c in self.codes]  # decoded once, a BinaryCatalog parses on every lookup
+        self.disciplines = np.asarray([(c.get("discipline") or "").upper() for c in courses])
+        self.levels = np.asarray([c.get("level") or "" for c in courses])
+
+        # Surface words are kept next to the stemmed terms, typos are corrected on what the student typed
+        self.vocab: Dict[str, int] = {}
+        self.words: Dict[str, int] = {}
+        term_ids, doc_ids, counts = [], [], []
+        for doc_id, course in enumerate(courses):
+            tf: Counter = Counter()
+            for field, text in course_fields(course).items():
+                for word in words(text):
+                    term_id = self.vocab.setdefault(stem(word), len(self.vocab))
+                    self.words.setdefault(word, term_id)
+                    tf[term_id] += FIELD_WEIGHTS[field]
+            term_ids.extend(tf)
+            doc_ids.extend([doc_id] * len(tf))
+            counts.extend(tf.values())
+        self.terms = list(self.vocab)
+
+        # Group by term (stable, so each posting list stays sorted by course) and fix the BM25
+        # impact of every (term, course) pair at build time
+        term_ids = np.asarray(term_ids, dtype=np.int32)
+        order = np.argsort(term_ids, kind="stable")
+        self.doc_ids = np.asarray(doc_ids, dtype=np.int32)[order]
+        tf = np.asarray(counts, dtype=np.float32)[order]
+        df = np.bincount(term_ids, minlength=len(self.terms))
+        self.offsets = np.zeros(len(self.terms) + 1, dtype=np.int64)
+        self.offsets[1:] = np.cumsum(df)
+
+        n = len(self.codes)
+        lengths = np.bincount(doc_ids, weights=counts, minlength=n).astype(np.float32)
+        avg_length = float(lengths.mean()) if n else 1.0
+        self.df = df
+        self.idf = np.log(1 + (n - df + 0.5) / (df + 0.5)).astype(np.float32)
+        norm = K1 * (1 - B + B * lengths[self.doc_ids] / avg_length)
+        self.impacts = (np.repeat(self.idf, df) * tf * (K1 + 1) / (tf + norm)).astype(np.float32)
+
+        # trigram -> surface word postings, for typo correction
+        self.word_list = list(self.words)
+        gram_ids, word_ids = [], []
+        self.trigram_vocab: Dict[str, int] = {}
+        self.word_trigrams = np.zeros(len(self.word_list), dtype=np.int32)
+        for word_id, word in enumerate(self.word_list):
+            grams = trigrams(word)
+            self.word_trigrams[word_id] = len(grams)
+            for gram in grams:
+                gram_ids.append(self.trigram_vocab.setdefault(gram, len(self.trigram_vocab)))
+                word_ids.append(word_id)
+        gram_ids = np.asarray(gram_ids, dtype=np.int32)
+        order = np.argsort(gram_ids, kind="stable")
+        self.trigram_words = np.asarray(word_ids, dtype=np.int32)[order]
+        self.trigram_offsets = np.zeros(len(self.trigram_vocab) + 1, dtype=np.int64)
+        self.trigram_offsets[1:] = np.cumsum(np.bincount(gram_ids, minlength=len(self.trigram_vocab)))
+
+        self._corrections: Dict[str, Optional[int]] = {}
+        self._masks: Dict[Tuple[Optional[str], Optional[str]], np.ndarray] = {}
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def correct(self, word: str) -> Optional[int]:
+        """Term id of the catalog word closest to a misspelled one, or None."""
+        if word in self._corrections:
+            return self._corrections[word]
+        best = None
+        grams = [self.trigram_vocab[g] for g in trigrams(word) if g in self.trigram_vocab]
+        if len(word) >= TYPO_MIN_LENGTH and grams:
+            # Trigram overlap narrows ~10k words to a few candidates, edit distance decides
+            candidates = np.concatenate([self.trigram_words[self.trigram_offsets[g]:self.trigram_offsets[g + 1]] for g in grams])
+            overlap = np.bincount(candidates, minlength=len(self.word_list))
+            similarity = overlap / (len(trigrams(word)) + self.word_trigrams - overlap)
+            top = np.argpartition(-similarity, min(TYPO_CANDIDATES, len(similarity) - 1))[:TYPO_CANDIDATES]
+            max_distance = 1 if len(word) <= 7 else 2
+            best_distance = max_distance + 1
+            for word_id in top[np.argsort(-similarity[top], kind="stable")]:
+                if similarity[word_id] < TYPO_MIN_SIMILARITY:
+                    break
+                candidate = self.word_list[word_id]
+                distance = edit_distance(word, candidate, best_distance - 1)
+                if distance < best_distance:
+                    best, best_distance = self.words[candidate], distance
+                    if distance <= 1:  # can't do better than one edit for a word that isn't in the catalog
+                        break
+        if len(self._corrections) < 10000:  # queries are short, this never really fills up
+            self._corrections[word] = best
+        return best
+
+    def query_terms(self, text: str) -> List[int]:
+        term_ids = []
+        for word in words(DEGREE_RE.sub(" ", text)):
+            term_id = self.vocab.get(stem(word))
+            if term_id is None:
+                term_id = self.correct(word)
+            if term_id is not None and term_id not in term_ids:
+                term_ids.append(term_id)
+        return term_ids
+
+    def _mask(self, discipline: Optional[str], level: Optional[str]) -> Optional[np.ndarray]:
+        if discipline is None and level is None:
+            return None
+        key = (discipline, level)
+        mask = self._masks.get(key)
+        if mask is None:
+            mask = np.ones(len(self.codes), dtype=bool)
+            if discipline is not None:
+                mask &= self.disciplines == discipline.upper()
+            if level is not None:
+                mask &= self.levels == level
+            self._masks[key] = mask
+        return mask
+
+    def search(self, text: str, k: int = TOP_K, discipline: Optional[str] = None, level: Optional[str] = None,
+               min_score: float = 0.0, relative_score: float = 0.0, min_coverage: float = 0.0) -> List[Tuple[str, float]]:
+        """Top-k (code, BM25 score) for a question, best first."""
+        term_ids = self.query_terms(text)
+        if not term_ids or not self.codes:
+            return []
+        slices = [slice(self.offsets[t], self.offsets[t + 1]) for t in term_ids]
+        docs = np.concatenate([self.doc_ids[s] for s in slices])
+        scores = np.bincount(docs, weights=np.concatenate([self.impacts[s] for s in slices]), minlength=len(self.codes))
+        mask = self._mask(discipline, level)
+        if mask is not None:
+            scores = np.where(mask, scores, 0.0)
+        if min_coverage > 0 and len(term_ids) > 1:
+            idf = self.idf[term_ids]
+            matched = np.bincount(docs, weights=np.repeat(idf, [s.stop - s.start for s in slices]), minlength=len(self.codes))
+            scores = np.where(matched >= min_coverage * float(idf.sum()), scores, 0.0)
+
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        cutoff = max(min_score, relative_score * float(scores[top[0]]), 1e-9)
+        return [(self.codes[i], float(scores[i])) for i in top if scores[i] >= cutoff]
+
+
+class LexicalRetriever:
+    """
+    parse_user_string retriever: question text -> course codes to feed get_info.
+    Builds the index on first use and again whenever courses.json changes.
+    """
+
+    def __init__(self, courses_path: Path, k: int = TOP_K, min_score: float = MIN_SCORE, relative_score: float = RELATIVE_SCORE,
+                 min_coverage: float = MIN_COVERAGE):
+        self.courses_path = Path(courses_path)
+        self.k = k
+        self.min_score = min_score
+        self.relative_score = relative_score
+        self.min_coverage = min_coverage
+        self.index: Optional[LexicalIndex] = None
+        self.last_hits: List[Tuple[str, float]] = []
+        self._lock = threading.Lock()
+
+    def current_index(self) -> LexicalIndex:
+        # Built from the mmapped courses.bin when it's current, so workers don't keep the parsed JSON around
+        digest = file_digest(self.courses_path)  # a stat() unless the file changed
+        index = self.index
+        if index is not None and index.digest == digest:
+            return index
+        with self._lock:
+            if self.index is None or self.index.digest != digest:
+                self.index = LexicalIndex(open_course_index(self.courses_path), digest)
+            return self.index
+
+    def search(self, text: str, k: Optional[int] = None, discipline: Optional[str] = None,
+               level: Optional[str] = None) -> List[Tuple[str, float]]:
+        return self.current_index().search(text, k or self.k, discipline, level, self.min_score, self.relative_score, self.min_coverage)
+
+    def __call__(self, text: str) -> List[str]:
+        self.last_hits = self.search(text, level=infer_level(text))
+        return [code for code, _ in self.last_hits]
+
+
+class FirstHitRetriever:
+    """Asks each retriever in turn and returns the first non-empty answer (cheap ones first)."""
+
+    def __init__(self, *retrievers: Callable[[str], List[str]]):
+        self.retrievers = [r for r in retrievers if r is not None]
+
+    def __call__(self, text: str) -> List[str]:
+        for retriever in self.retrievers:
+            codes = retriever(text)
+            if codes:
+                return codes
+        return []
+
+
+def main(argv: Optional[Iterable[str]] = None) -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Search the course catalog with the BM25 index")
+    parser.add_argument("query", nargs="+")
+    parser.add_argument("--courses", default="json_data/courses.json")
+    parser.add_argument("-k", type=int, default=TOP_K)
+    args = parser.parse_args(argv)
+
+    retriever = LexicalRetriever(Path(args.courses), k=args.k)
+    text = " ".join(args.query)
+    index = retriever.current_index()
+    print("terms:", [index.terms[t] for t in index.query_terms(text)])
+    catalog = open_course_index(retriever.courses_path)
+    for code, score in retriever.search(text):
+        print(f"{score:6.2f}  {code}  {catalog[code].get('title')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,125 +1,393 @@
 import sys
 import json
+import time
+from pathlib import Path
 import numpy as np
-import matplotlib.pyplot as plt
-from sklearn.decomposition import PCA
 from llama_cpp import Llama
 
-from input_parser import parse_user_string
+from input_parser import parse_user_string, COURSES_PATH, DEGREES_PATH
+from context_compaction import ContextCompactor
+from prompt_cache import PrefixStateCache, model_fingerprint
+from session_store import SessionStore
+from response_cache import ResponseCache, make_key
+from json_data.catalog_manifest import catalog_version, changed_courses
+from embedding_backend import SmallModelEmbedder, make_embedder
+from inference_landscape import InferenceLandscape
+from speculative import check_draft_vocab, make_draft_model
+from fast_path import FastPathRouter
+import tracing
+from semantic_index import SemanticRetriever
+from lexical_index import LexicalRetriever, FirstHitRetriever
+from schedule_index import ScheduleRetriever
 
 MODEL_PATH = "./wpi-advisor-final.gguf"
 GPU_LAYERS = -1
 CTX_SIZE = 4096
+MAX_TOKENS = 512
+TEMPERATURE = 0.7
+STOP = ["###", "</s>"]
+COMPACT_CONTEXT = True # minify/dedupe/trim the get_info payload so the prompt fits CTX_SIZE (see context_compaction.py)
+PREFIX_CACHE = True # snapshot the KV state of the static preamble next to the GGUF (see prompt_cache.py)
+RESPONSE_CACHE = True # reuse answers to repeated questions until the catalog changes (see response_cache.py)
+RESPONSE_CACHE_SAMPLED = True # ...even though TEMPERATURE > 0 would give a different answer each time; False always samples a fresh one
+EMBEDDING_BACKEND = "small" # "small" = separate embedding GGUF, "main" = extra 70B forward pass, "none" = no PCA graph (see embedding_backend.py)
+EMBEDDING_MODEL_PATH = "./local_models/nomic-embed-text-v1.5.Q8_0.gguf"
+LEXICAL_RETRIEVAL = True # questions without a course code get the best BM25 matches on course titles/descriptions (see lexical_index.py)
+SEMANTIC_RETRIEVAL = True # ...and when no word matches, the closest courses from an embedding index of the catalog (see semantic_index.py)
+PLOT = True # False turns the PCA graph (and the embeddings behind it) off entirely
+PLOT_HISTORY = 512 # most recent questions kept on the graph
+SPECULATIVE = None # None = plain decoding, "prompt_lookup" = draft from n-grams already in the prompt, or a draft GGUF path (see speculative.py)
+DRAFT_TOKENS = 10 # tokens proposed per speculative step
+TRACE = False # True writes per-stage timings to a rotating 'traces.jsonl' + Prometheus 'metrics.prom' in the working directory (see tracing.py, summarize with 'python tracing.py')
+SCHEDULE = True # day/time/conflict questions get a short answer from an index of every section's meeting times (see schedule_index.py)
+FAST_PATH = True # answer pure catalog lookups (section times, instructors, status, background, requirement text) from templates (see fast_path.py)
+
+# This exact Alpaca format was used to fine-tune, getting the exact (or as close as possible) text as shown in training is very important!!
+ALPACA_TEMPLATE = """Below is an instruction that describes a task, paired with an input that provides further context. Write a response that appropriately completes the request.
+
+### Instruction:
+{instruction}
+
+### Input:
+{input_ctx}
+
+### Response:
+"""
+
+# Everything before the instruction is identical for every request
+PROMPT_PREFIX = ALPACA_TEMPLATE.split("{instruction}")[0]
+
+class AdviceStream:
+    """Iterator over response text pieces; confidence and timings are set once it is exhausted."""
+
+    def __init__(self, generator):
+        self._generator = generator
+        self.confidence = None
+        self.timings = None
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self._generator)
+        except StopIteration as done:
+            if done.value is not None:
+                self.confidence, self.timings = done.value
+            raise
+
+    def close(self):
+        self._generator.close()
+
+class SampledLogprobs:
+    """
+    logits_processor that keeps the log-probability of every sampled token, so the confidence
+    score doesn't need logits_all=True (which keeps an n_ctx x n_vocab float matrix around).
+    llama.cpp calls it with the raw logits right before sampling, once per position, and the
+    token picked for position start+k is in input_ids by call k+1, so each call scores the
+    previous step's choice. (With speculative decoding input_ids also holds unverified draft
+    tokens past that position, which is why this counts positions instead of using input_ids[-1].)
+    The last sampled token (EOS, or the end of a stop sequence) is never scored, same as before.
+    """
+
+    def __init__(self):
+        self.steps = 0 # tokens sampled
+        self.total = 0.0
+        self.count = 0
+        self._start = None
+        self._prev_logits = None
+        self._prev_logsumexp = 0.0
+
+    def __call__(self, input_ids, logits):
+        if self._start is None:
+            self._start = len(input_ids) - 1 # position of the last prompt token
+        else:
+            self.total += float(self._prev_logits[input_ids[self._start + self.steps]]) - self._prev_logsumexp
+            self.count += 1
+        top = float(logits.max())
+        self._prev_logsumexp = top + float(np.log(np.exp(logits - top).sum()))
+        self._prev_logits = logits.copy() # the buffer is reused by llama.cpp
+        self.steps += 1
+        return logits
+
+    def mean(self):
+        return self.total / self.count if self.count else -999.0
 
 class AdvisorSystem:
-    def __init__(self, model_path):
+    def __init__(self, model_path, compact_context=COMPACT_CONTEXT, prefix_cache=PREFIX_CACHE, response_cache=RESPONSE_CACHE, response_cache_sampled=RESPONSE_CACHE_SAMPLED, embedding_backend=EMBEDDING_BACKEND, plot=PLOT,
+                 gpu_layers=GPU_LAYERS, n_threads=None, max_tokens=MAX_TOKENS, speculative=SPECULATIVE, draft_tokens=DRAFT_TOKENS,
+                 fast_path=FAST_PATH, trace=TRACE, lexical_retrieval=LEXICAL_RETRIEVAL, semantic_retrieval=SEMANTIC_RETRIEVAL,
+                 schedule_index=SCHEDULE):
         print(f"Loading WPI Advisor Model from {model_path}... This may take a minute!")
         
+        self.draft_model = make_draft_model(speculative, draft_tokens)
         self.llm = Llama(
             model_path=model_path,
-            n_gpu_layers=GPU_LAYERS,
+            n_gpu_layers=gpu_layers,
             n_ctx=CTX_SIZE,
-            embedding=True, # needed for the PCA graph (specifically the X/Y dimensions)
-            logits_all=True,
+            n_threads=n_threads, # None = llama.cpp's default; worker_pool.py splits the cores between processes
+            n_threads_batch=n_threads,
+            embedding=plot and embedding_backend == "main", # only when the 70B itself embeds for the PCA graph
+            draft_model=self.draft_model,
             verbose=False
         )
+        check_draft_vocab(self.draft_model, self.llm)
+        self.max_tokens = max_tokens
+
+        # X/Y dimensions of the PCA graph (see embedding_backend.py)
+        self.embedder = make_embedder(embedding_backend, self.llm, EMBEDDING_MODEL_PATH) if plot else None
         
         # Store information to populate the PCA graph
-        # After every message, the graph is regenerated with the updated message
-        self.history_embeddings = []
-        self.history_confidences = []
-        self.history_labels = []
+        # After every message, the graph is regenerated (in the background) with the updated message
+        self.landscape = InferenceLandscape(PLOT_HISTORY) if plot else None
+        self.track_history = True # False skips the embedding + PCA bookkeeping (batch runs)
 
-    def construct_prompt(self, instruction, input_ctx):
-        # This exact Alpaca format was used to fine-tune, getting the exact (or as close as possible) text as shown in training is very important!!
-        return f"""Below is an instruction that describes a task, paired with an input that provides further context. Write a response that appropriately completes the request.
+        # "is there a class on neural networks?" names no code, the retrieval indexes find the courses instead
+        # Built (or updated for a new courses.json) here, so the first question doesn't pay for it
+        # The BM25 index goes first (~0.1ms, no model), the embedding index only sees questions it found nothing for
+        lexical = semantic = None
+        if lexical_retrieval:
+            lexical = LexicalRetriever(COURSES_PATH)
+            lexical.current_index()
+        if semantic_retrieval and Path(EMBEDDING_MODEL_PATH).exists():
+            embedder = self.embedder if isinstance(self.embedder, SmallModelEmbedder) else SmallModelEmbedder(EMBEDDING_MODEL_PATH)
+            semantic = SemanticRetriever(COURSES_PATH, embedder.embed, embedder.model_id)
+            semantic.current_index()
+        elif semantic_retrieval:
+            print(f"[Semantic] {EMBEDDING_MODEL_PATH} not found, questions without a course code only get keyword matches")
+        self.course_retriever = FirstHitRetriever(lexical, semantic) if lexical or semantic else None
 
-### Instruction:
-{instruction}
+        # "what CS courses meet Tuesday mornings?" / "does CS 3013 conflict with CS 4341?" are answered
+        # from parsed meeting times instead of the model reading every section (~50ms to build)
+        self.schedule = None
+        if schedule_index:
+            self.schedule = ScheduleRetriever(COURSES_PATH)
+            self.schedule.current_index()
 
-### Input:
-{input_ctx}
+        # Token counts use the model's own tokenizer so the budget is exact
+        self.compactor = ContextCompactor(count_tokens=self.count_tokens) if compact_context else None
+        self.last_context_report = None
 
-### Response:
-"""
+        # Evaluated once (or loaded from disk) so requests only prefill their own suffix
+        self.prefix_cache = None
+        if prefix_cache:
+            self.prefix_cache = PrefixStateCache(self.llm, model_path, PROMPT_PREFIX)
+            self.prefix_cache.load_or_build()
+        self.last_timings = {}
 
-    def get_advice(self, user_query, manual_courses=None):
-        if manual_courses is None: manual_courses = []
-        
-        parsed = parse_user_string(user_query, manual_courses)
-        prompt = self.construct_prompt(parsed["instruction"], parsed["input"])
-        
-        # Embed only the instruction (text in "input" is too unorganized)
-        raw_embed_response = self.llm.create_embedding(parsed["instruction"])
+        # Multi-turn conversations keep their KV state between turns (see session_store.py)
+        self.sessions = SessionStore(self.llm, ALPACA_TEMPLATE)
 
-        if 'data' in raw_embed_response and len(raw_embed_response['data']) > 0:
-            raw_list = raw_embed_response['data'][0]['embedding']
-            
-            embedding_np = np.array(raw_list)
-            
-            HIDDEN_SIZE = 8192
-            
-            if embedding_np.ndim == 1 and embedding_np.size > HIDDEN_SIZE:
-                embedding_np = embedding_np.reshape(-1, HIDDEN_SIZE)
+        # Entries are stamped with the catalog version, so a new scrape expires them all
+        # Keys include the model, the cascade's two tiers share the cache file (see cascade.py)
+        self.model_id = model_fingerprint(model_path) if Path(model_path).exists() else str(model_path)
+        self.response_cache = None
+        if response_cache:
+            # A course refresh only expires the answers that used the changed courses (see json_data/catalog_manifest.py)
+            self.response_cache = ResponseCache(lambda: catalog_version(COURSES_PATH, DEGREES_PATH),
+                                                lambda old, new: changed_courses(COURSES_PATH, old, new),
+                                                bypass_when_sampling=not response_cache_sampled)
 
-            pooled_embedding = np.mean(embedding_np, axis=0)
-            
+        # Lookups the catalog answers by itself never reach the model
+        self.fast_path = FastPathRouter() if fast_path else None
+
+        # Shared by every advisor in the process; when off, spans are a no-op
+        self.tracer = tracing.configure(enabled=trace)
+
+    def wants_embedding(self):
+        return self.track_history and self.landscape is not None and self.embedder is not None
+
+    def sampling_params(self):
+        return {"max_tokens": self.max_tokens, "stop": STOP, "temperature": TEMPERATURE}
+
+    def count_tokens(self, text):
+        return len(self.llm.tokenize(text.encode("utf-8"), add_bos=False))
+
+    def construct_prompt(self, instruction, input_ctx):
+        return ALPACA_TEMPLATE.format(instruction=instruction, input_ctx=input_ctx)
+
+    def prepare_prompt(self, instruction, input_ctx, session_id=None):
+        """
+        Return (prompt tokens, how many of them are already in the KV cache).
+        With a session_id the prompt continues that session's transcript.
+        """
+        if session_id is None:
+            self.sessions.release()
+            if self.prefix_cache: self.prefix_cache.prepare()
+            prompt = self.construct_prompt(instruction, input_ctx)
+            tokens = self.llm.tokenize(prompt.encode("utf-8"), add_bos=True, special=True)
         else:
-            pooled_embedding = np.zeros(8192)
+            tokens, reused = self.sessions.prepare_turn(session_id, instruction, input_ctx, self.max_tokens)
+            # A brand new session (or a slid window) can still start from the cached preamble
+            if self.prefix_cache and reused < len(self.prefix_cache.tokens): self.prefix_cache.prepare()
+
+        return tokens, Llama.longest_token_prefix(self.llm._input_ids.tolist(), tokens)
+
+    def retrieve(self, user_query, manual_courses=None):
+        """Parsing + catalog retrieval only, no model calls besides tokenization (safe to run off the model thread)."""
+        if manual_courses is None: manual_courses = []
+
+        # The request's trace starts here and travels with the parsed result to _generate
+        trace = self.tracer.start()
+        with self.tracer.activate(trace), trace.span("retrieve"):
+            # Whatever is left of the context window after the template, the question and the response
+            with trace.span("budget"):
+                budget = CTX_SIZE - self.max_tokens - self.count_tokens(self.construct_prompt(user_query, ""))
+            parsed = parse_user_string(user_query, manual_courses, compactor=self.compactor, token_budget=budget,
+                                       retriever=self.course_retriever, schedule=self.schedule)
+
+            # A separate embedding model can run here, overlapping with generation in server.py/batch_inference.py
+            if self.wants_embedding() and not self.embedder.clears_kv:
+                with trace.span("embedding"):
+                    parsed["embedding"] = self.embedder.embed(parsed["instruction"])
+        parsed["trace"] = trace
+        parsed["retrieved_at"] = time.perf_counter()
+        return parsed
+
+    def get_advice(self, user_query, manual_courses=None, session_id=None, parsed=None):
+        stream = self.get_advice_stream(user_query, manual_courses, session_id, parsed)
+        response_text = "".join(stream)
+        return response_text, stream.confidence
+
+    def get_advice_stream(self, user_query, manual_courses=None, session_id=None, parsed=None):
+        """
+        Same as get_advice, but returns an AdviceStream that yields the response text as it
+        is decoded. Its confidence/timings are filled in once it has been consumed.
+        `parsed` is the result of retrieve() when it was already done elsewhere.
+        """
+        return AdviceStream(self._generate(user_query, manual_courses, session_id, parsed))
+
+    def _generate(self, user_query, manual_courses, session_id, parsed):
+        # Yields text pieces and returns (confidence, timings) when generation is done
+        request_start = time.perf_counter()
+        if parsed is None:
+            parsed = self.retrieve(user_query, manual_courses)
+        elif "retrieved_at" in parsed:
+            # Retrieved ahead of time (server.py/batch_inference.py), the gap is time spent queued
+            parsed.get("trace", tracing.NULL_TRACE).record("queue", request_start - parsed["retrieved_at"], parsed["retrieved_at"])
+        trace = parsed.get("trace", tracing.NULL_TRACE)
+        trace.set(session=session_id is not None)
+        self.last_context_report = parsed.get("context_report")
+
+        # Deterministic answers skip the cache, the embedding and the model entirely
+        # Inside a session the answer still becomes a turn, so follow-ups can refer to it
+        fast = None
+        if self.fast_path:
+            with trace.span("fast_path"):
+                fast = self.fast_path.route(user_query, parsed)
+        if fast is not None:
+            yield fast.text
+            if session_id is not None:
+                self.sessions.record_turn(session_id, parsed["instruction"], parsed["input"], fast.text)
+            self.last_timings = {"fast_path": fast.intent, "total_seconds": time.perf_counter() - request_start}
+            return 0.0, self._finish_trace(trace, "fast_path")
+
+        # Answers inside a session depend on the conversation, so only one-off questions are cached
+        # Cache hits skip the embedding as well, so they don't add a point to the PCA graph
+        cache_key = None
+        sampling = self.sampling_params()
+        if self.response_cache and session_id is None and not self.response_cache.should_bypass(sampling):
+            with trace.span("cache_lookup"):
+                cache_key = make_key(parsed["instruction"], parsed["input"], sampling, self.model_id)
+                cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                yield cached[0]
+                self.last_timings = {"cache_hit": True, "total_seconds": time.perf_counter() - request_start}
+                return cached[1], self._finish_trace(trace, "cache_hit")
+        
+        # Embed only the instruction (text in "input" is too unorganized)
+        # Embedding with the 70B clears its KV cache, so a live session is snapshotted first
+        # Batch runs turn this off, which also keeps the KV cache warm between requests
+        pooled_embedding = parsed.get("embedding")
+        if pooled_embedding is None and self.wants_embedding():
+            with trace.span("embedding"):
+                if self.embedder.clears_kv: self.sessions.release()
+                pooled_embedding = self.embedder.embed(parsed["instruction"])
         
-        output = self.llm.create_completion(
-            prompt,
-            max_tokens=512,
-            stop=["###", "</s>"],
+        with trace.span("prompt_setup"): # tokenizing + restoring the prefix/session KV state
+            prompt_tokens, cached_tokens = self.prepare_prompt(parsed["instruction"], parsed["input"], session_id)
+        start = time.perf_counter()
+        logprobs = SampledLogprobs()
+        if self.draft_model:
+            self.draft_model.reset()
+            draft_before = self.draft_model.snapshot()
+        chunks = self.llm.create_completion(
+            prompt_tokens,
+            max_tokens=sampling["max_tokens"],
+            stop=sampling["stop"], # llama.cpp holds back text that could be the start of a stop sequence and ends the stream on a match
             echo=False,
-            temperature=0.7,
-            logprobs=1 # Needed for calculating Z-axis
+            temperature=sampling["temperature"],
+            logits_processor=[logprobs], # Needed for calculating Z-axis
+            stream=True
         )
-        
-        response_text = output['choices'][0]['text']
-        
+
         # Take the average log-probability of the tokens generated
         # Higher (closer to 0) = more confidence in response. Lower (more negative) = less confidence in response
         # If viewing this within the rest of the project repository, view the file 'chat_history.txt' to view the exact values for each response from the model
-        token_logprobs = output['choices'][0]['logprobs']['token_logprobs']
-        valid_logprobs = [lp for lp in token_logprobs if lp is not None]
-        avg_confidence = np.mean(valid_logprobs) if valid_logprobs else -999.0
-        
-        self.history_embeddings.append(pooled_embedding)
-        self.history_confidences.append(avg_confidence)
-        self.history_labels.append(user_query[:20] + "...")
+        # Kept as a running sum (SampledLogprobs) so it is ready the moment the last token arrives
+        first_token_time = None
+        pieces = []
+        for chunk in chunks:
+            text = chunk['choices'][0]['text']
+            if text:
+                if first_token_time is None: first_token_time = time.perf_counter()
+                pieces.append(text)
+                yield text
+        end = time.perf_counter()
+        # The first piece arrives once the prompt is evaluated and one token sampled
+        trace.record("prefill", (first_token_time or end) - start, start)
+        trace.record("decode", end - (first_token_time or end), first_token_time or end)
+
+        response_text = "".join(pieces)
+        avg_confidence = logprobs.mean()
+        completion_tokens = logprobs.steps
+
+        if session_id is not None:
+            self.sessions.finish_turn(session_id, parsed["instruction"], parsed["input"], prompt_tokens, response_text)
+
+        decode_seconds = end - (first_token_time or end)
+        self.last_timings = {
+            "prompt_tokens": len(prompt_tokens),
+            "prefill_tokens": len(prompt_tokens) - cached_tokens,
+            "completion_tokens": completion_tokens,
+            "time_to_first_token": (first_token_time or end) - request_start,
+            "tokens_per_second": (completion_tokens - 1) / decode_seconds if decode_seconds > 0 and completion_tokens > 1 else 0.0,
+            "generation_seconds": end - start,
+            "total_seconds": end - request_start,
+        }
+        if self.draft_model:
+            draft_after = self.draft_model.snapshot()
+            self.last_timings["draft_tokens"] = draft_after["drafted"] - draft_before["drafted"]
+            self.last_timings["accepted_draft_tokens"] = draft_after["accepted"] - draft_before["accepted"]
         
-        return response_text, avg_confidence
+        if pooled_embedding is not None:
+            with trace.span("plot_add"):
+                self.landscape.add(pooled_embedding, avg_confidence, user_query[:20] + "...")
+
+        if cache_key is not None:
+            with trace.span("cache_store"):
+                # A schedule answer searched every section, so it depends on the whole catalog
+                courses = None if "schedule" in parsed["payload"] else [c["normalized_code"] for c in parsed["payload"].get("courses_info", [])]
+                self.response_cache.put(cache_key, response_text, avg_confidence, courses)
+
+        trace.set(prompt_tokens=len(prompt_tokens), prefill_tokens=len(prompt_tokens) - cached_tokens, completion_tokens=completion_tokens)
+        return avg_confidence, self._finish_trace(trace, "model")
+
+    def _finish_trace(self, trace, outcome):
+        trace.set(outcome=outcome)
+        trace.finish()
+        if trace.trace_id: self.last_timings["trace_id"] = trace.trace_id
+        return self.last_timings
 
     def update_plot(self):
-        if len(self.history_embeddings) < 3:
+        # Only asks the landscape's render thread for a new 'live_inference_graph.png', never waits on matplotlib
+        if self.landscape is None:
+            return
+        if len(self.landscape) < 3:
             print("[Graph] Need at least 3 queries to generate PCA graph.")
             return
-
-        pca = PCA(n_components=2)
-        coords = pca.fit_transform(self.history_embeddings)
-        
-        x_vals = coords[:, 0]
-        y_vals = coords[:, 1]
-        z_vals = self.history_confidences # prediction confidence
-
-        fig = plt.figure(figsize=(10, 7))
-        ax = fig.add_subplot(111, projection='3d')
-        
-        sc = ax.scatter(x_vals, y_vals, z_vals, c=z_vals, cmap='viridis', s=60)
-        
-        # Attach the response text to the point on the graph
-        for i, txt in enumerate(self.history_labels):
-            ax.text(x_vals[i], y_vals[i], z_vals[i], txt, size=8)
-
-        ax.set_xlabel('Input Variation 1')
-        ax.set_ylabel('Input Variation 2')
-        ax.set_zlabel('Model Prediction')
-        ax.set_title(f'WPI Advisor Inference Landscape (n={len(self.history_embeddings)})')
-        
-        plt.savefig('live_inference_graph.png')
-        print("Graph updated: 'live_inference_graph.png'")
-        plt.close()
+        with tracing.span("plot_request"):
+            self.landscape.request_render()
 
 if __name__ == "__main__":
     advisor = AdvisorSystem(MODEL_PATH)
@@ -129,11 +397,28 @@ if __name__ == "__main__":
     while True:
         user_input = input("\nStudent: ")
         if user_input.lower() in ['quit', 'exit']:
+            if advisor.landscape: advisor.landscape.flush(timeout=30) # let the last graph finish
             break
             
-        response, conf = advisor.get_advice(user_input, manual_courses=["CS4341"]) # hard-code courses to retrieve information in case 'input_parser.py' fails to
+        # hard-code courses to retrieve information in case 'input_parser.py' fails to (not needed when the semantic index can find them)
+        # the REPL is one conversation, so follow-up questions see the earlier turns
+        manual_courses = [] if advisor.course_retriever else ["CS4341"]
+        stream = advisor.get_advice_stream(user_input, manual_courses=manual_courses, session_id="repl")
+
+        # Print tokens as they are decoded instead of waiting for the whole response
+        print("\nModel Response: ", end="", flush=True)
+        for piece in stream:
+            print(piece, end="", flush=True)
+        print()
+        conf = stream.confidence
         
-        print(f"\nModel Response: {response}")
         print(f"\n[System] Confidence Score: {conf:.4f}")
+        if stream.timings and "fast_path" in stream.timings:
+            print(f"[System] Answered from the catalog ({stream.timings['fast_path']}) in {stream.timings['total_seconds'] * 1e3:.2f}ms")
+        if stream.timings and "time_to_first_token" in stream.timings:
+            print(f"[System] First token after {stream.timings['time_to_first_token']:.2f}s, {stream.timings['tokens_per_second']:.1f} tokens/s")
+        if advisor.last_context_report:
+            report = advisor.last_context_report
+            print(f"[System] Context tokens: {report['original_tokens']} -> {report['compacted_tokens']} (saved {report['saved_tokens']})")
         
         advisor.update_plot()
\ No newline at end of file
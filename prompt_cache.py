@@ -0,0 +1,137 @@
+import hashlib
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import llama_cpp
+from llama_cpp import Llama
+from llama_cpp.llama import LlamaState
+
+# Snapshot of the llama state right after the static part of the Alpaca prompt
+#
+# Every request starts with the same instruction preamble. The snapshot is evaluated once,
+# saved next to the GGUF (so restarts skip it as well) and restored before a completion
+# whenever the KV cache no longer starts with the preamble (first request, after another
+# session's state was loaded, ...). llama.cpp's own prefix matching then only evaluates
+# the per-request suffix.
+
+
+def model_fingerprint(model_path: str) -> str:
+    # Hashing a 40 GB GGUF on every start would defeat the purpose, path/size/mtime is enough
+    st = os.stat(model_path)
+    return f"{Path(model_path).resolve()}|{st.st_size}|{st.st_mtime_ns}"
+
+
+def save_state_file(state: LlamaState, path: Path) -> None:
+    # np.savez instead of pickle so loading a cached state can never execute code
+    path = Path(path)
+    tmp_path = path.with_suffix(f".{os.getpid()}.tmp.npz")  # worker processes may build the same snapshot at once
+    np.savez(
+        tmp_path,
+        input_ids=state.input_ids,
+        scores=state.scores,
+        n_tokens=np.array(state.n_tokens),
+        llama_state=np.frombuffer(state.llama_state, dtype=np.uint8),
+        seed=np.array(state.seed),
+    )
+    os.replace(tmp_path, path)
+
+
+def load_state_file(path: Path) -> LlamaState:
+    with np.load(path, allow_pickle=False) as data:
+        llama_state = data["llama_state"].tobytes()
+        return LlamaState(
+            input_ids=data["input_ids"].copy(),
+            scores=data["scores"].copy(),
+            n_tokens=int(data["n_tokens"]),
+            llama_state=llama_state,
+            llama_state_size=len(llama_state),
+            seed=int(data["seed"]),
+        )
+
+
+def strip_scores(llm: Llama, state: LlamaState) -> LlamaState:
+    """
+    Without logits_all nothing ever reads the saved scores rows, but save_state copies up to
+    n_batch x n_vocab floats (~260 MB for a 128k vocab). Keep one zero row instead;
+    load_state broadcasts it over the rows it resets.
+    """
+    if not llm._logits_all and len(state.scores) > 1:
+        state.scores = np.zeros((1, state.scores.shape[1]), dtype=np.single)
+    return state
+
+
+def state_nbytes(state: LlamaState) -> int:
+    return state.llama_state_size + state.scores.nbytes + state.input_ids.nbytes
+
+
+class PrefixStateCache:
+    def __init__(self, llm: Llama, model_path: str, prefix: str, cache_dir: Optional[Path] = None):
+        self.llm = llm
+        self.prefix = prefix
+        self.tokens: List[int] = llm.tokenize(prefix.encode("utf-8"), add_bos=True, special=True)
+
+        key_src = "|".join([
+            model_fingerprint(model_path),
+            prefix,
+            str(llm.n_ctx()),
+            llama_cpp.__version__,  # state layout can change between llama.cpp builds
+        ])
+        self.key = hashlib.sha256(key_src.encode("utf-8")).hexdigest()[:16]
+
+        model_path = Path(model_path)
+        self.cache_dir = Path(cache_dir) if cache_dir else model_path.parent
+        self.stem = model_path.stem
+        self.path = self.cache_dir / f"{self.stem}.prefix-{self.key}.npz"
+
+        self.state: Optional[LlamaState] = None
+        self.stats: Dict[str, float] = {"restores": 0, "hits": 0, "build_seconds": 0.0, "load_seconds": 0.0}
+
+    def load_or_build(self) -> LlamaState:
+        start = time.perf_counter()
+        if self.path.exists():
+            try:
+                self.state = load_state_file(self.path)
+                self.stats["load_seconds"] = time.perf_counter() - start
+                return self.state
+            except (OSError, ValueError, KeyError):
+                pass  # corrupt or from an older format, rebuild below
+
+        self.llm.reset()
+        self.llm.eval(self.tokens)
+        self.state = strip_scores(self.llm, self.llm.save_state())
+        self.stats["build_seconds"] = time.perf_counter() - start
+
+        save_state_file(self.state, self.path)
+        self._remove_stale()
+        return self.state
+
+    def prepare(self) -> int:
+        """
+        Make sure the KV cache starts with the prefix before a completion.
+        Returns how many prompt tokens are already evaluated as a result.
+        """
+        if self.state is None:
+            self.load_or_build()
+
+        n = len(self.tokens)
+        current = self.llm._input_ids
+        if len(current) >= n and np.array_equal(current[:n], self.tokens):
+            self.stats["hits"] += 1
+            return n
+
+        self.llm.load_state(self.state)
+        self.stats["restores"] += 1
+        return n
+
+    def _remove_stale(self) -> None:
+        # Snapshots for an older model file or template are useless, don't let them pile up
+        # *.tmp.npz are other workers' snapshots still being written (see save_state_file)
+        for old in self.cache_dir.glob(f"{self.stem}.prefix-*.npz"):
+            if old != self.path and not old.name.endswith(".tmp.npz"):
+                try:
+                    old.unlink()
+                except OSError:
+                    pass
@@ -0,0 +1,181 @@
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Optional, Set, Tuple
+
+# Cache of finished answers in front of AdvisorSystem.get_advice
+#
+# Students ask the same questions over and over, and every repeat is a full 70B generation.
+# Level 1 is an in-memory LRU, level 2 a sqlite file so answers survive restarts.
+# The key is the normalized question + a hash of the retrieved get_info context + the
+# sampling parameters + the model that answered (cascade.py's small and large advisors share
+# the sqlite file, an escalated question must not get the small model's answer back); every entry also records the catalog version it was generated
+# against and the course codes its context held. A catalog refresh expires the entries that
+# used a changed course (changed_courses, from the export change manifest) and carries the
+# rest over; when the change set is unknown it expires all of them. Answers built from a search
+# over every section (schedule_index.py) are stored with ANY_COURSE and expire on any change.
+
+CACHE_PATH = Path("response_cache.sqlite3")
+ANY_COURSE = "*"
+
+CODE_SPACING_RE = re.compile(r"\b([a-z]{2,4})\s+(\d{3,4}x?)\b")
+
+
+def normalize_question(text: str) -> str:
+    text = text.lower().strip()
+    text = CODE_SPACING_RE.sub(r"\1\2", text)  # "CS 4341" and "cs4341" are the same question
+    text = re.sub(r"\s+", " ", text)
+    return text.rstrip(" ?!.")
+
+
+def make_key(instruction: str, input_ctx: str, sampling: Dict[str, Any], model: str = "") -> str:
+    parts = [
+        normalize_question(instruction),
+        hashlib.sha256(input_ctx.encode("utf-8")).hexdigest(),
+        json.dumps(sampling, sort_keys=True),
+        model,
+    ]
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        version_fn: Callable[[], str],
+        changed_courses: Optional[Callable[[str, str], Optional[Set[str]]]] = None,
+        memory_size: int = 256,
+        db_path: Optional[Path] = CACHE_PATH,
+        bypass_when_sampling: bool = False,
+    ):
+        self.version_fn = version_fn
+        self.changed_courses = changed_courses
+        self.memory_size = memory_size
+        # Non-zero temperature answers vary run to run; set this to always generate fresh ones
+        self.bypass_when_sampling = bypass_when_sampling
+        self.memory: "OrderedDict[str, Tuple[str, str, float, str]]" = OrderedDict()  # key -> (version, text, confidence, courses)
+        self.stats = {"hits": 0, "memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "expired": 0, "carried_over": 0, "bypassed": 0}
+        self._lock = threading.Lock()
+        self._version: Optional[str] = None
+
+        self.db: Optional[sqlite3.Connection] = None
+        if db_path is not None:
+            self.db = sqlite3.connect(str(db_path), check_same_thread=False)
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, version TEXT, response TEXT, confidence REAL, created REAL, courses TEXT DEFAULT '')"
+            )
+            columns = [row[1] for row in self.db.execute("PRAGMA table_info(responses)")]
+            if "courses" not in columns:  # cache file from before per-course invalidation
+                self.db.execute("ALTER TABLE responses ADD COLUMN courses TEXT DEFAULT ''")
+            self.db.commit()
+
+    def should_bypass(self, sampling: Dict[str, Any]) -> bool:
+        if self.bypass_when_sampling and sampling.get("temperature", 0) > 0:
+            self.stats["bypassed"] += 1
+            return True
+        return False
+
+    def _current_version(self) -> str:
+        version = self.version_fn()
+        if version != self._version:
+            # Catalog changed (or first call): deal with everything generated against another version
+            self._version = version
+            old_versions = {v[0] for v in self.memory.values() if v[0] != version}
+            if self.db is not None:
+                old_versions.update(row[0] for row in self.db.execute(
+                    "SELECT DISTINCT version FROM responses WHERE version != ?", (version,)))
+            for old in old_versions:
+                self._migrate(old, version)
+            if self.db is not None:
+                self.db.commit()
+        return version
+
+    def _migrate(self, old: str, version: str) -> None:
+        changed = self.changed_courses(old, version) if self.changed_courses else None
+        memory_keys = [k for k, v in self.memory.items() if v[0] == old]
+        if changed is None:
+            # No idea what changed: drop the lot
+            for k in memory_keys:
+                del self.memory[k]
+            if self.db is None:
+                self.stats["expired"] += len(memory_keys)
+            else:
+                # Every memory entry is also on disk, so the disk count is the real total
+                cur = self.db.execute("DELETE FROM responses WHERE version = ?", (old,))
+                self.stats["expired"] += cur.rowcount
+            return
+
+        for k in memory_keys:
+            entry = self.memory[k]
+            if entry[3] == ANY_COURSE or changed.intersection(entry[3].split()):
+                del self.memory[k]
+            else:
+                self.memory[k] = (version,) + entry[1:]
+        if self.db is None:
+            expired = len(memory_keys) - sum(1 for k in memory_keys if k in self.memory)
+            self.stats["expired"] += expired
+            self.stats["carried_over"] += len(memory_keys) - expired
+            return
+        rows = self.db.execute("SELECT key, courses FROM responses WHERE version = ?", (old,)).fetchall()
+        stale = [(key,) for key, courses in rows if courses == ANY_COURSE or changed.intersection((courses or "").split())]
+        self.db.executemany("DELETE FROM responses WHERE key = ?", stale)
+        self.db.execute("UPDATE responses SET version = ? WHERE version = ?", (version, old))
+        self.stats["expired"] += len(stale)
+        self.stats["carried_over"] += len(rows) - len(stale)
+
+    def get(self, key: str) -> Optional[Tuple[str, float]]:
+        with self._lock:
+            version = self._current_version()
+
+            entry = self.memory.get(key)
+            if entry is not None and entry[0] == version:
+                self.memory.move_to_end(key)
+                self.stats["hits"] += 1
+                self.stats["memory_hits"] += 1
+                return entry[1], entry[2]
+
+            if self.db is not None:
+                row = self.db.execute(
+                    "SELECT response, confidence, courses FROM responses WHERE key = ? AND version = ?", (key, version)
+                ).fetchone()
+                if row is not None:
+                    self._remember(key, (version, row[0], row[1], row[2] or ""))
+                    self.stats["hits"] += 1
+                    self.stats["disk_hits"] += 1
+                    return row[0], row[1]
+
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, key: str, response: str, confidence: float, courses: Optional[Iterable[str]] = ()) -> None:
+        # courses: the codes whose catalog entries went into the context, None when the answer
+        # read the whole catalog (a schedule search), so any course change expires it
+        codes = ANY_COURSE if courses is None else " ".join(sorted({c.upper() for c in courses}))
+        with self._lock:
+            version = self._current_version()
+            self._remember(key, (version, response, float(confidence), codes))
+            if self.db is not None:
+                self.db.execute(
+                    "INSERT OR REPLACE INTO responses (key, version, response, confidence, created, courses) VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, version, response, float(confidence), time.time(), codes),
+                )
+                self.db.commit()
+
+    def _remember(self, key: str, entry: Tuple[str, str, float, str]) -> None:
+        self.memory[key] = entry
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_size:
+            self.memory.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self.memory.clear()
+            if self.db is not None:
+                self.db.execute("DELETE FROM responses")
+                self.db.commit()
@@ -0,0 +1,457 @@
+import itertools
+import re
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Set, Tuple
+
+import numpy as np
+
+from context_compaction import detect_terms
+from json_data.catalog_binary import open_course_index
+from json_data.catalog_store import file_digest
+from semantic_index import infer_level
+
+# Section schedule engine for day/time questions
+#
+# Every section's "time" string ("M-T-R-F | 9:00 AM - 9:50 AM", several meetings joined by "; ",
+# some with a "| 08/21/2025 - 10/10/2025" date range) is parsed once into meeting rows of
+# (section, weekday, start minute, end minute, term bits). Sections are stored course by course and
+# meetings section by section, so a course's meetings are one contiguous slice of flat numpy arrays.
+# "CS courses on Tuesday mornings in A term" is a few boolean masks over every meeting in the
+# catalog, "does CS 3013 conflict with CS 4341" one broadcast between two slices, and "what overlaps
+# CS 3013" one broadcast of its slice against all meetings. parse_user_string puts the short answer
+# into the payload as "schedule" instead of the model having to read every section.
+#
+# Terms are bit sets of the quarter terms, so a semester section (Fall S = A|B) overlaps both A and B
+# term sections. The date ranges inside semester sections aren't used beyond that.
+
+DAY_LETTERS = "MTWRFSU"
+DAY_NAMES = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+ALL_DAYS = (1 << len(DAY_LETTERS)) - 1
+
+TERM_BITS = {"A": 1, "B": 2, "C": 4, "D": 8, "E1": 16, "E2": 32}
+SEASON_BITS = {"Fall": 1 | 2, "Spring": 4 | 8, "Summer": 16 | 32}
+ALL_TERMS = 63
+QUARTERS = [("A term", 1), ("B term", 2), ("C term", 4), ("D term", 8), ("Summer", 16 | 32)]
+
+MAX_COURSES = 20  # courses listed in a window answer (the total is always given)
+MAX_SECTIONS = 3  # matching sections listed per course
+MAX_COMBINATIONS = 20000  # section choices tried when looking for a conflict-free schedule
+
+MEETING_RE = re.compile(
+    r"(?P<days>[MTWRFSU](?:-[MTWRFSU])*)\s*\|\s*(?P<start>\d{1,2}:\d{2}\s*[AP]M)\s*-\s*(?P<end>\d{1,2}:\d{2}\s*[AP]M)"
+)
+CLOCK_RE = re.compile(r"(\d{1,2}):(\d{2})\s*([AP])M")
+
+# Question side
+DAY_WORDS = {
+    "monday": 0, "mondays": 0, "tuesday": 1, "tuesdays": 1, "tues": 1, "wednesday": 2, "wednesdays": 2, "weds": 2,
+    "thursday": 3, "thursdays": 3, "thurs": 3, "friday": 4, "fridays": 4, "saturday": 5, "saturdays": 5,
+    "sunday": 6, "sundays": 6,
+}
+DAY_RE = re.compile(r"\b(" + "|".join(DAY_WORDS) + r")\b")
+WEEKEND_RE = re.compile(r"\bweekends?\b")
+PART_OF_DAY = {"morning": (0, 12 * 60), "afternoon": (12 * 60, 17 * 60), "evening": (17 * 60, 24 * 60), "night": (17 * 60, 24 * 60)}
+PART_OF_DAY_RE = re.compile(r"\b(morning|afternoon|evening|night)s?\b")
+HOUR = r"(?P<hour>\d{1,2})(?::(?P<minute>\d{2}))?\s*(?P<ampm>[ap]\.?m\.?)?"
+AFTER_RE = re.compile(r"\b(?:after|starting at|no earlier than|later than)\s+(?:noon|" + HOUR + r")")
+BEFORE_RE = re.compile(r"\b(?:before|until|ends? by|done by|no later than|earlier than)\s+(?:noon|" + HOUR + r")")
+CONFLICT_RE = re.compile(r"\b(conflicts?|conflicting|clash(?:es)?|overlap\w*|same time|at once|simultaneously|fit together|work together)\b")
+DISCIPLINE_RE = re.compile(r"\b([a-z]{2,4})\s+(?:courses?|classes|electives?|sections?)\b")
+
+
+def parse_clock(text: str) -> int:
+    """"9:00 AM" -> minutes after midnight."""
+    m = CLOCK_RE.match(text.strip().upper())
+    hour, minute = int(m.group(1)) % 12, int(m.group(2))
+    return (hour + (12 if m.group(3) == "P" else 0)) * 60 + minute
+
+
+def format_clock(minutes: int) -> str:
+    hour, minute = divmod(int(minutes), 60)
+    return f"{(hour - 1) % 12 + 1}:{minute:02d} {'AM' if hour < 12 else 'PM'}"
+
+
+def parse_meetings(time_text: str) -> List[Tuple[int, int, int]]:
+    """Section "time" string -> sorted, de-duplicated (weekday, start, end) meetings."""
+    meetings = set()
+    for m in MEETING_RE.finditer(time_text or ""):
+        start, end = parse_clock(m.group("start")), parse_clock(m.group("end"))
+        if end <= start:
+            continue
+        for letter in m.group("days").split("-"):
+            meetings.add((DAY_LETTERS.index(letter), start, end))
+    return sorted(meetings)
+
+
+def group_bits(group: str) -> int:
+    """Section group ("Fall A", "Spring S", "Summer S", ...) -> term bits."""
+    season, _, letter = group.partition(" ")
+    if letter in TERM_BITS:
+        return TERM_BITS[letter]
+    return SEASON_BITS.get(season, ALL_TERMS)
+
+
+def query_terms(text: str) -> int:
+    """Term bits a question is limited to: "A term" -> A, "fall" -> A|B, nothing -> every term."""
+    wanted = detect_terms(text)
+    if not wanted:
+        return ALL_TERMS
+    bits = 0
+    for group in wanted:
+        season, _, letter = group.partition(" ")
+        if letter in TERM_BITS:
+            bits |= TERM_BITS[letter]
+    if bits:
+        return bits
+    for group in wanted:
+        bits |= SEASON_BITS.get(group.split(":")[-1].split(" ")[0], 0)
+    return bits or ALL_TERMS
+
+
+def _clock_match(m: re.Match) -> int:
+    if m.group("hour") is None:  # "noon"
+        return 12 * 60
+    hour, minute = int(m.group("hour")), int(m.group("minute") or 0)
+    ampm = (m.group("ampm") or "").replace(".", "")
+    if ampm == "pm" and hour < 12:
+        hour += 12
+    elif ampm == "am" and hour == 12:
+        hour = 0
+    elif not ampm and 1 <= hour <= 7:
+        hour += 12  # "after 3" means 3 PM, nothing meets at 3 AM
+    return hour * 60 + minute
+
+
+def query_window(text: str) -> Optional[Tuple[int, int, int]]:
+    """(day bits, start, end) a question asks about, None when it names no day or time at all."""
+    days = 0
+    for m in DAY_RE.finditer(text):
+        days |= 1 << DAY_WORDS[m.group(1)]
+    if WEEKEND_RE.search(text):
+        days |= (1 << 5) | (1 << 6)
+    start, end, timed = 0, 24 * 60, False
+    parts = [PART_OF_DAY[m.group(1)] for m in PART_OF_DAY_RE.finditer(text)]
+    if parts:
+        start, end, timed = min(p[0] for p in parts), max(p[1] for p in parts), True
+    m = AFTER_RE.search(text)
+    if m:
+        start, timed = max(start, _clock_match(m)), True
+    m = BEFORE_RE.search(text)
+    if m:
+        end, timed = min(end, _clock_match(m)), True
+    if not days and not timed:
+        return None
+    return days or ALL_DAYS, start, end
+
+
+def describe_window(days: int, start: int, end: int, terms: int) -> str:
+    parts = []
+    if days != ALL_DAYS:
+        parts.append("/".join(name for i, name in enumerate(DAY_NAMES) if days >> i & 1))
+    if start > 0 and end < 24 * 60:
+        parts.append(f"{format_clock(start)}-{format_clock(end)}")
+    elif start > 0:
+        parts.append(f"after {format_clock(start)}")
+    elif end < 24 * 60:
+        parts.append(f"before {format_clock(end)}")
+    if terms != ALL_TERMS:
+        parts.append(", ".join(name for name, bit in QUARTERS if terms & bit))
+    return " ".join(parts) or "any time"
+
+
+def display_code(code: str) -> str:
+    return re.sub(r"^([A-Z]+)\s*", r"\1 ", code)
+
+
+class ScheduleIndex:
+    def __init__(self, catalog_index: Mapping[str, Dict[str, Any]], digest: Optional[str] = None):
+        self.digest = digest
+        self.codes = sorted(catalog_index)
+        courses = [catalog_index[c] for c in self.codes]  # decoded once, a BinaryCatalog parses on every lookup
+        self.code_ids = {code: i for i, code in enumerate(self.codes)}
+        self.display_codes = [display_code(c) for c in self.codes]
+        self.titles = [c.get("title") or "" for c in courses]
+        self.disciplines = np.asarray([(c.get("discipline") or "").upper() for c in courses])
+        self.levels = np.asarray([c.get("level") or "" for c in courses])
+        self.discipline_set = set(self.disciplines.tolist())
+
+        # Sections, course by course; the strings are only read when an answer is written
+        self.section_group: List[str] = []
+        self.section_format: List[str] = []
+        self.section_time: List[str] = []
+        self.section_status: List[str] = []
+        section_course, section_terms, course_offsets = [], [], [0]
+        meetings: List[Tuple[int, int, int]] = []
+        meeting_offsets = [0]
+        parsed: Dict[str, List[Tuple[int, int, int]]] = {}  # the same few hundred time strings repeat
+        for course_id, course in enumerate(courses):
+            for group, sections in (course.get("sections") or {}).items():
+                for s in sections:
+                    time_text = s.get("time") or ""
+                    if time_text not in parsed:
+                        parsed[time_text] = parse_meetings(time_text)
+                    section_course.append(course_id)
+                    section_terms.append(group_bits(group))
+                    self.section_group.append(group)
+                    self.section_format.append(s.get("format") or "")
+                    self.section_time.append(time_text)
+                    self.section_status.append(s.get("status") or "")
+                    meetings.extend(parsed[time_text])
+                    meeting_offsets.append(len(meetings))
+            course_offsets.append(len(section_course))
+
+        self.section_course = np.asarray(section_course, dtype=np.int32)
+        self.section_terms = np.asarray(section_terms, dtype=np.uint8)
+        self.section_live = np.asarray([not s.startswith("Cancel") for s in self.section_status], dtype=bool)
+        self.course_offsets = np.asarray(course_offsets, dtype=np.int32)  # course -> its sections
+        self.meeting_offsets = np.asarray(meeting_offsets, dtype=np.int32)  # section -> its meetings
+
+        table = np.asarray(meetings, dtype=np.int16).reshape(-1, 3)
+        self.meeting_day = table[:, 0].astype(np.int8)
+        self.meeting_day_bit = (1 << self.meeting_day.astype(np.uint8)).astype(np.uint8)
+        self.meeting_start = table[:, 1]
+        self.meeting_end = table[:, 2]
+        self.meeting_section = np.repeat(np.arange(len(section_course), dtype=np.int32), np.diff(self.meeting_offsets))
+        self.meeting_terms = self.section_terms[self.meeting_section]
+        self.meeting_live = self.section_live[self.meeting_section]
+
+    def __len__(self) -> int:
+        return len(self.section_course)
+
+    def course_meetings(self, course_id: int) -> slice:
+        sections = slice(self.course_offsets[course_id], self.course_offsets[course_id + 1])
+        return slice(self.meeting_offsets[sections.start], self.meeting_offsets[sections.stop])
+
+    def course_sections(self, course_id: int) -> range:
+        return range(self.course_offsets[course_id], self.course_offsets[course_id + 1])
+
+    def find(self, days: int = ALL_DAYS, start: int = 0, end: int = 24 * 60, terms: int = ALL_TERMS,
+             discipline: Optional[str] = None, level: Optional[str] = None,
+             course_ids: Optional[Iterable[int]] = None) -> Dict[int, List[int]]:
+        """
+        Live sections with a meeting on one of `days` that lies within [start, end] in one of `terms`,
+        as {course id: [section ids]}.
+        """
+        mask = self.meeting_live & ((self.meeting_terms & terms) != 0)
+        if days != ALL_DAYS:
+            mask &= (self.meeting_day_bit & days) != 0
+        if start > 0:
+            mask &= self.meeting_start >= start
+        if end < 24 * 60:
+            mask &= self.meeting_end <= end
+        sections = np.unique(self.meeting_section[mask])
+        courses = self.section_course[sections]
+        keep = np.ones(len(sections), dtype=bool)
+        if discipline is not None:
+            keep &= self.disciplines[courses] == discipline.upper()
+        if level is not None:
+            keep &= self.levels[courses] == level
+        if course_ids is not None:
+            keep &= np.isin(courses, np.fromiter(course_ids, dtype=np.int32))
+        found: Dict[int, List[int]] = {}
+        for course, section in zip(courses[keep].tolist(), sections[keep].tolist()):
+            found.setdefault(course, []).append(section)
+        return found
+
+    def _overlaps(self, a: slice, b: Any, terms: int) -> Tuple[np.ndarray, np.ndarray]:
+        # Meeting index pairs (into the a slice, into b) that share a day, a term and some minutes
+        hit = (self.meeting_day[a][:, None] == self.meeting_day[b][None, :])
+        hit &= (self.meeting_terms[a][:, None] & self.meeting_terms[b][None, :] & terms) != 0
+        hit &= (self.meeting_start[a][:, None] < self.meeting_end[b][None, :])
+        hit &= (self.meeting_start[b][None, :] < self.meeting_end[a][:, None])
+        hit &= self.meeting_live[a][:, None] & self.meeting_live[b][None, :]
+        return np.nonzero(hit)
+
+    def conflicts(self, course_a: int, course_b: int, terms: int = ALL_TERMS) -> List[Tuple[int, int, int, int, int]]:
+        """(section a, section b, weekday, overlap start, overlap end) for every overlapping pair of meetings."""
+        a, b = self.course_meetings(course_a), self.course_meetings(course_b)
+        i, j = self._overlaps(a, b, terms)
+        i, j = i + a.start, j + b.start
+        return list(zip(
+            self.meeting_section[i].tolist(), self.meeting_section[j].tolist(), self.meeting_day[i].tolist(),
+            np.maximum(self.meeting_start[i], self.meeting_start[j]).tolist(),
+            np.minimum(self.meeting_end[i], self.meeting_end[j]).tolist(),
+        ))
+
+    def overlapping_courses(self, course_id: int, terms: int = ALL_TERMS) -> Dict[int, List[int]]:
+        """Every other course with a live section that overlaps one of this course's sections: {course: its sections}."""
+        a = self.course_meetings(course_id)
+        live = self.meeting_live[a]
+        # Sections of a big course mostly repeat the same few times, so each distinct one is compared once
+        day, start, end, bits = np.unique(np.stack([
+            self.meeting_day[a][live], self.meeting_start[a][live], self.meeting_end[a][live],
+            self.meeting_terms[a][live] & terms,
+        ]).astype(np.int16), axis=1)
+        hit = (day[:, None] == self.meeting_day[None, :])
+        hit &= (bits[:, None] & self.meeting_terms[None, :]) != 0
+        hit &= (start[:, None] < self.meeting_end[None, :]) & (self.meeting_start[None, :] < end[:, None])
+        sections = np.unique(self.meeting_section[hit.any(axis=0) & self.meeting_live])
+        courses = self.section_course[sections]
+        keep = courses != course_id
+        found: Dict[int, List[int]] = {}
+        for course, section in zip(courses[keep].tolist(), sections[keep].tolist()):
+            found.setdefault(course, []).append(section)
+        return found
+
+    def compatible(self, course_a: int, course_b: int, bit: int, clashes: Set[Tuple[int, int]]) -> Optional[bool]:
+        """
+        Can one live section of every format (lecture, lab, ...) of both courses be taken in the quarter
+        `bit` without any of them overlapping? None when there are too many combinations to try.
+        """
+        def options(course):
+            by_format: Dict[str, List[int]] = {}
+            for s in self.course_sections(course):
+                if self.section_live[s] and self.section_terms[s] & bit:
+                    by_format.setdefault(self.section_format[s], []).append(s)
+            return list(by_format.values())
+
+        a_options, b_options = options(course_a), options(course_b)
+        combinations = 1
+        for choices in a_options:
+            combinations *= len(choices)
+        if combinations > MAX_COMBINATIONS:
+            return None
+        for picked in itertools.product(*a_options):
+            if all(any(all((sa, sb) not in clashes for sa in picked) for sb in choices) for choices in b_options):
+                return True
+        return False
+
+    def section_text(self, section: int) -> str:
+        status = self.section_status[section]
+        return (f"{self.section_group[section]} {self.section_format[section]} {self.section_time[section] or 'time TBA'}"
+                + (f" ({status})" if status else ""))
+
+
+class ScheduleRetriever:
+    """
+    parse_user_string schedule hook: (question, course codes in it) -> compact answer for the payload,
+    or None when the question isn't about days/times/conflicts. Rebuilds the index when courses.json changes.
+    """
+
+    def __init__(self, courses_path: Path, max_courses: int = MAX_COURSES):
+        self.courses_path = Path(courses_path)
+        self.max_courses = max_courses
+        self.index: Optional[ScheduleIndex] = None
+        self._lock = threading.Lock()
+
+    def current_index(self) -> ScheduleIndex:
+        # Built from the mmapped courses.bin when it's current, so workers don't keep the parsed JSON around
+        digest = file_digest(self.courses_path)  # a stat() unless the file changed
+        index = self.index
+        if index is not None and index.digest == digest:
+            return index
+        with self._lock:
+            if self.index is None or self.index.digest != digest:
+                self.index = ScheduleIndex(open_course_index(self.courses_path), digest)
+            return self.index
+
+    def __call__(self, text: str, codes: Iterable[str] = ()) -> Optional[Dict[str, Any]]:
+        index = self.current_index()
+        text = text.lower()
+        course_ids = sorted({index.code_ids[c.upper()] for c in codes if c.upper() in index.code_ids})
+        terms = query_terms(text)
+
+        if CONFLICT_RE.search(text) and len(course_ids) >= 2:
+            return {"conflicts": [self.pair(index, a, b, terms) for a, b in itertools.combinations(course_ids[:4], 2)]}
+        if CONFLICT_RE.search(text) and len(course_ids) == 1:
+            return self.overlapping(index, course_ids[0], terms)
+
+        window = query_window(text)
+        if window is None:
+            return None
+        days, start, end = window
+        discipline = None
+        for m in DISCIPLINE_RE.finditer(text):
+            if m.group(1).upper() in index.discipline_set:
+                discipline = m.group(1).upper()
+                break
+        found = index.find(days, start, end, terms, discipline, infer_level(text), course_ids or None)
+        ordered = sorted(found, key=lambda c: index.codes[c])
+        answer: Dict[str, Any] = {
+            "query": describe_window(days, start, end, terms) + (f", {discipline} courses" if discipline else ""),
+            "matching_courses": len(found),
+            "courses": [
+                {"code": index.display_codes[c], "title": index.titles[c],
+                 "sections": [index.section_text(s) for s in found[c][:MAX_SECTIONS]]}
+                for c in ordered[:self.max_courses]
+            ],
+        }
+        if course_ids:
+            answer["not_matching"] = [index.display_codes[c] for c in course_ids if c not in found]
+        return answer
+
+    @staticmethod
+    def offered(index: ScheduleIndex, course_id: int) -> List[str]:
+        bits = 0
+        for s in index.course_sections(course_id):
+            if index.section_live[s]:
+                bits |= int(index.section_terms[s])
+        return [name for name, bit in QUARTERS if bits & bit]
+
+    def pair(self, index: ScheduleIndex, a: int, b: int, terms: int) -> Dict[str, Any]:
+        hits = index.conflicts(a, b, terms)
+        clashes = {(sa, sb) for sa, sb, _, _, _ in hits}
+        shared = []
+        for name, bit in QUARTERS:
+            if not terms & bit:
+                continue
+            runs_a = any(index.section_live[s] and index.section_terms[s] & bit for s in index.course_sections(a))
+            runs_b = any(index.section_live[s] and index.section_terms[s] & bit for s in index.course_sections(b))
+            if runs_a and runs_b:
+                ok = index.compatible(a, b, bit, clashes)
+                shared.append({"term": name, "conflict_free_schedule": ok if ok is not None else "unknown"})
+        code_a, code_b = index.display_codes[a], index.display_codes[b]
+        days: Dict[Tuple[int, int], Dict[int, Tuple[int, int]]] = {}
+        for sa, sb, day, start, end in hits:
+            days.setdefault((sa, sb), {})[day] = (start, end)
+        overlaps: List[str] = []
+        for (sa, sb), by_day in days.items():
+            when = ", ".join(f"{DAY_NAMES[d]} {format_clock(s)}-{format_clock(e)}" for d, (s, e) in sorted(by_day.items()))
+            line = f"{code_a} {index.section_text(sa)} and {code_b} {index.section_text(sb)} overlap {when}"
+            if line not in overlaps:  # sections at the same time in different rooms read the same
+                overlaps.append(line)
+        return {
+            "courses": [code_a, code_b],
+            "terms_both_offered": shared,
+            "overlapping_sections": overlaps[:MAX_SECTIONS * 2],
+            "overlapping_section_pairs": len(days),
+        }
+
+    def overlapping(self, index: ScheduleIndex, course_id: int, terms: int) -> Dict[str, Any]:
+        found = index.overlapping_courses(course_id, terms)
+        ordered = sorted(found, key=lambda c: index.codes[c])
+        return {
+            "course": index.display_codes[course_id],
+            "terms": describe_window(ALL_DAYS, 0, 24 * 60, terms),
+            "offered": self.offered(index, course_id),  # so "0 overlapping" in a term it doesn't run in reads right
+            "overlapping_courses": len(found),
+            "courses": [index.display_codes[c] for c in ordered[:self.max_courses * 3]],
+        }
+
+
+def main(argv: Optional[Iterable[str]] = None) -> None:
+    import argparse
+    import json
+    import time
+
+    from input_parser import extract_course_codes
+
+    parser = argparse.ArgumentParser(description="Answer a day/time/conflict question from the section schedule index")
+    parser.add_argument("query", nargs="+")
+    parser.add_argument("--courses", default="json_data/courses.json")
+    args = parser.parse_args(argv)
+
+    retriever = ScheduleRetriever(Path(args.courses))
+    start = time.perf_counter()
+    index = retriever.current_index()
+    print(f"{len(index)} sections, {len(index.meeting_day)} meetings, built in {(time.perf_counter() - start) * 1e3:.0f} ms")
+    text = " ".join(args.query)
+    start = time.perf_counter()
+    answer = retriever(text, extract_course_codes(text))
+    print(f"answered in {(time.perf_counter() - start) * 1e6:.0f} us")
+    print(json.dumps(answer, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from json_data.catalog_binary import open_course_index
+from json_data.catalog_store import file_digest
+
+# Semantic course retrieval for questions that don't name a course code
+#
+# Every course's title + description is embedded once (the small embedding GGUF from
+# embedding_backend.py) into a row-normalized float16 matrix saved next to courses.json as
+# courses.semantic-<catalog hash>.npy; courses.semantic.json names the current matrix and
+# holds the codes, per-course text hashes and filter columns. Search is one matrix-vector product (cosine similarity, since rows
+# and query are unit length) plus argpartition for the top k; discipline/level filters are
+# boolean masks over the scores. When courses.json changes only new or edited courses are
+# embedded again, unchanged rows are copied from the old matrix.
+#
+# numpy has no float16 BLAS, so scoring widens BLOCK_ROWS rows of the mmapped matrix at a time
+# to float32; only the float16 pages (shared between workers) stay resident. Discipline/level
+# filters only score their own rows.
+
+VERSION = 1
+# nomic-embed-text expects these task prefixes, other models just see a few extra words
+DOCUMENT_PREFIX = "search_document: "
+QUERY_PREFIX = "search_query: "
+TOP_K = 3
+MIN_SCORE = 0.55  # cosine similarity below this isn't grounding, it's noise
+BLOCK_ROWS = 64  # rows widened to float32 at once while scoring (192 KB at 768 dims)
+
+GRADUATE_RE = re.compile(r"\b(grad(?:uate)? students?|graduate|ms|m\.s\.|master'?s|phd)\b", flags=re.IGNORECASE)
+UNDERGRAD_RE = re.compile(r"\b(undergrad(?:uate)?|bs|b\.s\.|bachelor'?s|first[- ]year|freshman|sophomore|junior|senior)\b", flags=re.IGNORECASE)
+
+Embed = Callable[[str], np.ndarray]
+
+
+def index_path(courses_path: Path) -> Path:
+    courses_path = Path(courses_path)
+    return courses_path.with_name(courses_path.stem + ".semantic.json")
+
+
+def course_text(course: Dict[str, Any]) -> str:
+    return f"{course.get('title') or ''}. {course.get('description') or ''}".strip()
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+class SemanticIndex:
+    def __init__(self, matrix: np.ndarray, meta: Dict[str, Any]):
+        self.matrix = matrix  # (courses, dim) float16, usually an np.memmap
+        self.meta = meta
+        self.codes: List[str] = meta["codes"]
+        self.disciplines = np.asarray(meta["disciplines"])
+        self.levels = np.asarray(meta["levels"])
+        self._masks: Dict[Tuple[Optional[str], Optional[str]], np.ndarray] = {}  # filters -> row numbers
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    @classmethod
+    def load(cls, meta_path: Path) -> Optional["SemanticIndex"]:
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("version") != VERSION:
+                return None
+            matrix = np.load(Path(meta_path).with_name(meta["matrix"]), mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+        if matrix.shape[0] != len(meta["codes"]):
+            return None
+        return cls(matrix, meta)
+
+    def _rows(self, discipline: Optional[str], level: Optional[str]) -> Optional[np.ndarray]:
+        # Row numbers passing the filters, None = every row
+        if discipline is None and level is None:
+            return None
+        key = (discipline, level)
+        rows = self._masks.get(key)
+        if rows is None:
+            mask = np.ones(len(self.codes), dtype=bool)
+            if discipline is not None:
+                mask &= self.disciplines == discipline.upper()
+            if level is not None:
+                mask &= self.levels == level
+            rows = np.flatnonzero(mask)
+            self._masks[key] = rows
+        return rows
+
+    def scores(self, query: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Cosine similarity of every row (or of `rows`) with the query, BLOCK_ROWS rows at a time."""
+        q = np.asarray(query, dtype=np.float32)
+        q = q / max(float(np.linalg.norm(q)), 1e-12)
+        n = len(self.codes) if rows is None else len(rows)
+        scores = np.empty(n, dtype=np.float32)
+        for start in range(0, n, BLOCK_ROWS):
+            stop = min(start + BLOCK_ROWS, n)
+            block = self.matrix[start:stop] if rows is None else self.matrix[rows[start:stop]]
+            np.dot(block.astype(np.float32), q, out=scores[start:stop])
+        return scores
+
+    def search(self, query: np.ndarray, k: int = TOP_K, discipline: Optional[str] = None,
+               level: Optional[str] = None, min_score: float = -1.0) -> List[Tuple[str, float]]:
+        """Top-k (code, cosine similarity) for an embedded query, best first."""
+        rows = self._rows(discipline, level)
+        if not self.codes or (rows is not None and not len(rows)):
+            return []
+        scores = self.scores(query, rows)
+
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        ids = top if rows is None else rows[top]
+        return [(self.codes[i], float(scores[j])) for i, j in zip(ids.tolist(), top.tolist()) if scores[j] >= min_score]
+
+
+def build_index(courses_path: Path, embed: Embed, model_id: str, previous: Optional[SemanticIndex] = None,
+                batch_report: int = 100) -> Tuple[SemanticIndex, Dict[str, int]]:
+    """(Re)build the index files for courses_path, embedding only courses whose text changed since `previous`."""
+    courses_path = Path(courses_path)
+    meta_path = index_path(courses_path)
+    digest = file_digest(courses_path)
+    catalog = open_course_index(courses_path)  # the mmapped courses.bin when it's current, nothing stays resident
+
+    reusable: Dict[str, int] = {}
+    if previous is not None and previous.meta.get("model") == model_id:
+        reusable = {f"{code}|{h}": i for i, (code, h) in enumerate(zip(previous.codes, previous.meta["hashes"]))}
+
+    codes, hashes, disciplines, levels, rows = [], [], [], [], []
+    stats = {"embedded": 0, "reused": 0, "removed": 0}
+    for code in sorted(catalog):
+        course = catalog[code]
+        text = course_text(course)
+        h = text_hash(text)
+        old = reusable.pop(f"{code}|{h}", None)
+        if old is not None:
+            rows.append(np.asarray(previous.matrix[old], dtype=np.float32))
+            stats["reused"] += 1
+        else:
+            rows.append(np.asarray(embed(DOCUMENT_PREFIX + text), dtype=np.float32))
+            stats["embedded"] += 1
+            if stats["embedded"] % batch_report == 0:
+                print(f"[Semantic] Embedded {stats['embedded']} courses...")
+        codes.append(code)
+        hashes.append(h)
+        disciplines.append((course.get("discipline") or re.match(r"[A-Z]*", code).group(0)).upper())
+        levels.append(course.get("level") or "")
+    stats["removed"] = len({key.split("|")[0] for key in reusable} - set(codes))
+
+    matrix = normalize_rows(np.vstack(rows)).astype(np.float16) if rows else np.zeros((0, 0), dtype=np.float16)
+    npy_path = meta_path.with_name(f"{courses_path.stem}.semantic-{digest[:12]}.npy")
+    meta = {
+        "version": VERSION,
+        "matrix": npy_path.name,
+        "model": model_id,
+        "source_digest": digest,
+        "dim": int(matrix.shape[1]) if matrix.size else 0,
+        "codes": codes,
+        "hashes": hashes,
+        "disciplines": disciplines,
+        "levels": levels,
+    }
+
+    # Each catalog version gets its own matrix file and the metadata is swapped last, so a reader
+    # never pairs new metadata with an old matrix; processes still mmapping the old file keep it alive
+    tmp_npy = npy_path.with_name(f"{npy_path.stem}.{os.getpid()}.tmp.npy")
+    np.save(tmp_npy, matrix)
+    os.replace(tmp_npy, npy_path)
+    tmp_meta = meta_path.with_name(f"{meta_path.name}.{os.getpid()}.tmp")
+    with open(tmp_meta, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(tmp_meta, meta_path)
+    if previous is not None and previous.meta["matrix"] != npy_path.name:
+        try:
+            os.remove(meta_path.with_name(previous.meta["matrix"]))
+        except OSError:
+            pass
+
+    return SemanticIndex.load(meta_path), stats
+
+
+def infer_level(text: str) -> Optional[str]:
+    """Restrict to one level only when the question clearly says which."""
+    graduate, undergrad = bool(GRADUATE_RE.search(text)), bool(UNDERGRAD_RE.search(text))
+    if graduate != undergrad:
+        return "Graduate" if graduate else "Undergraduate"
+    return None
+
+
+class SemanticRetriever:
+    """
+    parse_user_string retriever: question text -> course codes to feed get_info.
+    Loads (or builds) the index on first use and rebuilds it incrementally whenever courses.json changes.
+    """
+
+    def __init__(self, courses_path: Path, embed: Embed, model_id: str, k: int = TOP_K, min_score: float = MIN_SCORE):
+        self.courses_path = Path(courses_path)
+        self.embed = embed
+        self.model_id = model_id
+        self.k = k
+        self.min_score = min_score
+        self.index: Optional[SemanticIndex] = None
+        self.last_hits: List[Tuple[str, float]] = []
+        self._lock = threading.Lock()
+
+    def current_index(self) -> SemanticIndex:
+        digest = file_digest(self.courses_path)  # a stat() unless the file changed
+        index = self.index
+        if index is not None and index.meta["source_digest"] == digest:
+            return index
+        with self._lock:
+            if self.index is None:
+                self.index = SemanticIndex.load(index_path(self.courses_path))
+            index = self.index
+            if index is None or index.meta["source_digest"] != digest or index.meta["model"] != self.model_id:
+                print("[Semantic] Course index missing or out of date, updating...")
+                index, stats = build_index(self.courses_path, self.embed, self.model_id, previous=index)
+                print(f"[Semantic] {stats['embedded']} embedded, {stats['reused']} reused, {stats['removed']} removed")
+                self.index = index
+            return index
+
+    def search(self, text: str, k: Optional[int] = None, discipline: Optional[str] = None,
+               level: Optional[str] = None) -> List[Tuple[str, float]]:
+        query = self.embed(QUERY_PREFIX + text)
+        return self.current_index().search(query, k or self.k, discipline, level, self.min_score)
+
+    def __call__(self, text: str) -> List[str]:
+        self.last_hits = self.search(text, level=infer_level(text))
+        return [code for code, _ in self.last_hits]
+
+
+def main(argv: Optional[Iterable[str]] = None) -> None:
+    import argparse
+
+    from embedding_backend import SmallModelEmbedder
+
+    parser = argparse.ArgumentParser(description="Build or update the semantic course index")
+    parser.add_argument("courses", nargs="?", default="json_data/courses.json")
+    parser.add_argument("--model", default="./local_models/nomic-embed-text-v1.5.Q8_0.gguf")
+    args = parser.parse_args(argv)
+
+    embedder = SmallModelEmbedder(args.model)
+    retriever = SemanticRetriever(Path(args.courses), embedder.embed, embedder.model_id)
+    index = retriever.current_index()
+    print(f"{len(index)} courses, {index.meta['dim']} dims -> {index_path(Path(args.courses)).with_name(index.meta['matrix'])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,395 @@
+import argparse
+import asyncio
+import json
+import time
+import uuid
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from tracing import get_tracer
+
+# Local HTTP front end for AdvisorSystem
+#
+#   POST /v1/completions   OpenAI-style completions, "prompt" is the student's message
+#                          (extra fields: "manual_courses", "session_id"), "stream": true for SSE
+#   GET  /health           liveness + queue depth
+#   GET  /metrics          Prometheus text format
+#
+# Parsing/retrieval runs in a thread pool, concurrently for all requests. Model calls are
+# serialized per AdvisorSystem (one thread each); with several advisors, stateless requests go
+# to the least loaded one and sessions stick to the same one. Once an advisor has QUEUE_SIZE
+# requests waiting, new ones are rejected with 503 + Retry-After instead of piling up.
+# The server only ever binds to the loopback interface.
+
+HOST = "127.0.0.1"
+PORT = 8008
+QUEUE_SIZE = 16
+RETRIEVAL_WORKERS = 4
+MAX_BODY_BYTES = 64 * 1024
+LATENCY_WINDOW = 2048  # recent requests kept for the /metrics quantiles
+
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+               413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+class HTTPError(Exception):
+    """Raised while reading a request that can't be served, answered with this status."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class Job:
+    """One completion request travelling from the HTTP handler to a model thread and back."""
+
+    def __init__(self, loop, query, manual_courses, session_id):
+        self.loop = loop
+        self.query = query
+        self.manual_courses = manual_courses
+        self.session_id = session_id
+        self.parsed = None
+        self.events: "asyncio.Queue[Tuple[str, Any]]" = asyncio.Queue()
+        self.cancelled = False  # set when the client goes away, checked between tokens
+
+    # Called from the model thread
+    def emit(self, kind, value):
+        self.loop.call_soon_threadsafe(self.events.put_nowait, (kind, value))
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+class AdvisorServer:
+    def __init__(self, advisors: List[Any], queue_size: int = QUEUE_SIZE,
+                 retrieval_workers: int = RETRIEVAL_WORKERS, model_name: str = "wpi-advisor"):
+        self.advisors = advisors
+        self.queue_size = queue_size
+        self.model_name = model_name
+        self.retrieval_pool = ThreadPoolExecutor(max_workers=retrieval_workers, thread_name_prefix="retrieval")
+        self.model_threads = [ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"model-{i}") for i in range(len(advisors))]
+        self.queues: List["asyncio.Queue[Job]"] = []
+        self.load = [0] * len(advisors)  # admitted and not finished, per advisor
+        self.workers: List["asyncio.Task"] = []
+
+        self.counters = {"requests": 0, "completed": 0, "rejected": 0, "errors": 0, "cancelled": 0, "completion_tokens": 0}
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.first_token_latencies = deque(maxlen=LATENCY_WINDOW)
+        self.started = time.time()
+
+    async def start(self, host: str = HOST, port: int = PORT) -> asyncio.AbstractServer:
+        if host not in ("127.0.0.1", "localhost", "::1"):
+            raise ValueError("The advisor server only listens on localhost")
+        self.queues = [asyncio.Queue() for _ in self.advisors]
+        self.workers = [asyncio.create_task(self._model_worker(i)) for i in range(len(self.advisors))]
+        return await asyncio.start_server(self._handle_connection, host, port)
+
+    async def stop(self) -> None:
+        for task in self.workers:
+            task.cancel()
+        self.retrieval_pool.shutdown(wait=False)
+        for pool in self.model_threads:
+            pool.shutdown(wait=False)
+
+    # ---- scheduling ----
+
+    def _admit(self, session_id: Optional[str]) -> Optional[int]:
+        if session_id is not None:
+            i = zlib.crc32(session_id.encode("utf-8")) % len(self.advisors)  # sessions live in one advisor's KV state
+        else:
+            i = min(range(len(self.advisors)), key=lambda k: self.load[k])
+        # One request can be generating while queue_size wait
+        if self.load[i] >= self.queue_size + 1:
+            return None
+        self.load[i] += 1
+        return i
+
+    async def _model_worker(self, i: int) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self.queues[i].get()
+            try:
+                if not job.cancelled:
+                    await loop.run_in_executor(self.model_threads[i], self._run_job, self.advisors[i], job)
+            finally:
+                self.load[i] -= 1
+
+    @staticmethod
+    def _run_job(advisor, job: Job) -> None:
+        try:
+            stream = advisor.get_advice_stream(job.query, job.manual_courses, job.session_id, job.parsed)
+            for piece in stream:
+                if job.cancelled:
+                    stream.close()
+                    job.emit("cancelled", None)
+                    return
+                job.emit("text", piece)
+            job.emit("done", (stream.confidence, stream.timings))
+        except Exception as e:  # reported to the client as a 500
+            job.emit("error", repr(e))
+
+    # ---- HTTP ----
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request = await self._read_request(reader)
+            if request is None:
+                return
+            method, path, body = request
+            if path == "/health" and method == "GET":
+                await self._send_json(writer, 200, {
+                    "status": "ok", "advisors": len(self.advisors), "load": self.load,
+                    "uptime_seconds": time.time() - self.started,
+                })
+            elif path == "/metrics" and method == "GET":
+                await self._send(writer, 200, self.metrics_text().encode("utf-8"), "text/plain; version=0.0.4")
+            elif path == "/v1/completions":
+                if method != "POST":
+                    await self._send_error(writer, 405, "Use POST")
+                else:
+                    await self._completions(writer, body)
+            else:
+                await self._send_error(writer, 404, f"No route for {method} {path}")
+        except HTTPError as e:
+            await self._send_error(writer, e.status, str(e))
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            try:
+                writer.close()
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[Tuple[str, str, bytes]]:
+        line = await reader.readline()
+        if not line:
+            return None
+        parts = line.decode("latin-1").split()
+        if len(parts) < 2:
+            return None
+        method, target = parts[0].upper(), parts[1].split("?", 1)[0]
+
+        headers = {}
+        while True:
+            header = await reader.readline()
+            if header in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = header.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        length = headers.get("content-length") or "0"
+        if not (length.isascii() and length.isdigit()):  # int() would also take "-1", "+1", "1_0" and "²"
+            raise HTTPError(400, "Content-Length must be a non-negative integer")
+        length = int(length)
+        if length > MAX_BODY_BYTES:
+            raise HTTPError(413, f"Body larger than {MAX_BODY_BYTES} bytes")
+        body = await reader.readexactly(length) if length else b""
+        return method, target, body
+
+    async def _send(self, writer, status: int, body: bytes, content_type: str, extra_headers: Dict[str, str] = None) -> None:
+        headers = {"Content-Type": content_type, "Content-Length": str(len(body)), "Connection": "close"}
+        headers.update(extra_headers or {})
+        head = f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n" + "".join(f"{k}: {v}\r\n" for k, v in headers.items())
+        writer.write(head.encode("latin-1") + b"\r\n" + body)
+        await writer.drain()
+
+    async def _send_json(self, writer, status: int, payload: Dict[str, Any], extra_headers: Dict[str, str] = None) -> None:
+        await self._send(writer, status, json.dumps(payload).encode("utf-8"), "application/json", extra_headers)
+
+    async def _send_error(self, writer, status: int, message: str, extra_headers: Dict[str, str] = None) -> None:
+        # Same error shape as the OpenAI API
+        await self._send_json(writer, status, {"error": {"message": message, "type": "invalid_request_error" if status < 500 else "server_error"}}, extra_headers)
+
+    async def _completions(self, writer, body: bytes) -> None:
+        self.counters["requests"] += 1
+        start = time.perf_counter()
+        try:
+            request = json.loads(body.decode("utf-8") or "{}")
+            if not isinstance(request, dict):
+                raise ValueError("Body must be a JSON object")
+            prompt = request.get("prompt")
+            if isinstance(prompt, list) and len(prompt) == 1:
+                prompt = prompt[0]
+            if not isinstance(prompt, str) or not prompt.strip():
+                raise ValueError("'prompt' must be a non-empty string")
+            manual_courses = request.get("manual_courses") or []
+            if not isinstance(manual_courses, list) or not all(isinstance(c, str) for c in manual_courses):
+                raise ValueError("'manual_courses' must be a list of strings")
+            session_id = request.get("session_id")
+            if session_id is not None and not isinstance(session_id, str):
+                raise ValueError("'session_id' must be a string")  # it is hashed to pick the advisor
+            stream = bool(request.get("stream", False))
+        except (ValueError, AttributeError) as e:
+            await self._send_error(writer, 400, str(e))
+            return
+
+        i = self._admit(session_id)
+        if i is None:
+            self.counters["rejected"] += 1
+            await self._send_error(writer, 503, "Server is at capacity, retry shortly", {"Retry-After": "1"})
+            return
+
+        loop = asyncio.get_running_loop()
+        job = Job(loop, prompt, manual_courses, session_id)
+        try:
+            job.parsed = await loop.run_in_executor(self.retrieval_pool, self.advisors[i].retrieve, prompt, manual_courses)
+        except Exception as e:
+            self.load[i] -= 1
+            self.counters["errors"] += 1
+            await self._send_error(writer, 500, f"Retrieval failed: {e!r}")
+            return
+        self.queues[i].put_nowait(job)
+
+        completion_id = f"cmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+        try:
+            if stream:
+                await self._stream_response(writer, job, completion_id, created, start)
+            else:
+                await self._full_response(writer, job, completion_id, created, start)
+        except ConnectionError:
+            job.cancelled = True
+            self.counters["cancelled"] += 1
+
+    def _completion_body(self, completion_id, created, text, finish_reason, extra=None):
+        body = {
+            "id": completion_id, "object": "text_completion", "created": created, "model": self.model_name,
+            "choices": [{"text": text, "index": 0, "logprobs": None, "finish_reason": finish_reason}],
+        }
+        body.update(extra or {})
+        return body
+
+    def _record(self, start, first_token_at, timings):
+        self.counters["completed"] += 1
+        self.latencies.append(time.perf_counter() - start)
+        if first_token_at is not None:
+            self.first_token_latencies.append(first_token_at - start)
+        if timings:
+            self.counters["completion_tokens"] += timings.get("completion_tokens", 0)
+
+    @staticmethod
+    def _usage(timings):
+        timings = timings or {}
+        prompt_tokens = timings.get("prompt_tokens", 0)
+        completion_tokens = timings.get("completion_tokens", 0)
+        return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens}
+
+    async def _full_response(self, writer, job: Job, completion_id, created, start) -> None:
+        pieces, first_token_at = [], None
+        while True:
+            kind, value = await job.events.get()
+            if kind == "text":
+                if first_token_at is None: first_token_at = time.perf_counter()
+                pieces.append(value)
+            elif kind == "done":
+                confidence, timings = value
+                self._record(start, first_token_at, timings)
+                await self._send_json(writer, 200, self._completion_body(
+                    completion_id, created, "".join(pieces), "stop",
+                    {"usage": self._usage(timings), "confidence": confidence, "timings": timings}))
+                return
+            elif kind == "error":
+                self.counters["errors"] += 1
+                await self._send_error(writer, 500, value)
+                return
+            else:
+                return
+
+    async def _stream_response(self, writer, job: Job, completion_id, created, start) -> None:
+        head = ("HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nCache-Control: no-cache\r\n"
+                "Connection: close\r\n\r\n")
+        writer.write(head.encode("latin-1"))
+        first_token_at = None
+
+        async def event(payload):
+            data = payload if isinstance(payload, str) else json.dumps(payload)
+            writer.write(f"data: {data}\n\n".encode("utf-8"))
+            await writer.drain()
+
+        while True:
+            kind, value = await job.events.get()
+            if kind == "text":
+                if first_token_at is None: first_token_at = time.perf_counter()
+                await event(self._completion_body(completion_id, created, value, None))
+            elif kind == "done":
+                confidence, timings = value
+                self._record(start, first_token_at, timings)
+                await event(self._completion_body(completion_id, created, "", "stop",
+                                                  {"usage": self._usage(timings), "confidence": confidence, "timings": timings}))
+                await event("[DONE]")
+                return
+            elif kind == "error":
+                self.counters["errors"] += 1
+                await event({"error": {"message": value, "type": "server_error"}})
+                return
+            else:
+                return
+
+    def metrics_text(self) -> str:
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{labels} {value}")
+
+        metric("advisor_requests_total", "counter", "Completion requests received.", [("", self.counters["requests"])])
+        metric("advisor_requests_completed_total", "counter", "Completion requests answered.", [("", self.counters["completed"])])
+        metric("advisor_requests_rejected_total", "counter", "Requests rejected because the queue was full.", [("", self.counters["rejected"])])
+        metric("advisor_requests_errors_total", "counter", "Requests that failed.", [("", self.counters["errors"])])
+        metric("advisor_requests_cancelled_total", "counter", "Requests whose client disconnected.", [("", self.counters["cancelled"])])
+        metric("advisor_completion_tokens_total", "counter", "Tokens generated.", [("", self.counters["completion_tokens"])])
+        metric("advisor_load", "gauge", "Requests admitted and not finished, per advisor.",
+               [(f'{{advisor="{i}"}}', n) for i, n in enumerate(self.load)])
+        for name, values, help_text in [
+            ("advisor_request_latency_seconds", self.latencies, "End-to-end request latency."),
+            ("advisor_time_to_first_token_seconds", self.first_token_latencies, "Time until the first token was ready."),
+        ]:
+            values = list(values)
+            metric(name, "summary", help_text,
+                   [(f'{{quantile="{q}"}}', f"{percentile(values, q):.6f}") for q in (0.5, 0.95, 0.99)])
+            lines.append(f"{name}_sum {sum(values):.6f}")
+            lines.append(f"{name}_count {len(values)}")
+
+        cache = getattr(self.advisors[0], "response_cache", None) if self.advisors else None
+        if cache is not None:
+            metric("advisor_response_cache", "counter", "Response cache counters (first advisor).",
+                   [(f'{{event="{k}"}}', v) for k, v in cache.stats.items()])
+        fast_path = getattr(self.advisors[0], "fast_path", None) if self.advisors else None
+        if fast_path is not None:
+            metric("advisor_fast_path", "counter", "Questions seen by the catalog fast path and how they were answered (first advisor).",
+                   [(f'{{outcome="{k}"}}', v) for k, v in fast_path.stats.items()])
+        text = "\n".join(lines) + "\n"
+        # Per-stage histograms from tracing.py (empty when TRACE is off)
+        tracer = get_tracer()
+        if tracer.enabled:
+            text += tracer.metrics_text()
+        return text
+
+
+async def serve(advisors: List[Any], port: int = PORT, queue_size: int = QUEUE_SIZE) -> None:
+    server = AdvisorServer(advisors, queue_size=queue_size)
+    listener = await server.start(HOST, port)
+    print(f"WPI Advisor listening on http://{HOST}:{port} (POST /v1/completions, GET /health, GET /metrics)")
+    async with listener:
+        await listener.serve_forever()
+
+
+if __name__ == "__main__":
+    from model_inference import AdvisorSystem, MODEL_PATH
+
+    parser = argparse.ArgumentParser(description="Serve the WPI advisor on localhost")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--queue-size", type=int, default=QUEUE_SIZE)
+    args = parser.parse_args()
+
+    asyncio.run(serve([AdvisorSystem(args.model)], port=args.port, queue_size=args.queue_size))
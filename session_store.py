@@ -0,0 +1,194 @@
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from llama_cpp import Llama
+from llama_cpp.llama import LlamaState
+
+from prompt_cache import load_state_file, save_state_file, state_nbytes, strip_scores
+
+# Multi-turn conversations that continue from the previous turn's KV state
+#
+# A session's transcript is kept as the exact token list that is in (or was saved from) the
+# KV cache. A follow-up is that list plus the new Alpaca turn, so llama.cpp's prefix match
+# only evaluates the new turn. Only one session can be live in the llama context at a time;
+# the others keep a saved LlamaState, the least recently used of which are spilled to disk.
+
+SESSION_DIR = Path("sessions")
+
+
+class Session:
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.turns: List[Tuple[str, str, str]] = []  # (instruction, input_ctx, response)
+        self.tokens: List[int] = []  # transcript tokens, including the last response
+        self.window_start = 0  # index of the oldest turn still in the transcript
+        self.state: Optional[LlamaState] = None
+        self.state_path: Optional[Path] = None
+        self.last_used = time.time()
+
+
+class SessionStore:
+    def __init__(
+        self,
+        llm: Llama,
+        template: str,
+        max_sessions: int = 8,
+        max_state_bytes: int = 4 << 30,
+        max_disk_sessions: int = 256,
+        session_dir: Path = SESSION_DIR,
+    ):
+        self.llm = llm
+        # The template is "<preamble>### Instruction:\n{instruction}...### Response:\n"
+        # follow-up turns repeat everything from "### Instruction:" on
+        self.template = template
+        self.turn_template = "\n\n" + template[template.index("### Instruction:"):]
+        self.max_sessions = max_sessions  # saved states kept in RAM
+        self.max_state_bytes = max_state_bytes
+        self.max_disk_sessions = max_disk_sessions  # sessions remembered at all
+        self.session_dir = Path(session_dir)
+
+        self.sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self.live_session_id: Optional[str] = None  # session whose tokens are in the KV cache right now
+        self.stats = {"turns": 0, "restores": 0, "spills": 0, "disk_loads": 0, "window_slides": 0, "dropped": 0}
+
+    def get(self, session_id: str) -> Session:
+        session = self.sessions.get(session_id)
+        if session is None:
+            session = Session(session_id)
+            self.sessions[session_id] = session
+            self._enforce_limits()
+        self.sessions.move_to_end(session_id)
+        session.last_used = time.time()
+        return session
+
+    def _tokenize(self, text: str, add_bos: bool = False) -> List[int]:
+        # special=True matches how create_completion tokenizes a string prompt
+        return self.llm.tokenize(text.encode("utf-8"), add_bos=add_bos, special=True)
+
+    def _build_tokens(self, session: Session, instruction: str, input_ctx: str, start: int) -> List[int]:
+        """Re-tokenize the transcript from turn `start` on, used when the window slides."""
+        turns = session.turns[start:]
+        if not turns:
+            return self._tokenize(self.template.format(instruction=instruction, input_ctx=input_ctx), add_bos=True)
+        first_instr, first_ctx, first_resp = turns[0]
+        text = self.template.format(instruction=first_instr, input_ctx=first_ctx) + first_resp
+        for instr, ctx, resp in turns[1:]:
+            text += self.turn_template.format(instruction=instr, input_ctx=ctx) + resp
+        text += self.turn_template.format(instruction=instruction, input_ctx=input_ctx)
+        return self._tokenize(text, add_bos=True)
+
+    def prepare_turn(self, session_id: str, instruction: str, input_ctx: str, max_tokens: int) -> Tuple[List[int], int]:
+        """
+        Build the prompt tokens for the session's next turn and load its KV state.
+        Returns (prompt tokens, how many of them are already in the KV cache).
+        """
+        session = self.get(session_id)
+        n_ctx = self.llm.n_ctx()
+
+        if session.tokens:
+            tokens = session.tokens + self._tokenize(self.turn_template.format(instruction=instruction, input_ctx=input_ctx))
+        else:
+            tokens = self._tokenize(self.template.format(instruction=instruction, input_ctx=input_ctx), add_bos=True)
+
+        # Sliding window: drop the oldest turns until the prompt and the response fit again
+        if len(tokens) + max_tokens > n_ctx and session.turns:
+            self.stats["window_slides"] += 1
+            start = session.window_start
+            while len(tokens) + max_tokens > n_ctx and start < len(session.turns):
+                start += 1
+                tokens = self._build_tokens(session, instruction, input_ctx, start)
+            session.window_start = start
+
+        if self.live_session_id != session_id:
+            self.release()
+            state = self._load_state(session)
+            if state is not None:
+                self.llm.load_state(state)
+                self.stats["restores"] += 1
+            self.live_session_id = session_id
+
+        reused = Llama.longest_token_prefix(self.llm._input_ids.tolist(), tokens)
+        return tokens, reused
+
+    def finish_turn(self, session_id: str, instruction: str, input_ctx: str, prompt_tokens: List[int], response: str) -> None:
+        session = self.get(session_id)
+        session.turns.append((instruction, input_ctx, response))
+        # The returned text (stop sequence stripped) is what the next turn builds on;
+        # if it tokenizes differently from what was sampled, prefix matching re-evaluates the tail
+        session.tokens = prompt_tokens + self._tokenize(response)
+        # The KV cache is now ahead of any saved state
+        session.state = None
+        self._discard_file(session)
+        self.live_session_id = session_id
+        self.stats["turns"] += 1
+
+    def record_turn(self, session_id: str, instruction: str, input_ctx: str, response: str) -> None:
+        """Add a turn that was answered without the model (fast_path.py)."""
+        session = self.get(session_id)
+        session.turns.append((instruction, input_ctx, response))
+        # Nothing was evaluated, the KV cache (or saved state) still holds a prefix of the new transcript
+        if session.tokens:
+            session.tokens = session.tokens + self._tokenize(self.turn_template.format(instruction=instruction, input_ctx=input_ctx))
+        else:
+            session.tokens = self._tokenize(self.template.format(instruction=instruction, input_ctx=input_ctx), add_bos=True)
+        session.tokens += self._tokenize(response)
+        self.stats["turns"] += 1
+
+    def release(self) -> None:
+        """Snapshot the live session before anything else uses the llama context."""
+        if self.live_session_id is None:
+            return
+        session = self.sessions.get(self.live_session_id)
+        self.live_session_id = None
+        if session is None or not session.tokens:
+            return
+        session.state = strip_scores(self.llm, self.llm.save_state())
+        self._enforce_limits()
+
+    def _load_state(self, session: Session) -> Optional[LlamaState]:
+        if session.state is not None:
+            return session.state
+        if session.state_path is not None and session.state_path.exists():
+            self.stats["disk_loads"] += 1
+            session.state = load_state_file(session.state_path)
+            return session.state
+        return None
+
+    def _enforce_limits(self) -> None:
+        in_memory = [s for s in self.sessions.values() if s.state is not None]  # oldest first
+        count = len(in_memory)
+        total = sum(state_nbytes(s.state) for s in in_memory)
+        for session in in_memory:
+            if count <= self.max_sessions and total <= self.max_state_bytes:
+                break
+            total -= state_nbytes(session.state)
+            count -= 1
+            self._spill(session)
+
+        while len(self.sessions) > self.max_disk_sessions:
+            session_id, session = self.sessions.popitem(last=False)
+            if session_id == self.live_session_id:
+                self.live_session_id = None
+            self._discard_file(session)
+            self.stats["dropped"] += 1
+
+    def _discard_file(self, session: Session) -> None:
+        if session.state_path is not None:
+            try:
+                os.remove(session.state_path)
+            except OSError:
+                pass
+            session.state_path = None
+
+    def _spill(self, session: Session) -> None:
+        self.session_dir.mkdir(parents=True, exist_ok=True)
+        # Session ids can come from clients, never use them as file names directly
+        name = hashlib.sha256(session.session_id.encode("utf-8")).hexdigest()[:32]
+        session.state_path = self.session_dir / f"{name}.npz"
+        save_state_file(session.state, session.state_path)
+        session.state = None
+        self.stats["spills"] += 1
@@ -0,0 +1,96 @@
+import threading
+from typing import Any, Dict, Optional
+
+import numpy as np
+import numpy.typing as npt
+from llama_cpp import Llama
+from llama_cpp.llama_speculative import LlamaDraftModel, LlamaPromptLookupDecoding
+
+# Speculative decoding for AdvisorSystem (SPECULATIVE in model_inference.py)
+#
+# llama-cpp-python evaluates the sampled token plus the draft tokens in one batch and keeps
+# the drafts as long as they match what the target model samples, so the output follows the
+# same distribution as plain decoding (and is identical at temperature 0, up to batch
+# numerics). Two ways to draft:
+#
+#   "prompt_lookup" - copy the continuation of the last n-gram from earlier in the context.
+#                     Free to draft, but replayed over the fine-tuning answers only ~10% of
+#                     4-token drafts match (1.17 tokens per target pass, see
+#                     benchmarks/bench_prompt_lookup.py): answers paraphrase the catalog more
+#                     than they quote it
+#   <path.gguf>     - greedy tokens from a small model; it has to share the target's tokenizer
+#                     (the Qwen2 GGUF from download_model.py only works as a draft for a Qwen2 target)
+#
+# Note llama-cpp-python turns logits_all on whenever a draft model is set.
+
+
+class SmallModelDraft(LlamaDraftModel):
+    def __init__(self, model_path: str, num_pred_tokens: int = 10, n_ctx: int = 4096, n_gpu_layers: int = -1):
+        self.llm = Llama(model_path=model_path, n_ctx=n_ctx, n_gpu_layers=n_gpu_layers, verbose=False)
+        self.num_pred_tokens = num_pred_tokens
+
+    def __call__(self, input_ids: npt.NDArray[np.intc], /, **kwargs: Any) -> npt.NDArray[np.intc]:
+        draft = []
+        # generate() reuses the longest prefix already in the draft model's KV cache
+        for token in self.llm.generate(input_ids.tolist(), temp=0.0):
+            if token == self.llm.token_eos():
+                break
+            draft.append(token)
+            if len(draft) >= self.num_pred_tokens:
+                break
+        return np.array(draft, dtype=np.intc)
+
+
+class CountingDraft(LlamaDraftModel):
+    """
+    Wraps a draft model and counts how many of its tokens the target accepted.
+    A proposal is scored on the next call: the accepted part is its longest common prefix
+    with what now sits at the same positions in input_ids.
+    """
+
+    def __init__(self, inner: LlamaDraftModel):
+        self.inner = inner
+        self._pending = None  # (position, proposed tokens)
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {"calls": 0, "drafted": 0, "accepted": 0}
+
+    def __call__(self, input_ids: npt.NDArray[np.intc], /, **kwargs: Any) -> npt.NDArray[np.intc]:
+        with self._lock:
+            if self._pending is not None:
+                position, proposed = self._pending
+                actual = input_ids[position:position + len(proposed)]
+                mismatch = np.nonzero(actual != proposed[:len(actual)])[0]
+                self.stats["accepted"] += int(mismatch[0]) if len(mismatch) else len(actual)
+                self.stats["drafted"] += len(proposed)
+            draft = np.asarray(self.inner(input_ids, **kwargs), dtype=np.intc)
+            self.stats["calls"] += 1
+            self._pending = (len(input_ids), draft) if len(draft) else None
+            return draft
+
+    def reset(self) -> None:
+        # The last proposal of a completion is never verified, don't score it against the next prompt
+        self._pending = None
+
+    def snapshot(self) -> Dict[str, int]:
+        return dict(self.stats)
+
+
+def acceptance_rate(stats: Dict[str, int]) -> float:
+    return stats["accepted"] / stats["drafted"] if stats["drafted"] else 0.0
+
+
+def make_draft_model(speculative: Optional[str], draft_tokens: int = 10, ngram_size: int = 3) -> Optional[CountingDraft]:
+    if not speculative:
+        return None
+    if speculative == "prompt_lookup":
+        return CountingDraft(LlamaPromptLookupDecoding(max_ngram_size=ngram_size, num_pred_tokens=draft_tokens))
+    return CountingDraft(SmallModelDraft(speculative, num_pred_tokens=draft_tokens))
+
+
+def check_draft_vocab(draft: Optional[CountingDraft], llm: Llama) -> None:
+    inner = getattr(draft, "inner", None)
+    if isinstance(inner, SmallModelDraft) and inner.llm.n_vocab() != llm.n_vocab():
+        raise ValueError(
+            f"Draft model vocabulary ({inner.llm.n_vocab()}) does not match the target's ({llm.n_vocab()}), "
+            "speculative decoding needs both models to use the same tokenizer"
+        )
@@ -0,0 +1,73 @@
+import json
+
+from batch_inference import BatchRunner, load_checkpoint
+
+
+class StubStream:
+    def __init__(self, text):
+        self.text = text
+        self.timings = {"prompt_tokens": 4, "prefill_tokens": 4, "completion_tokens": 1}
+        self.confidence = 1.0
+
+    def __iter__(self):
+        yield self.text
+
+
+class StubAdvisor:
+    def __init__(self):
+        self.answered = []
+
+    def retrieve(self, prompt, manual_courses):
+        return {"instruction": prompt, "input": "{}"}
+
+    def construct_prompt(self, instruction, input_ctx):
+        return instruction
+
+    def get_advice_stream(self, prompt, manual_courses, parsed=None):
+        self.answered.append(prompt)
+        return StubStream(prompt.upper())
+
+
+def write_questions(path, n):
+    path.write_text("".join(json.dumps({"id": f"q{i}", "question": f"question {i}"}) + "\n" for i in range(n)))
+
+
+def test_load_checkpoint_truncates_a_partial_last_line(tmp_path):
+    out = tmp_path / "answers.jsonl"
+    assert load_checkpoint(out) == set()
+    good = json.dumps({"id": "q0", "response": "a"}) + "\n" + json.dumps({"id": "q1", "response": "b"}) + "\n"
+    out.write_text(good + '{"id": "q2", "resp')
+    assert load_checkpoint(out) == {"q0", "q1"}
+    assert out.read_text() == good
+
+
+def test_resume_skips_answered_ids(tmp_path):
+    questions, out = tmp_path / "questions.jsonl", tmp_path / "answers.jsonl"
+    write_questions(questions, 5)
+    out.write_text(json.dumps({"id": "q1", "response": "earlier"}) + "\n" + '{"id": "q3"')
+
+    advisor = StubAdvisor()
+    stats = BatchRunner(advisor, window=2, retrieval_workers=1).run(questions, out)
+    assert (stats["done"], stats["skipped"], stats["errors"]) == (4, 1, 0)
+    assert sorted(advisor.answered) == ["question 0", "question 2", "question 3", "question 4"]
+    lines = [json.loads(line) for line in out.read_text().splitlines()]
+    assert sorted(r["id"] for r in lines) == ["q0", "q1", "q2", "q3", "q4"]
+
+    # Everything answered: a second run does nothing
+    again = StubAdvisor()
+    assert BatchRunner(again, window=2, retrieval_workers=1).run(questions, out)["skipped"] == 5
+    assert again.answered == []
+
+
+def test_window_is_grouped_by_retrieved_context(tmp_path):
+    class ContextAdvisor(StubAdvisor):
+        def retrieve(self, prompt, manual_courses):
+            return {"instruction": prompt, "input": manual_courses[0]}
+
+    questions, out = tmp_path / "questions.jsonl", tmp_path / "answers.jsonl"
+    rows = [("q0", "a question", "CS4432"), ("q1", "b question", "CS3431"), ("q2", "c question", "CS4432"), ("q3", "d question", "CS3431")]
+    questions.write_text("".join(json.dumps({"id": i, "question": q, "manual_courses": [c]}) + "\n" for i, q, c in rows))
+
+    advisor = ContextAdvisor()
+    BatchRunner(advisor, window=4, retrieval_workers=1).run(questions, out)
+    assert advisor.answered == ["b question", "d question", "a question", "c question"]
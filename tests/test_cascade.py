@@ -0,0 +1,37 @@
+import pytest
+
+pytest.importorskip("llama_cpp")  # model_inference imports it at module level
+
+import model_inference
+from benchmarks.fake_llama import FakeLlama
+from cascade import CascadeAdvisor
+from response_cache import ResponseCache
+
+
+def make_advisor(monkeypatch, model_path, answer, db_path):
+    class TierLlama(FakeLlama):
+        def __init__(self, **kwargs):
+            super().__init__(answer=answer, token_ms=0, prefill_ms=0, **kwargs)
+
+    monkeypatch.setattr(model_inference, "Llama", TierLlama)
+    advisor = model_inference.AdvisorSystem(model_path, prefix_cache=False, response_cache=False, plot=False, trace=False,
+                                            fast_path=False, lexical_retrieval=False, semantic_retrieval=False,
+                                            schedule_index=False, max_tokens=8)
+    # Both tiers on one sqlite file, as with the default CACHE_PATH
+    advisor.response_cache = ResponseCache(lambda: "v1", db_path=db_path)
+    return advisor
+
+
+def test_escalated_request_returns_large_model_output(monkeypatch, tmp_path):
+    db_path = tmp_path / "responses.sqlite3"
+    small = make_advisor(monkeypatch, "small.gguf", "small model answer ", db_path)
+    large = make_advisor(monkeypatch, "large.gguf", "large model answer ", db_path)
+    cascade = CascadeAdvisor(small, large, threshold=1.0, log_path=None)  # every logprob is below 1, always escalate
+
+    for _ in range(2):  # the second time both tiers have the question cached
+        stream = cascade.get_advice_stream("Should I take CS 4341?", ["CS4341"])
+        text = "".join(stream)
+        assert text.startswith("large model answer")
+        assert stream.timings["tier"] == "large"
+    assert cascade.stats["escalated"] == 2
+    assert large.response_cache.stats["disk_hits"] + large.response_cache.stats["memory_hits"] == 1
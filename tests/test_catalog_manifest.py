@@ -0,0 +1,32 @@
+from json_data.catalog_manifest import append_entry, catalog_version, changed_courses, changes_since, diff_hashes
+
+
+def test_diff_hashes():
+    assert diff_hashes({"A": "1", "B": "2", "C": "3"}, {"A": "1", "B": "9", "D": "4"}) == {
+        "added": ["D"], "changed": ["B"], "removed": ["C"]}
+
+
+def test_changes_since_follows_the_chain(tmp_path):
+    courses = tmp_path / "courses.json"
+    courses.write_text("v3")
+    append_entry(courses, "a" * 64, "b" * 64, {"added": ["X"], "changed": [], "removed": []})
+    append_entry(courses, "b" * 64, "c" * 64, {"added": [], "changed": ["Y"], "removed": ["Z"]})
+    assert changes_since(courses, "a" * 64, current="c" * 64) == {"X", "Y", "Z"}
+    assert changes_since(courses, "b" * 64, current="c" * 64) == {"Y", "Z"}
+    assert changes_since(courses, "c" * 64, current="c" * 64) == set()
+    # History that doesn't reach back, or no digest at all: everything is stale
+    assert changes_since(courses, "d" * 64, current="c" * 64) is None
+    assert changes_since(courses, None) is None
+
+
+def test_changed_courses_needs_same_degrees(tmp_path):
+    courses, degrees = tmp_path / "courses.json", tmp_path / "degrees.json"
+    courses.write_text("old")
+    degrees.write_text("{}")
+    old = catalog_version(courses, degrees)
+    courses.write_text("new catalog")
+    new = catalog_version(courses, degrees)
+    append_entry(courses, old.split(".")[0], new.split(".")[0], {"added": [], "changed": ["CS1101"], "removed": []})
+    assert changed_courses(courses, old, new) == {"CS1101"}
+    degrees.write_text('{"changed": true}')
+    assert changed_courses(courses, old, catalog_version(courses, degrees)) is None
@@ -0,0 +1,76 @@
+import json
+
+from benchmarks.bench_export import write_dump
+from json_data import export
+from json_data.catalog_manifest import changes_since, read_entries
+
+
+def rows(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)["Report_Entry"]
+
+
+def write_rows(path, report):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"Report_Entry": report}, f)
+
+
+def test_incremental_refresh_matches_full_export(tmp_path):
+    old_dump, new_dump = tmp_path / "old.json", tmp_path / "new.json"
+    write_dump(old_dump, 400)
+    report = rows(old_dump)
+    first = report[0]["Course_Title"].split(" - ")[0]
+    last = report[-1]["Course_Title"].split(" - ")[0]
+    for row in report:
+        if row["Course_Title"].startswith(first + " "):
+            row["Instructors"] = "Someone New"
+    report = [row for row in report if not row["Course_Title"].startswith(last + " ")]
+    report.append(dict(report[1], Course_Title="ZZ 9999 - Added Course"))
+    write_rows(new_dump, report)
+
+    out = tmp_path / "courses.json"
+    export.export(str(old_dump), str(out))
+    # The first incremental run has no source hashes for the file: no manifest entry, but a sidecar
+    assert export.export(str(old_dump), str(out), incremental=True)
+    assert read_entries(out) == []
+    old_digest = export._sha256(out)
+
+    export.export(str(new_dump), str(out), incremental=True)
+    full = tmp_path / "full.json"
+    export.export(str(new_dump), str(full))
+    assert out.read_bytes() == full.read_bytes()
+
+    [entry] = read_entries(out)
+    code = lambda c: c.replace(" ", "")
+    assert entry["changed"] == [code(first)]
+    assert entry["added"] == ["ZZ9999"]
+    assert entry["removed"] == [code(last)]
+    assert changes_since(out, old_digest) == {code(first), code(last), "ZZ9999"}
+
+
+def test_unchanged_refresh_leaves_the_file_alone(tmp_path, capsys):
+    dump, out = tmp_path / "raw.json", tmp_path / "courses.json"
+    write_dump(dump, 100)
+    export.export(str(dump), str(out))
+    export.export(str(dump), str(out), incremental=True)
+    mtime = out.stat().st_mtime_ns
+    export.export(str(dump), str(out), incremental=True)
+    assert out.stat().st_mtime_ns == mtime
+    assert read_entries(out) == []
+    assert "No changes" in capsys.readouterr().out
+
+
+def test_stale_sidecar_is_not_trusted(tmp_path):
+    old_dump, new_dump = tmp_path / "old.json", tmp_path / "new.json"
+    write_dump(old_dump, 100)
+    write_dump(new_dump, 100, seed=1)
+    out = tmp_path / "courses.json"
+    export.export(str(old_dump), str(out))
+    export.export(str(old_dump), str(out), incremental=True)
+    # Replaced without --incremental: the sidecar describes another file and its spans are useless
+    export.export(str(new_dump), str(out))
+    export.export(str(old_dump), str(out), incremental=True)
+    full = tmp_path / "full.json"
+    export.export(str(old_dump), str(full))
+    assert out.read_bytes() == full.read_bytes()
+    assert read_entries(out) == []
@@ -0,0 +1,61 @@
+import pytest
+
+from fast_path import FastPathRouter, wanted_groups
+from input_parser import parse_user_string
+
+
+def route(question):
+    return FastPathRouter().route(question, parse_user_string(question))
+
+
+@pytest.mark.parametrize("question, intent", [
+    ("When does CS 2303 meet?", "sections"),
+    ("What time does CS 2303 meet in A term?", "sections"),
+    ("Who teaches CS 2303?", "sections"),
+    ("Is CS 4341 full?", "sections"),
+    ("Is CS 4341 still open in the A term?", "sections"),
+    ("Are there seats left in CS 2303?", "sections"),
+    ("What are the prerequisites for DS 502?", "background"),
+    ("What's the recommended background for CS 4342?", "background"),
+    ("Is CS 4801 offered in B term?", "offered"),
+    ("When does CS 1101 usually occur?", "offered"),
+    ("I am interested in taking CS 525. Does it occur in the Spring semester?", "offered"),
+])
+def test_lookup_questions_are_answered(question, intent):
+    answer = route(question)
+    assert answer is not None and answer.intent == intent
+
+
+@pytest.mark.parametrize("question", [
+    "Does CS 4341 cover state space search?",
+    "Is CS 4341 open to first-year students?",
+    "Is CS 4341 a full course or half?",
+    "What topics does CS 2223 cover, like time complexity?",
+    "What do students do in CS 3013 when they meet deadlines?",
+    "Who is the professor that wrote the CS 4341 textbook?",
+    "Should I take CS 4341 before CS 4342?",
+    "Who teaches CS 2303 and is it offered in B term?",
+    "When does CS 2303 meet and who teaches CS 2102?",
+])
+def test_other_questions_fall_through(question):
+    assert route(question) is None
+
+
+def test_section_answer_only_lists_asked_fields():
+    answer = route("Who teaches CS 2303?")
+    lines = answer.text.splitlines()
+    assert lines[0].startswith("CS 2303: ")
+    assert all(" | " in line for line in lines[1:])
+    assert not any("AM" in line or "PM" in line for line in lines[1:])
+
+
+@pytest.mark.parametrize("question, groups", [
+    ("Is CS 4801 offered in A term?", {"Fall A", "Fall S"}),
+    ("Does CS 4801 meet in a-term?", {"Fall A", "Fall S"}),
+    ("Is CS 4801 offered in b term?", {"Fall B", "Fall S"}),
+    ("Is CS 4801 offered a term every year?", None),
+    ("Can I take a term off and still take CS 4801?", None),
+    ("Is CS 4801 offered in the fall a lot?", {"season:Fall"}),
+])
+def test_article_a_is_not_term_a(question, groups):
+    assert wanted_groups(question) == groups
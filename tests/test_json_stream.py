@@ -0,0 +1,40 @@
+import json
+
+import pytest
+
+from json_data import json_stream
+from json_data.json_stream import iter_array
+
+ITEMS = [
+    {"Course_Title": "CS 1101 - Intro", "nested": {"a": [1, 2.5, None, True]}},
+    "a string with \"quotes\", commas, ] and } inside",
+    1234567890,
+    -0.125e-3,
+    [],
+    {},
+    "é’ unicode",
+]
+
+
+@pytest.mark.parametrize("chunk", [1, 3, 7, 1 << 20])
+def test_items_across_chunk_boundaries(tmp_path, monkeypatch, chunk):
+    monkeypatch.setattr(json_stream, "CHUNK_SIZE", chunk)
+    path = tmp_path / "items.json"
+    path.write_text(" [\n " + ",\n  ".join(json.dumps(item, ensure_ascii=False) for item in ITEMS) + " ] \n", encoding="utf-8")
+    assert list(iter_array(path)) == ITEMS
+
+
+def test_empty_array(tmp_path):
+    path = tmp_path / "empty.json"
+    path.write_text("[ ]")
+    assert list(iter_array(path)) == []
+
+
+def test_truncated_file_raises(tmp_path, monkeypatch):
+    monkeypatch.setattr(json_stream, "CHUNK_SIZE", 4)
+    path = tmp_path / "truncated.json"
+    path.write_text('[{"a": 1}, {"b": ')
+    items = iter_array(path)
+    assert next(items) == {"a": 1}
+    with pytest.raises(json.JSONDecodeError):
+        next(items)
@@ -0,0 +1,37 @@
+from pathlib import Path
+
+import pytest
+
+from lexical_index import LexicalRetriever, stem
+
+
+@pytest.fixture(scope="module")
+def retriever():
+    return LexicalRetriever(Path("json_data/courses.json"))
+
+
+@pytest.mark.parametrize("singular, plural", [
+    ("database", "databases"),
+    ("science", "sciences"),
+    ("class", "classes"),
+    ("process", "processes"),
+    ("approach", "approaches"),
+    ("box", "boxes"),
+    ("theory", "theories"),
+])
+def test_plural_stems_like_singular(singular, plural):
+    assert stem(plural) == stem(singular)
+
+
+def test_plural_question_finds_the_same_courses(retriever):
+    hits = retriever("Which courses cover databases?")
+    assert {"CS3431", "CS4432"} <= set(hits)
+    assert hits == retriever("Which courses cover database?")
+
+
+@pytest.mark.parametrize("question", [
+    "What should I take next term?",
+    "What courses should I take in my upcoming semester?",
+])
+def test_planning_questions_have_no_topic(retriever, question):
+    assert retriever(question) == []
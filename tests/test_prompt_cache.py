@@ -0,0 +1,30 @@
+import pytest
+
+pytest.importorskip("llama_cpp")
+
+from prompt_cache import PrefixStateCache
+
+
+class TokenizerOnly:
+    def tokenize(self, text, add_bos=True, special=False):
+        return list(text)
+
+    def n_ctx(self):
+        return 4096
+
+
+def test_stale_sweep_keeps_in_flight_snapshots(tmp_path):
+    model = tmp_path / "model.gguf"
+    model.write_bytes(b"gguf")
+    cache = PrefixStateCache(TokenizerOnly(), str(model), "preamble")
+    cache.path.write_bytes(b"current")
+    stale = tmp_path / "model.prefix-0123456789abcdef.npz"
+    stale.write_bytes(b"old template")
+    # Another worker's save_state_file between np.savez and os.replace
+    in_flight = cache.path.with_suffix(".4242.tmp.npz")
+    in_flight.write_bytes(b"being written")
+
+    cache._remove_stale()
+
+    assert not stale.exists()
+    assert in_flight.exists() and cache.path.exists()
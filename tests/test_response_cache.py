@@ -0,0 +1,101 @@
+import sqlite3
+
+import pytest
+
+from response_cache import ResponseCache, make_key
+
+
+class Catalog:
+    # Stands in for catalog_version/changed_courses: a version string and what changed between two
+    def __init__(self):
+        self.version = "v1"
+        self.changes = {}
+
+    def changed(self, old, new):
+        return self.changes.get((old, new))
+
+
+def cache_for(catalog, db_path):
+    return ResponseCache(lambda: catalog.version, catalog.changed, db_path=db_path)
+
+
+def fill(cache):
+    cache.put("cs", "about CS 4341", 0.9, ["CS4341"])
+    cache.put("ma", "about MA 1021", 0.8, ["ma1021"])
+    cache.put("schedule", "fits tuesday", 1.0, None)
+
+
+def test_refresh_only_expires_answers_that_used_changed_courses(tmp_path):
+    catalog = Catalog()
+    cache = cache_for(catalog, tmp_path / "cache.sqlite3")
+    fill(cache)
+    catalog.version = "v2"
+    catalog.changes[("v1", "v2")] = {"CS4341"}
+    assert cache.get("cs") is None
+    assert cache.get("ma") == ("about MA 1021", 0.8)
+    assert cache.get("schedule") is None  # read every section, so any change expires it
+    assert (cache.stats["expired"], cache.stats["carried_over"]) == (2, 1)
+
+    # Carried over on disk too: a fresh process sees the entry under the new version
+    reopened = cache_for(catalog, tmp_path / "cache.sqlite3")
+    assert reopened.get("ma") == ("about MA 1021", 0.8)
+    assert reopened.get("cs") is None
+
+
+def test_unknown_change_set_expires_everything(tmp_path):
+    catalog = Catalog()
+    cache = cache_for(catalog, tmp_path / "cache.sqlite3")
+    fill(cache)
+    catalog.version = "v3"  # no manifest entry from v1
+    assert [cache.get(k) for k in ("cs", "ma", "schedule")] == [None] * 3
+    assert cache.stats["expired"] == 3
+    assert cache_for(catalog, tmp_path / "cache.sqlite3").get("ma") is None
+
+
+def test_memory_only_cache_migrates_too():
+    catalog = Catalog()
+    cache = cache_for(catalog, None)
+    fill(cache)
+    catalog.version = "v2"
+    catalog.changes[("v1", "v2")] = {"MA1021"}
+    assert cache.get("ma") is None
+    assert cache.get("cs") == ("about CS 4341", 0.9)
+    assert (cache.stats["expired"], cache.stats["carried_over"]) == (2, 1)
+
+
+def test_cache_file_without_courses_column_is_upgraded(tmp_path):
+    db_path = tmp_path / "cache.sqlite3"
+    db = sqlite3.connect(str(db_path))
+    db.execute("CREATE TABLE responses (key TEXT PRIMARY KEY, version TEXT, response TEXT, confidence REAL, created REAL)")
+    db.execute("INSERT INTO responses VALUES ('old', 'v1', 'old answer', 0.5, 0)")
+    db.commit()
+    db.close()
+
+    catalog = Catalog()
+    cache = cache_for(catalog, db_path)
+    assert cache.get("old") == ("old answer", 0.5)
+    # No recorded courses: a change to any other course leaves it alone
+    catalog.version = "v2"
+    catalog.changes[("v1", "v2")] = {"CS4341"}
+    assert cache.get("old") == ("old answer", 0.5)
+
+
+def test_key_depends_on_model_and_normalized_question():
+    sampling = {"max_tokens": 10, "temperature": 0}
+    assert make_key("Who teaches CS 4341?", "ctx", sampling) == make_key("who teaches cs4341", "ctx", sampling)
+    assert make_key("who teaches cs4341", "ctx", sampling, "small") != make_key("who teaches cs4341", "ctx", sampling, "large")
+    assert make_key("who teaches cs4341", "ctx", sampling) != make_key("who teaches cs4341", "other ctx", sampling)
+
+
+@pytest.mark.parametrize("sampled, bypassed", [(True, False), (False, True)])
+def test_advisor_passes_response_cache_sampled(monkeypatch, tmp_path, sampled, bypassed):
+    model_inference = pytest.importorskip("model_inference")  # imports llama_cpp at module level
+    from benchmarks.fake_llama import FakeLlama
+
+    monkeypatch.chdir(tmp_path)  # response_cache.sqlite3 lands in the working directory
+    monkeypatch.setattr(model_inference, "Llama", FakeLlama)
+    advisor = model_inference.AdvisorSystem("missing.gguf", prefix_cache=False, response_cache_sampled=sampled, plot=False,
+                                            trace=False, fast_path=False, lexical_retrieval=False, semantic_retrieval=False,
+                                            schedule_index=False)
+    assert advisor.sampling_params()["temperature"] > 0
+    assert advisor.response_cache.should_bypass(advisor.sampling_params()) == bypassed
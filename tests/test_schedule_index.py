@@ -0,0 +1,78 @@
+import json
+
+from schedule_index import ALL_TERMS, TERM_BITS, ScheduleIndex, ScheduleRetriever, parse_meetings, query_terms, query_window
+
+MON, TUE = 0, 1
+
+
+def section(group_term, time, fmt="Lecture", status="Open"):
+    return {"term": group_term, "time": time, "status": status, "format": fmt}
+
+
+CATALOG = {
+    "CS1000": {"title": "Morning", "discipline": "CS", "sections": {"Fall A": [
+        section("2025 Fall A Term", "M-R | 9:00 AM - 9:50 AM")]}},
+    "CS2000": {"title": "Clashes in A", "discipline": "CS", "sections": {"Fall A": [
+        section("2025 Fall A Term", "M-R | 9:30 AM - 10:20 AM")]}},
+    "CS3000": {"title": "Same time, B term", "discipline": "CS", "sections": {"Fall B": [
+        section("2025 Fall B Term", "M-R | 9:00 AM - 9:50 AM")]}},
+    "CS4000": {"title": "Back to back", "discipline": "CS", "sections": {"Fall A": [
+        section("2025 Fall A Term", "M-R | 9:50 AM - 10:50 AM")]}},
+    "MA1000": {"title": "Canceled clash", "discipline": "MA", "sections": {"Fall A": [
+        section("2025 Fall A Term", "M-R | 9:00 AM - 9:50 AM", status="Canceled: Preliminary")]}},
+    "MA2000": {"title": "Two lectures", "discipline": "MA", "sections": {"Fall A": [
+        section("2025 Fall A Term", "M-R | 9:00 AM - 9:50 AM"),
+        section("2025 Fall A Term", "T-F | 1:00 PM - 1:50 PM")]}},
+}
+
+
+def index():
+    return ScheduleIndex(CATALOG)
+
+
+def test_parse_meetings():
+    assert parse_meetings("M-R | 9:00 AM - 9:50 AM") == [(0, 540, 590), (3, 540, 590)]
+    assert parse_meetings("") == []
+
+
+def test_conflicts_need_a_shared_term_and_minutes():
+    ix = index()
+    ids = ix.code_ids
+    hits = ix.conflicts(ids["CS1000"], ids["CS2000"])
+    assert sorted((day, start, end) for _, _, day, start, end in hits) == [(0, 570, 590), (3, 570, 590)]
+    assert ix.conflicts(ids["CS1000"], ids["CS3000"]) == []  # different quarter
+    assert ix.conflicts(ids["CS1000"], ids["CS4000"]) == []  # ends when the other starts
+    assert ix.conflicts(ids["CS1000"], ids["MA1000"]) == []  # canceled section
+
+
+def test_overlapping_courses():
+    ix = index()
+    found = ix.overlapping_courses(ix.code_ids["CS1000"])
+    assert sorted(ix.codes[c] for c in found) == ["CS2000", "MA2000"]
+
+
+def test_alternative_section_makes_the_pair_compatible(tmp_path):
+    courses = tmp_path / "courses.json"
+    courses.write_text(json.dumps({"CS": {c: v for c, v in CATALOG.items() if c.startswith("CS")},
+                                   "MA": {c: v for c, v in CATALOG.items() if c.startswith("MA")}}))
+    retriever = ScheduleRetriever(courses)
+    answer = retriever("does CS 1000 conflict with MA 2000?", ["CS1000", "MA2000"])
+    [pair] = answer["conflicts"]
+    assert pair["overlapping_section_pairs"] == 1
+    assert pair["terms_both_offered"] == [{"term": "A term", "conflict_free_schedule": True}]
+
+    [pair] = retriever("do CS 1000 and CS 2000 clash?", ["CS1000", "CS2000"])["conflicts"]
+    assert pair["terms_both_offered"] == [{"term": "A term", "conflict_free_schedule": False}]
+
+
+def test_window_query():
+    assert query_window("anything on tuesday after 1pm") == (1 << TUE, 13 * 60, 24 * 60)
+    assert query_window("what should I take next?") is None
+    ix = index()
+    found = ix.find(1 << MON, 8 * 60, 10 * 60)
+    assert sorted(ix.codes[c] for c in found) == ["CS1000", "CS3000", "MA2000"]
+
+
+def test_query_terms_ignores_the_article_a():
+    assert query_terms("Which CS courses are in A term?") == TERM_BITS["A"]
+    assert query_terms("I want to take a term off, which courses are offered every year?") == ALL_TERMS
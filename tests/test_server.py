@@ -0,0 +1,70 @@
+import asyncio
+import json
+
+import pytest
+
+from benchmarks.load_test import StubAdvisor
+from server import AdvisorServer, HOST, MAX_BODY_BYTES
+
+
+async def post(port, payload, content_length=None):
+    reader, writer = await asyncio.open_connection(HOST, port)
+    body = payload if isinstance(payload, bytes) else json.dumps(payload).encode("utf-8")
+    writer.write(
+        b"POST /v1/completions HTTP/1.1\r\nHost: localhost\r\nContent-Type: application/json\r\n"
+        + f"Content-Length: {len(body) if content_length is None else content_length}\r\n\r\n".encode("latin-1") + body
+    )
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    rest = await reader.read()
+    writer.close()
+    return status, rest.split(b"\r\n\r\n", 1)[-1]
+
+
+def run(payloads, content_length=None):
+    async def main():
+        server = AdvisorServer([StubAdvisor(tokens=3, token_delay=0)])
+        listener = await server.start(HOST, 0)
+        port = listener.sockets[0].getsockname()[1]
+        try:
+            return [await post(port, p, content_length) for p in payloads]
+        finally:
+            listener.close()
+            await server.stop()
+    return asyncio.run(main())
+
+
+@pytest.mark.parametrize("payload", [
+    {"prompt": "Who teaches CS 2303?", "session_id": 42},
+    {"prompt": "Who teaches CS 2303?", "session_id": ["a"]},
+    {"prompt": "Who teaches CS 2303?", "manual_courses": "CS4341"},
+    {"prompt": "Who teaches CS 2303?", "manual_courses": [4341]},
+    {"prompt": ""},
+    ["Who teaches CS 2303?"],
+    b"{not json",
+])
+def test_malformed_requests_get_400(payload):
+    [(status, body)] = run([payload])
+    assert status == 400
+    assert "message" in json.loads(body)["error"]
+
+
+@pytest.mark.parametrize("content_length, status", [
+    ("abc", 400),
+    ("-1", 400),
+    ("1_0", 400),
+    (MAX_BODY_BYTES + 1, 413),
+])
+def test_bad_content_length(content_length, status):
+    [(got, body)] = run([{"prompt": "Who teaches CS 2303?"}], content_length)
+    assert got == status
+    assert "message" in json.loads(body)["error"]
+
+
+def test_valid_request_after_bad_one_is_served():
+    (bad, _), (ok, body) = run([
+        {"prompt": "Who teaches CS 2303?", "session_id": 7},
+        {"prompt": "Who teaches CS 2303?", "session_id": "s1", "manual_courses": ["CS4341"]},
+    ])
+    assert (bad, ok) == (400, 200)
+    assert json.loads(body)["choices"][0]["text"] == " tok0 tok1 tok2"
@@ -0,0 +1,25 @@
+import tracing
+
+
+def test_configure_turns_tracing_off_again(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    on = tracing.configure(enabled=True, path=path, metrics_path=None)
+    assert on.enabled and tracing.get_tracer() is on
+    off = tracing.configure(enabled=False)
+    assert not off.enabled and tracing.get_tracer() is off
+    assert off.start() is tracing.NULL_TRACE
+
+    # The advisor that asked for tracing keeps its tracer
+    trace = on.start(outcome="model")
+    with trace.span("parse"):
+        pass
+    trace.finish()
+    assert path.read_text().count("\n") == 1
+
+
+def test_configure_reuses_an_enabled_tracer(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    first = tracing.configure(enabled=True, path=path, metrics_path=None)
+    assert tracing.configure(enabled=True, path=path) is first
+    tracing.configure(enabled=False)
+    assert tracing.configure(enabled=False) is tracing.get_tracer()
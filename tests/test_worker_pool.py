@@ -0,0 +1,58 @@
+import os
+import time
+
+import pytest
+
+from worker_pool import WorkerPool
+
+
+def echo_worker(worker_id, model_path, advisor_options, requests, results):
+    # Stands in for _worker_main: "crash" kills the process, "hang" never answers
+    results.put((None, "ready", worker_id))
+    while True:
+        item = requests.get()
+        if item is None:
+            return
+        job_id, user_query, manual_courses, session_id = item
+        if user_query == "crash":
+            os._exit(3)
+        if user_query == "hang":
+            continue
+        results.put((job_id, "text", user_query.upper()))
+        results.put((job_id, "done", (1.0, {})))
+
+
+def crash(pool):
+    stream = pool.get_advice_stream("crash")
+    with pytest.raises(RuntimeError, match="exited with code 3"):
+        "".join(stream)
+    return stream.worker_id
+
+
+def test_request_during_restart_waits_for_the_restarted_worker(tmp_path):
+    with WorkerPool(str(tmp_path), n_workers=1, restart_delay=2.0, stream_timeout=30, worker_main=echo_worker) as pool:
+        assert pool.wait_ready(30)
+        crash(pool)
+        assert not pool.workers[0].ready
+        text, confidence = pool.get_advice("hello")
+        assert text == "HELLO" and confidence == 1.0
+        assert pool.stats["restarts"] == 1 and pool.load() == [0]
+
+
+def test_request_during_restart_goes_to_a_live_worker(tmp_path):
+    with WorkerPool(str(tmp_path), n_workers=2, restart_delay=5.0, stream_timeout=30, worker_main=echo_worker) as pool:
+        assert pool.wait_ready(30)
+        dead = crash(pool)
+        started = time.monotonic()
+        stream = pool.get_advice_stream("hello")
+        assert stream.worker_id != dead
+        assert "".join(stream) == "HELLO"
+        assert time.monotonic() - started < 5.0
+
+
+def test_silent_worker_times_out(tmp_path):
+    with WorkerPool(str(tmp_path), n_workers=1, stream_timeout=1.0, worker_main=echo_worker) as pool:
+        assert pool.wait_ready(30)
+        with pytest.raises(RuntimeError, match="sent nothing"):
+            "".join(pool.get_advice_stream("hang"))
+        assert pool.load() == [0] and pool.stats["failed"] == 1
@@ -0,0 +1,350 @@
+import json
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+# Per-stage latency tracing for AdvisorSystem (TRACE in model_inference.py)
+#
+# A request gets a Trace; stages are timed with `with trace.span("get_info"):`. Code that
+# doesn't have the trace at hand (input_parser.py) uses the module-level span(), which times
+# into the trace activated on the current thread, if any. A finished trace is one line of the
+# rotating JSONL file (TRACE_PATH, rotated at max_bytes into .1 .. .N) and is folded into
+# per-stage Prometheus histograms, served by server.py's /metrics and rewritten to
+# METRICS_PATH every few seconds. With tracing off every call hits a shared no-op object.
+#
+#   python tracing.py traces.jsonl   # p50/p95 per stage
+
+TRACE_PATH = Path("traces.jsonl")
+METRICS_PATH = Path("metrics.prom")
+MAX_BYTES = 16 << 20
+BACKUPS = 3
+METRICS_INTERVAL = 10.0  # seconds between metrics file rewrites
+BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+class _Span:
+    __slots__ = ("trace", "name", "start")
+
+    def __init__(self, trace: "Trace", name: str):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        self.trace.spans.append((self.name, self.start - self.trace.start, end - self.start))
+        return False
+
+
+class _NullSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Trace:
+    def __init__(self, tracer: "Tracer", attrs: Dict[str, Any]):
+        self.tracer = tracer
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.wall_start = time.time()
+        self.start = time.perf_counter()
+        self.spans: List[tuple] = []  # (name, offset from start, seconds)
+        self.attrs = attrs
+        self.finished = False
+
+    def span(self, name: str) -> _Span:
+        return _Span(self, name)
+
+    def record(self, name: str, seconds: float, started: Optional[float] = None) -> None:
+        """A stage timed elsewhere (e.g. prefill/decode split out of one streamed completion); `started` is a perf_counter()."""
+        if started is None:
+            started = time.perf_counter() - seconds
+        self.spans.append((name, started - self.start, seconds))
+
+    def set(self, **attrs: Any) -> None:
+        self.attrs.update(attrs)
+
+    def finish(self) -> None:
+        if self.finished:
+            return
+        self.finished = True
+        self.tracer._finish(self, time.perf_counter() - self.start)
+
+
+class _NullTrace:
+    trace_id = None
+    attrs: Dict[str, Any] = {}
+
+    def span(self, name: str) -> _NullSpan:
+        return NULL_SPAN
+
+    def record(self, name: str, seconds: float, started: Optional[float] = None) -> None:
+        pass
+
+    def set(self, **attrs: Any) -> None:
+        pass
+
+    def finish(self) -> None:
+        pass
+
+
+NULL_TRACE = _NullTrace()
+
+
+class Histogram:
+    def __init__(self, buckets: Iterable[float] = BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+
+class Tracer:
+    def __init__(self, path: Optional[Path] = TRACE_PATH, enabled: bool = True, max_bytes: int = MAX_BYTES,
+                 backups: int = BACKUPS, metrics_path: Optional[Path] = METRICS_PATH, metrics_interval: float = METRICS_INTERVAL):
+        self.enabled = enabled
+        self.path = Path(path) if path else None
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.metrics_path = Path(metrics_path) if metrics_path else None
+        self.metrics_interval = metrics_interval
+        self.stages: Dict[str, Histogram] = {}
+        self.counters: Dict[str, float] = {"traces": 0, "prompt_tokens": 0, "completion_tokens": 0}
+        self.outcomes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._metrics_written = 0.0
+
+    def start(self, **attrs: Any):
+        return Trace(self, attrs) if self.enabled else NULL_TRACE
+
+    def activate(self, trace) -> "_Activation":
+        """`with tracer.activate(trace):` makes span() on this thread time into `trace`."""
+        return _Activation(trace)
+
+    def observe(self, stage: str, seconds: float) -> None:
+        # Stages that don't belong to one request (the background PCA render)
+        if not self.enabled:
+            return
+        with self._lock:
+            self._histogram(stage).observe(seconds)
+
+    def _histogram(self, stage: str) -> Histogram:
+        hist = self.stages.get(stage)
+        if hist is None:
+            hist = self.stages[stage] = Histogram()
+        return hist
+
+    def _finish(self, trace: Trace, total: float) -> None:
+        record = {
+            "trace_id": trace.trace_id,
+            "time": round(trace.wall_start, 3),
+            "total_seconds": round(total, 6),
+            "spans": [{"name": n, "start": round(o, 6), "seconds": round(s, 6)} for n, o, s in trace.spans],
+            **trace.attrs,
+        }
+        line = json.dumps(record) + "\n"
+        with self._lock:
+            self.counters["traces"] += 1
+            self.counters["prompt_tokens"] += trace.attrs.get("prompt_tokens", 0)
+            self.counters["completion_tokens"] += trace.attrs.get("completion_tokens", 0)
+            outcome = trace.attrs.get("outcome")
+            if outcome:
+                self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+            self._histogram("total").observe(total)
+            for name, _, seconds in trace.spans:
+                self._histogram(name).observe(seconds)
+            if self.path is not None:
+                self._write(line)
+            write_metrics = self.metrics_path is not None and time.monotonic() - self._metrics_written >= self.metrics_interval
+            if write_metrics:
+                self._metrics_written = time.monotonic()
+        if write_metrics:
+            self.write_metrics()
+
+    def _write(self, line: str) -> None:
+        try:
+            if self.path.exists() and self.path.stat().st_size + len(line) > self.max_bytes:
+                self._rotate()
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+        except OSError as e:  # a full disk must never fail a request
+            print(f"[Trace] Could not write {self.path}: {e!r}")
+
+    def _rotate(self) -> None:
+        for i in range(self.backups - 1, 0, -1):
+            older = self.path.with_name(f"{self.path.name}.{i}")
+            if older.exists():
+                os.replace(older, self.path.with_name(f"{self.path.name}.{i + 1}"))
+        if self.backups:
+            os.replace(self.path, self.path.with_name(f"{self.path.name}.1"))
+        else:
+            self.path.unlink()
+
+    def metrics_text(self, prefix: str = "advisor") -> str:
+        lines = []
+        with self._lock:
+            lines.append(f"# HELP {prefix}_stage_seconds Time spent per request stage.")
+            lines.append(f"# TYPE {prefix}_stage_seconds histogram")
+            for stage, hist in sorted(self.stages.items()):
+                cumulative = 0
+                for bound, count in zip(hist.buckets, hist.counts):
+                    cumulative += count
+                    lines.append(f'{prefix}_stage_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+                lines.append(f'{prefix}_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {hist.count}')
+                lines.append(f'{prefix}_stage_seconds_sum{{stage="{stage}"}} {hist.total:.6f}')
+                lines.append(f'{prefix}_stage_seconds_count{{stage="{stage}"}} {hist.count}')
+            for name in ("prompt_tokens", "completion_tokens"):
+                lines.append(f"# HELP {prefix}_traced_{name}_total Tokens in traced requests.")
+                lines.append(f"# TYPE {prefix}_traced_{name}_total counter")
+                lines.append(f"{prefix}_traced_{name}_total {int(self.counters[name])}")
+            lines.append(f"# HELP {prefix}_traced_requests_total Traced requests by how they were answered.")
+            lines.append(f"# TYPE {prefix}_traced_requests_total counter")
+            for outcome, count in sorted(self.outcomes.items()):
+                lines.append(f'{prefix}_traced_requests_total{{outcome="{outcome}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+    def write_metrics(self, path: Optional[Path] = None) -> None:
+        path = Path(path or self.metrics_path)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        try:
+            tmp.write_text(self.metrics_text(), encoding="utf-8")
+            os.replace(tmp, path)  # node_exporter's textfile collector never sees a half-written file
+        except OSError as e:
+            print(f"[Trace] Could not write {path}: {e!r}")
+
+
+# The trace span() times into, per thread
+_local = threading.local()
+
+
+class _Activation:
+    __slots__ = ("trace", "previous")
+
+    def __init__(self, trace):
+        self.trace = trace
+
+    def __enter__(self):
+        self.previous = getattr(_local, "trace", None)
+        _local.trace = self.trace
+        return self.trace
+
+    def __exit__(self, *exc):
+        _local.trace = self.previous
+        return False
+
+
+# Process-wide tracer, off until configure() turns it on
+tracer = Tracer(enabled=False)
+
+
+def configure(enabled: bool = True, path: Optional[Path] = TRACE_PATH, **options: Any) -> Tracer:
+    """
+    Turn the process-wide tracer on or off; advisors sharing a process (cascade.py) share it.
+    Turning it off doesn't stop tracers already handed out, an advisor built with tracing keeps it.
+    """
+    global tracer
+    if not enabled:
+        if tracer.enabled:
+            tracer = Tracer(enabled=False)
+    elif not (tracer.enabled and tracer.path == (Path(path) if path else None)):
+        tracer = Tracer(path=path, enabled=True, **options)
+    return tracer
+
+
+def get_tracer() -> Tracer:
+    return tracer
+
+
+def span(name: str):
+    """Time a stage of whatever trace is active on this thread (a no-op outside one)."""
+    trace = getattr(_local, "trace", None)
+    return trace.span(name) if trace is not None else NULL_SPAN
+
+
+def read_traces(paths: Iterable[Path]) -> Iterator[Dict[str, Any]]:
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # partial last line of a trace file that is still being written
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def summarize(traces: Iterable[Dict[str, Any]]) -> Dict[str, List[float]]:
+    per_stage: Dict[str, List[float]] = {}
+    for trace in traces:
+        per_stage.setdefault("total", []).append(trace["total_seconds"])
+        for s in trace.get("spans", []):
+            per_stage.setdefault(s["name"], []).append(s["seconds"])
+    return per_stage
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="p50/p95 per stage from trace files")
+    parser.add_argument("paths", nargs="*", type=Path, default=[TRACE_PATH])
+    parser.add_argument("--rotated", action="store_true", help="also read the rotated .1 .. .N files")
+    args = parser.parse_args()
+
+    paths = list(args.paths)
+    if args.rotated:
+        for path in args.paths:
+            paths += sorted(path.parent.glob(f"{path.name}.[0-9]*"))
+    traces = list(read_traces(paths))
+    if not traces:
+        print("No traces found")
+        return
+
+    per_stage = summarize(traces)
+    print(f"{len(traces)} traces")
+    print(f"{'stage':>16} {'count':>7} {'p50 (ms)':>10} {'p95 (ms)':>10} {'mean (ms)':>10}")
+    # Stages in pipeline order: by when they first start within a request
+    order = {}
+    for trace in traces:
+        for s in trace.get("spans", []):
+            order[s["name"]] = min(order.get(s["name"], float("inf")), s["start"])
+    for stage in sorted(per_stage, key=lambda name: order.get(name, float("inf"))):
+        values = per_stage[stage]
+        print(f"{stage:>16} {len(values):7d} {percentile(values, 0.5) * 1e3:10.2f} {percentile(values, 0.95) * 1e3:10.2f} "
+              f"{sum(values) / len(values) * 1e3:10.2f}")
+
+    for name in ("prompt_tokens", "completion_tokens"):
+        values = [t[name] for t in traces if name in t]
+        if values:
+            print(f"{name}: p50 {percentile(values, 0.5):.0f}, p95 {percentile(values, 0.95):.0f}")
+    outcomes: Dict[str, int] = {}
+    for t in traces:
+        outcomes[t.get("outcome", "?")] = outcomes.get(t.get("outcome", "?"), 0) + 1
+    print("outcomes: " + ", ".join(f"{k} {v}" for k, v in sorted(outcomes.items())))
+
+
+if __name__ == "__main__":
+    main()
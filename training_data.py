@@ -0,0 +1,321 @@
+import argparse
+import hashlib
+import json
+import math
+import os
+import random
+import shutil
+from bisect import bisect_left, insort
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from json_data.catalog_store import file_digest
+from json_data.json_stream import iter_array
+
+# Tokenized training set for fine_tuning.py
+#
+# The Alpaca-formatted examples are tokenized once into a columnar cache under dataset_cache/<key>/:
+# tokens.npy (every example's token ids back to back, int32), offsets.npy (where each example
+# starts, int64) and meta.json. The key hashes the training file, the tokenizer (its full
+# serialized vocab/merges when it has one), the prompt template and the max sequence length, so
+# changing any of them tokenizes again and anything else is a memmap away.
+#
+# Examples range from ~100 tokens (no get_info data) to thousands (a few courses with all their
+# sections), so random batches are mostly padding. A batch plan (batches -> rows -> example
+# indices) fixes the batching up front:
+#   "padded"   - random batches, each padded to its longest example (what SFTTrainer did)
+#   "bucketed" - examples of similar length batched together, batches shuffled
+#   "packed"   - several examples per row up to max_seq_length (best-fit decreasing); position_ids
+#                restart at every example and the first token of each one is not a label, so
+#                attention/loss don't cross example boundaries on flash-attention varlen kernels,
+#                segment_mask() gives the equivalent block-diagonal mask for the others
+# batch_report() gives the padding ratio and real tokens per optimizer step for a plan.
+# Nothing here needs torch except PlanCollator.__call__, so preparation and packing run on a CPU.
+
+VERSION = 1
+CACHE_DIR = Path("dataset_cache")
+TOKENIZE_BATCH = 256  # examples tokenized per call
+BUCKET_WINDOW = 50  # "bucketed" sorts this many batches' worth of examples at a time
+IGNORE_INDEX = -100  # label that the loss skips
+
+# Same format as used at inference (model_inference.ALPACA_TEMPLATE), with the response filled in
+ALPACA_PROMPT = """Below is an instruction that describes a task, paired with an input that provides further context. Write a response that appropriately completes the request.
+
+### Instruction:
+{}
+
+### Input:
+{}
+
+### Response:
+{}"""
+
+
+def format_example(example: Dict[str, Any], eos_token: str, template: str = ALPACA_PROMPT) -> str:
+    # EOS is necessary, otherwise the model can generate forever
+    return template.format(example["instruction"], example["input"], example["output"]) + eos_token
+
+
+def tokenizer_fingerprint(tokenizer) -> str:
+    h = hashlib.sha256()
+    h.update(type(tokenizer).__name__.encode("utf-8"))
+    backend = getattr(tokenizer, "backend_tokenizer", None)
+    if backend is not None:
+        h.update(backend.to_str().encode("utf-8"))  # vocab, merges, normalizer, post-processor
+    else:
+        h.update(json.dumps(sorted(tokenizer.get_vocab().items())).encode("utf-8"))
+    h.update(repr([getattr(tokenizer, "eos_token", None), getattr(tokenizer, "bos_token", None)]).encode("utf-8"))
+    # Catches anything else that changes the ids, e.g. whether BOS is added
+    h.update(repr(tokenizer(["### Instruction:\nCS 4341?"])["input_ids"]).encode("utf-8"))
+    return h.hexdigest()
+
+
+def dataset_key(data_path: Path, tokenizer, max_seq_length: int, template: str = ALPACA_PROMPT) -> str:
+    parts = [str(VERSION), file_digest(data_path), tokenizer_fingerprint(tokenizer),
+             hashlib.sha256(template.encode("utf-8")).hexdigest(), str(max_seq_length)]
+    return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+class TokenizedDataset:
+    def __init__(self, tokens: np.ndarray, offsets: np.ndarray, meta: Dict[str, Any]):
+        self.tokens = tokens  # int32, usually an np.memmap
+        self.offsets = offsets  # len(self) + 1 entries
+        self.meta = meta
+        self.lengths = np.diff(offsets)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> np.ndarray:
+        return self.tokens[self.offsets[i]:self.offsets[i + 1]]
+
+    @classmethod
+    def load(cls, path: Path) -> Optional["TokenizedDataset"]:
+        try:
+            with open(Path(path) / "meta.json", "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("version") != VERSION:
+                return None
+            tokens = np.load(Path(path) / "tokens.npy", mmap_mode="r")
+            offsets = np.load(Path(path) / "offsets.npy")
+        except (OSError, ValueError):
+            return None
+        if offsets[-1] != tokens.shape[0]:
+            return None
+        return cls(tokens, offsets, meta)
+
+
+def prepare(data_path: Path, tokenizer, max_seq_length: int, cache_dir: Path = CACHE_DIR,
+            template: str = ALPACA_PROMPT) -> TokenizedDataset:
+    """Tokenized examples of a fine-tuning JSON file, from the cache when nothing changed."""
+    key = dataset_key(data_path, tokenizer, max_seq_length, template)
+    path = Path(cache_dir) / key
+    cached = TokenizedDataset.load(path)
+    if cached is not None:
+        return cached
+
+    # Examples are streamed through the tokenizer in batches; only the token ids are kept
+    chunks: List[np.ndarray] = []
+    lengths: List[int] = []
+    truncated = 0
+
+    def flush(texts):
+        nonlocal truncated
+        full = tokenizer(texts, add_special_tokens=True)["input_ids"]
+        for ids in full:
+            if len(ids) > max_seq_length:
+                truncated += 1
+                ids = ids[:max_seq_length]
+            chunks.append(np.asarray(ids, dtype=np.int32))
+            lengths.append(len(ids))
+
+    texts = []
+    for example in iter_array(data_path):
+        texts.append(format_example(example, tokenizer.eos_token, template))
+        if len(texts) == TOKENIZE_BATCH:
+            flush(texts)
+            texts = []
+    if texts:
+        flush(texts)
+
+    tokens = np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.int32)
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    meta = {
+        "version": VERSION,
+        "key": key,
+        "source": str(data_path),
+        "tokenizer": getattr(tokenizer, "name_or_path", type(tokenizer).__name__),
+        "max_seq_length": max_seq_length,
+        "examples": len(lengths),
+        "tokens": int(offsets[-1]),
+        "truncated": truncated,
+    }
+
+    # Written to a temporary directory and renamed, so a crash never leaves a half cache behind
+    tmp = Path(cache_dir) / f".{key}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    np.save(tmp / "tokens.npy", tokens)
+    np.save(tmp / "offsets.npy", offsets)
+    with open(tmp / "meta.json", "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    try:
+        os.replace(tmp, path)
+    except OSError:  # another process got there first
+        shutil.rmtree(tmp, ignore_errors=True)
+    return TokenizedDataset.load(path) or TokenizedDataset(tokens, offsets, meta)
+
+
+# Batch plans: a list of batches, each a list of rows, each a list of example indices
+
+def padded_batches(lengths: np.ndarray, batch_size: int, seed: int = 3407) -> List[List[List[int]]]:
+    order = list(range(len(lengths)))
+    random.Random(seed).shuffle(order)
+    return [[[i] for i in order[start:start + batch_size]] for start in range(0, len(order), batch_size)]
+
+
+def bucketed_batches(lengths: np.ndarray, batch_size: int, seed: int = 3407, window: int = BUCKET_WINDOW) -> List[List[List[int]]]:
+    # Shuffle, sort each window of examples by length, cut into batches, shuffle the batches
+    rng = random.Random(seed)
+    order = list(range(len(lengths)))
+    rng.shuffle(order)
+    batches = []
+    span = batch_size * window
+    for start in range(0, len(order), span):
+        group = sorted(order[start:start + span], key=lambda i: lengths[i], reverse=True)
+        batches.extend([[i] for i in group[b:b + batch_size]] for b in range(0, len(group), batch_size))
+    rng.shuffle(batches)
+    return batches
+
+
+def pack(lengths: np.ndarray, max_seq_length: int) -> List[List[int]]:
+    """Best-fit decreasing: every example goes into the fullest row it still fits in."""
+    rows: List[List[int]] = []
+    free: List[tuple] = []  # (space left, row index), sorted
+    for i in sorted(range(len(lengths)), key=lambda i: lengths[i], reverse=True):
+        length = int(lengths[i])
+        at = bisect_left(free, (length, -1))
+        if at < len(free):
+            space, row = free.pop(at)
+            rows[row].append(i)
+            space -= length
+        else:
+            rows.append([i])
+            row, space = len(rows) - 1, max_seq_length - length
+        if space > 0:
+            insort(free, (space, row))
+    return rows
+
+
+def packed_batches(lengths: np.ndarray, max_seq_length: int, batch_size: int, seed: int = 3407) -> List[List[List[int]]]:
+    rows = pack(lengths, max_seq_length)
+    # Rows are nearly all full, the few short ones (last to be filled) are batched together
+    rows.sort(key=lambda row: sum(int(lengths[i]) for i in row), reverse=True)
+    batches = [rows[start:start + batch_size] for start in range(0, len(rows), batch_size)]
+    random.Random(seed).shuffle(batches)
+    return batches
+
+
+def make_plan(mode: str, lengths: np.ndarray, batch_size: int, max_seq_length: int, seed: int = 3407) -> List[List[List[int]]]:
+    if mode == "padded":
+        return padded_batches(lengths, batch_size, seed)
+    if mode == "bucketed":
+        return bucketed_batches(lengths, batch_size, seed)
+    if mode == "packed":
+        return packed_batches(lengths, max_seq_length, batch_size, seed)
+    raise ValueError(f"Unknown batching mode: {mode}")
+
+
+def batch_report(plan: List[List[List[int]]], lengths: np.ndarray, gradient_accumulation_steps: int = 1) -> Dict[str, float]:
+    real = slots = 0
+    for batch in plan:
+        row_lengths = [sum(int(lengths[i]) for i in row) for row in batch]
+        real += sum(row_lengths)
+        slots += max(row_lengths) * len(row_lengths)
+    steps = math.ceil(len(plan) / gradient_accumulation_steps) if plan else 0
+    return {
+        "batches": len(plan),
+        "rows": sum(len(batch) for batch in plan),
+        "optimizer_steps_per_epoch": steps,
+        "real_tokens": real,
+        "padded_tokens": slots - real,
+        "padding_ratio": (slots - real) / slots if slots else 0.0,
+        "tokens_per_step": real / steps if steps else 0.0,
+    }
+
+
+def collate(dataset: TokenizedDataset, batch: List[List[int]], pad_token_id: int) -> Dict[str, np.ndarray]:
+    """One batch of the plan as padded numpy arrays (input_ids, attention_mask, labels, position_ids)."""
+    rows = [[dataset[i] for i in row] for row in batch]
+    width = max(sum(len(seq) for seq in row) for row in rows)
+    input_ids = np.full((len(rows), width), pad_token_id, dtype=np.int64)
+    attention_mask = np.zeros((len(rows), width), dtype=np.int64)
+    labels = np.full((len(rows), width), IGNORE_INDEX, dtype=np.int64)
+    position_ids = np.zeros((len(rows), width), dtype=np.int64)
+    for r, row in enumerate(rows):
+        at = 0
+        for seq in row:
+            end = at + len(seq)
+            input_ids[r, at:end] = seq
+            attention_mask[r, at:end] = 1
+            labels[r, at:end] = seq
+            labels[r, at] = IGNORE_INDEX  # never predicted from the end of the previous example
+            position_ids[r, at:end] = np.arange(len(seq))
+            at = end
+    return {"input_ids": input_ids, "attention_mask": attention_mask, "labels": labels, "position_ids": position_ids}
+
+
+def segment_mask(position_ids: np.ndarray) -> np.ndarray:
+    """(width, width) bool mask for one packed row: causal, and only within the same example."""
+    segment = np.cumsum(position_ids == 0)
+    causal = np.tril(np.ones((len(position_ids), len(position_ids)), dtype=bool))
+    return causal & (segment[:, None] == segment[None, :])
+
+
+class PlanCollator:
+    """
+    data_collator for a Trainer whose train dataset is just the batch numbers of a plan
+    (per_device_train_batch_size = 1, remove_unused_columns = False): turns batch i into tensors.
+    """
+
+    def __init__(self, dataset: TokenizedDataset, plan: List[List[List[int]]], pad_token_id: int):
+        self.dataset = dataset
+        self.plan = plan
+        self.pad_token_id = pad_token_id
+
+    def __call__(self, features: List[Dict[str, Any]]):
+        import torch
+
+        rows = [row for feature in features for row in self.plan[feature["batch"]]]
+        return {k: torch.from_numpy(v) for k, v in collate(self.dataset, rows, self.pad_token_id).items()}
+
+
+def print_report(reports: Dict[str, Dict[str, float]]) -> None:
+    print(f"{'batching':>10} {'rows':>7} {'steps':>6} {'padding':>8} {'tokens/step':>12}")
+    for mode, r in reports.items():
+        print(f"{mode:>10} {r['rows']:7d} {r['optimizer_steps_per_epoch']:6d} {r['padding_ratio']:8.1%} {r['tokens_per_step']:12.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tokenize the fine-tuning set into the cache and compare batching modes")
+    parser.add_argument("--data", default="json_data/fine_tuning_transformed.json")
+    parser.add_argument("--tokenizer", required=True, help="Hugging Face tokenizer name or path")
+    parser.add_argument("--max-seq-length", type=int, default=4096)
+    parser.add_argument("--batch-size", type=int, default=2)
+    parser.add_argument("--gradient-accumulation-steps", type=int, default=4)
+    args = parser.parse_args()
+
+    from transformers import AutoTokenizer
+
+    dataset = prepare(Path(args.data), AutoTokenizer.from_pretrained(args.tokenizer), args.max_seq_length)
+    print(f"{len(dataset)} examples, {dataset.meta['tokens']} tokens ({dataset.meta['truncated']} truncated), cache {dataset.meta['key']}")
+    print_report({mode: batch_report(make_plan(mode, dataset.lengths, args.batch_size, args.max_seq_length), dataset.lengths,
+                                     args.gradient_accumulation_steps)
+                  for mode in ("padded", "bucketed", "packed")})
+
+
+if __name__ == "__main__":
+    main()
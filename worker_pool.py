@@ -0,0 +1,242 @@
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import zlib
+from itertools import count
+from typing import Any, Dict, List, Optional
+
+# Several llama.cpp worker processes behind one get_advice/get_advice_stream interface
+#
+# llama.cpp mmaps the GGUF read-only, so N workers on the same file share one copy of the
+# weights in the page cache; only the KV cache and scratch buffers are per process. Workers
+# run on the CPU by default (each GPU-offloading process would upload its own copy of the
+# layers) and split the cores between them. Requests go to the worker with the fewest
+# in-flight requests, sessions always go to the same worker (their KV state lives there),
+# and a worker that dies is restarted while its in-flight requests fail with an error.
+# Requests that arrive while it restarts go to the other workers, or wait for the restarted
+# one if it holds their session.
+
+START_METHOD = "spawn"  # llama.cpp threads and fork() don't mix
+STREAM_TIMEOUT = 600.0  # seconds without any output before a request is given up
+
+
+def default_threads(n_workers: int) -> int:
+    return max(1, (os.cpu_count() or 1) // n_workers)
+
+
+def _worker_main(worker_id: int, model_path: str, advisor_options: Dict[str, Any], requests, results) -> None:
+    from model_inference import AdvisorSystem
+
+    advisor = AdvisorSystem(model_path, **advisor_options)
+    results.put((None, "ready", worker_id))
+    while True:
+        item = requests.get()
+        if item is None:
+            return
+        job_id, user_query, manual_courses, session_id = item
+        try:
+            stream = advisor.get_advice_stream(user_query, manual_courses, session_id)
+            for piece in stream:
+                results.put((job_id, "text", piece))
+            results.put((job_id, "done", (stream.confidence, stream.timings)))
+        except Exception as e:
+            results.put((job_id, "error", repr(e)))
+
+
+class PoolStream:
+    """Same surface as model_inference.AdviceStream, fed by the pool's result thread."""
+
+    def __init__(self, pool: "WorkerPool", job_id: int):
+        self._pool = pool
+        self._job_id = job_id
+        self._events: "queue.Queue" = queue.Queue()
+        self.confidence = None
+        self.timings = None
+        self.worker_id: Optional[int] = None
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            kind, value = self._events.get(timeout=self._pool.stream_timeout)
+        except queue.Empty:
+            self._pool._abandon(self)
+            raise RuntimeError(f"Worker {self.worker_id} sent nothing for {self._pool.stream_timeout:g}s")
+        if kind == "text":
+            return value
+        if kind == "done":
+            self.confidence, self.timings = value
+            raise StopIteration
+        raise RuntimeError(f"Worker {self.worker_id} failed: {value}")
+
+
+class Worker:
+    def __init__(self, worker_id: int):
+        self.worker_id = worker_id
+        self.process = None
+        self.requests = None
+        self.in_flight: Dict[int, PoolStream] = {}
+        self.ready = False
+        self.restarts = 0
+
+
+class WorkerPool:
+    def __init__(
+        self,
+        model_path: str,
+        n_workers: int = 2,
+        threads_per_worker: Optional[int] = None,
+        advisor_options: Optional[Dict[str, Any]] = None,
+        restart_delay: float = 1.0,
+        stream_timeout: Optional[float] = STREAM_TIMEOUT,
+        worker_main=_worker_main,  # module-level function with _worker_main's signature (spawn pickles it by name)
+    ):
+        self.model_path = model_path
+        self.threads_per_worker = threads_per_worker or default_threads(n_workers)
+        # Every worker writing its own PCA graph to the same file helps nobody
+        self.advisor_options = {"gpu_layers": 0, "plot": False, **(advisor_options or {})}
+        self.advisor_options["n_threads"] = self.threads_per_worker
+        self.restart_delay = restart_delay
+        self.stream_timeout = stream_timeout
+        self.worker_main = worker_main
+
+        self._ctx = multiprocessing.get_context(START_METHOD)
+        self._results = self._ctx.Queue()
+        self._lock = threading.Lock()
+        self._job_ids = count()
+        self._closed = False
+        self.workers = [Worker(i) for i in range(n_workers)]
+        self.stats = {"submitted": 0, "completed": 0, "failed": 0, "restarts": 0}
+
+        for worker in self.workers:
+            worker.requests = self._ctx.Queue()
+            self._start(worker)
+        self._result_thread = threading.Thread(target=self._route_results, name="pool-results", daemon=True)
+        self._result_thread.start()
+        self._monitor_thread = threading.Thread(target=self._monitor, name="pool-monitor", daemon=True)
+        self._monitor_thread.start()
+
+    def _start(self, worker: Worker) -> None:
+        worker.ready = False
+        worker.process = self._ctx.Process(
+            target=self.worker_main,
+            args=(worker.worker_id, self.model_path, self.advisor_options, worker.requests, self._results),
+            name=f"advisor-worker-{worker.worker_id}",
+            daemon=True,
+        )
+        worker.process.start()
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """Block until every worker has loaded the model."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not all(w.ready for w in self.workers):
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    # ---- requests ----
+
+    def _pick(self, session_id: Optional[str]) -> Worker:
+        if session_id is not None:
+            return self.workers[zlib.crc32(session_id.encode("utf-8")) % len(self.workers)]
+        # Skip workers that are loading or restarting unless there is nothing else
+        up = [w for w in self.workers if w.ready and w.process.is_alive()]
+        up = up or [w for w in self.workers if w.process.is_alive()] or self.workers
+        return min(up, key=lambda w: len(w.in_flight))
+
+    def get_advice_stream(self, user_query, manual_courses=None, session_id=None) -> PoolStream:
+        if self._closed:
+            raise RuntimeError("WorkerPool is closed")
+        with self._lock:
+            job_id = next(self._job_ids)
+            stream = PoolStream(self, job_id)
+            worker = self._pick(session_id)
+            stream.worker_id = worker.worker_id
+            worker.in_flight[job_id] = stream
+            self.stats["submitted"] += 1
+            worker.requests.put((job_id, user_query, manual_courses or [], session_id))
+        return stream
+
+    def get_advice(self, user_query, manual_courses=None, session_id=None):
+        stream = self.get_advice_stream(user_query, manual_courses, session_id)
+        response_text = "".join(stream)
+        return response_text, stream.confidence
+
+    def load(self) -> List[int]:
+        return [len(w.in_flight) for w in self.workers]
+
+    def _abandon(self, stream: PoolStream) -> None:
+        with self._lock:
+            for worker in self.workers:
+                if worker.in_flight.pop(stream._job_id, None) is not None:
+                    self.stats["failed"] += 1
+
+    # ---- background threads ----
+
+    def _route_results(self) -> None:
+        while True:
+            try:
+                job_id, kind, value = self._results.get()
+            except (EOFError, OSError):
+                return
+            with self._lock:
+                if kind == "ready":
+                    self.workers[value].ready = True
+                    continue
+                stream = None
+                for worker in self.workers:
+                    stream = worker.in_flight.get(job_id)
+                    if stream is not None:
+                        if kind in ("done", "error"):
+                            del worker.in_flight[job_id]
+                            self.stats["completed" if kind == "done" else "failed"] += 1
+                        break
+            if stream is not None:
+                stream._events.put((kind, value))
+
+    def _monitor(self) -> None:
+        while not self._closed:
+            time.sleep(0.5)
+            for worker in self.workers:
+                if self._closed or worker.process.is_alive():
+                    continue
+                with self._lock:
+                    worker.ready = False
+                    lost = list(worker.in_flight.values())
+                    worker.in_flight.clear()
+                    # Whatever the dead process left in its queue is failed below; requests
+                    # pinned to it from now on wait in a fresh queue for the restarted process
+                    stale, worker.requests = worker.requests, self._ctx.Queue()
+                    self.stats["failed"] += len(lost)
+                    self.stats["restarts"] += 1
+                    worker.restarts += 1
+                stale.cancel_join_thread()  # nobody reads it any more, don't block exit flushing it
+                stale.close()
+                for stream in lost:
+                    stream._events.put(("error", f"worker exited with code {worker.process.exitcode}"))
+                print(f"[Pool] Worker {worker.worker_id} exited with code {worker.process.exitcode}, restarting")
+                time.sleep(self.restart_delay)  # don't spin if the model can't load at all
+                with self._lock:
+                    self._start(worker)
+
+    def close(self, timeout: float = 10.0) -> None:
+        self._closed = True
+        for worker in self.workers:
+            try:
+                worker.requests.put(None)
+            except (ValueError, OSError):
+                pass
+        for worker in self.workers:
+            worker.process.join(timeout)
+            if worker.process.is_alive():
+                worker.process.terminate()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()